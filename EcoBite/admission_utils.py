@@ -0,0 +1,329 @@
+"""
+Admission control and per-user rate limiting.
+
+init_admission(app) adds a before_request gate with two checks:
+
+1. Token buckets per session user_id (429 + Retry-After when empty).
+   Buckets are per route class, with a tighter one for claiming posts:
+       RATE_LIMITS="read=10/60,write=2/20,claim=0.5/5,bulk=0.05/2"
+   (refill rate per second / burst size). State lives in an adapter:
+       - LocalAdapter (default): in-process, per worker
+       - DbAdapter             : rate_buckets table shared by every worker
+   Pick one with RATE_LIMIT_ADAPTER=local|db.
+
+2. A concurrency limit per route class (page, read, write, auth, bulk).
+   A request waits up to ADMISSION_QUEUE_TIMEOUT seconds for a slot, then
+   gets 503 + Retry-After instead of piling up behind a slow database.
+   Limits adapt AIMD-style: +1/limit per fast request, x ADMISSION_BACKOFF
+   when a request is slower than the class's target latency or fails,
+   between 1 and the configured ADMISSION_LIMITS maximum.
+
+Static files, uploads and the /api/events stream are never gated.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, make_response, request, session
+
+log = logging.getLogger(__name__)
+
+ADMISSION_LIMITS = os.getenv(
+    "ADMISSION_LIMITS", "page=32,read=32,write=16,auth=8,bulk=2"
+)
+# Target latency (seconds) per class: slower completions shrink the limit
+ADMISSION_TARGETS = os.getenv(
+    "ADMISSION_TARGETS", "page=0.5,read=0.5,write=1.0,auth=2.0,bulk=30"
+)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "0.5"))
+ADMISSION_RETRY_AFTER = float(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+ADMISSION_BACKOFF = float(os.getenv("ADMISSION_BACKOFF", "0.9"))
+
+RATE_LIMITS = os.getenv("RATE_LIMITS", "read=10/60,write=2/20,claim=0.5/5,bulk=0.05/2")
+RATE_LIMIT_ADAPTER = os.getenv("RATE_LIMIT_ADAPTER", "local")
+# Local adapter: max buckets kept in memory (least recently used dropped)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "50000"))
+# DB adapter: connections per worker, and the seconds a check may spend
+# connecting, reading or waiting on a bucket's row lock before failing open
+RATE_LIMIT_DB_POOL_SIZE = int(os.getenv("RATE_LIMIT_DB_POOL_SIZE", "4"))
+RATE_LIMIT_DB_TIMEOUT = int(os.getenv("RATE_LIMIT_DB_TIMEOUT", "1"))
+# DB adapter: seconds to wait before retrying an unreachable store
+RATE_LIMIT_DB_RETRY = float(os.getenv("RATE_LIMIT_DB_RETRY", "30"))
+
+# Endpoints that are never gated (long-lived or trivially cheap)
+UNGATED_ENDPOINTS = {"static", "uploaded_file", "api_events"}
+AUTH_ENDPOINTS = {"login_post", "signup_post"}
+BULK_ENDPOINTS = {"api_bulk_create_posts", "admin_export"}
+CLAIM_ENDPOINTS = {"api_create_claim", "claim_post"}
+
+
+def _parse_pairs(text, convert):
+    out = {}
+    for part in text.split(","):
+        name, _, value = part.strip().partition("=")
+        if name and value:
+            out[name.strip()] = convert(value.strip())
+    return out
+
+
+def _parse_rate(value):
+    rate, _, burst = value.partition("/")
+    return float(rate), float(burst or 1)
+
+
+def route_class(endpoint, method, path):
+    """Admission class of a request, or None if it is not gated."""
+    if endpoint is None or endpoint in UNGATED_ENDPOINTS:
+        return None
+    if endpoint in AUTH_ENDPOINTS:
+        return "auth"
+    if endpoint in BULK_ENDPOINTS:
+        return "bulk"
+    if method not in ("GET", "HEAD", "OPTIONS"):
+        return "write"
+    return "read" if path.startswith("/api/") else "page"
+
+
+def bucket_name(endpoint, cls):
+    return "claim" if endpoint in CLAIM_ENDPOINTS else cls
+
+
+# ---------- CONCURRENCY LIMITS ----------
+
+class ClassLimiter:
+    """Adaptive (AIMD) concurrency limit for one route class."""
+
+    def __init__(self, name, max_limit, target_latency, min_limit=1):
+        self.name = name
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        self.target_latency = target_latency
+        self.limit = float(self.max_limit)
+        self.inflight = 0
+        self.rejected = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self._cond.wait(remaining)
+            self.inflight += 1
+            return True
+
+    def release(self, latency, failed=False):
+        now = time.monotonic()
+        with self._cond:
+            self.inflight -= 1
+            if failed or latency > self.target_latency:
+                # One decrease per target-latency window, so a burst of slow
+                # completions from the same overload doesn't collapse the limit
+                if now - self._last_decrease >= self.target_latency:
+                    self.limit = max(self.min_limit, self.limit * ADMISSION_BACKOFF)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify()
+
+    def snapshot(self):
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "rejected": self.rejected,
+        }
+
+
+# ---------- TOKEN BUCKET ADAPTERS ----------
+
+def _refill(tokens, updated_at, rate, burst, now):
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, True, 0.0
+    return tokens, False, (1 - tokens) / rate if rate > 0 else ADMISSION_RETRY_AFTER
+
+
+class LocalAdapter:
+    """Token buckets in this process only (each worker limits separately)."""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        """Consume one token. Returns (allowed, seconds until the next token)."""
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens, allowed, wait = _refill(tokens, updated_at, rate, burst, now)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, wait
+
+
+class DbAdapter:
+    """
+    Token buckets in the rate_buckets table, shared by every worker.
+
+    Checks borrow from a small connection pool of their own (never the
+    request's transaction), so they run side by side instead of queueing
+    behind one connection. Connecting, reading and waiting on the bucket's
+    row lock are all capped at RATE_LIMIT_DB_TIMEOUT seconds. If the store
+    is slow, unreachable or the pool is busy, the request is allowed
+    through rather than blocked.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+
+    def _get_pool(self):
+        import mariadb
+        from db_utils import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+
+        with self._lock:
+            if self._pool is None and time.monotonic() >= self._retry_at:
+                try:
+                    self._pool = mariadb.ConnectionPool(
+                        pool_name="ecobite_rate_limits",
+                        pool_size=RATE_LIMIT_DB_POOL_SIZE,
+                        # Every check ends in commit/rollback: skip the reset
+                        pool_reset_connection=False,
+                        host=DB_HOST,
+                        port=DB_PORT,
+                        user=DB_USER,
+                        password=DB_PASSWORD,
+                        database=DB_NAME,
+                        connect_timeout=RATE_LIMIT_DB_TIMEOUT,
+                        read_timeout=RATE_LIMIT_DB_TIMEOUT,
+                        write_timeout=RATE_LIMIT_DB_TIMEOUT,
+                    )
+                except Exception:
+                    log.exception("Rate limit store error")
+                    self._retry_at = time.monotonic() + RATE_LIMIT_DB_RETRY
+            return self._pool
+
+    def take(self, key, rate, burst, now):
+        pool = self._get_pool()
+        if pool is None:
+            return True, 0.0
+        try:
+            conn = pool.get_connection()
+        except Exception:
+            conn = None
+        if conn is None:
+            # Every connection is busy with other checks
+            log.warning("Rate limit store busy, allowing request")
+            return True, 0.0
+
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                SELECT tokens, updated_at FROM rate_buckets WHERE bucket_key=?
+                FOR UPDATE WAIT {RATE_LIMIT_DB_TIMEOUT:d}
+                """,
+                (key,),
+            )
+            row = cur.fetchone()
+            tokens, updated_at = row if row else (burst, now)
+            tokens, allowed, wait = _refill(tokens, updated_at, rate, burst, now)
+            cur.execute(
+                """
+                INSERT INTO rate_buckets (bucket_key, tokens, updated_at)
+                VALUES (?, ?, ?)
+                ON DUPLICATE KEY UPDATE
+                    tokens = VALUES(tokens), updated_at = VALUES(updated_at)
+                """,
+                (key, tokens, now),
+            )
+            conn.commit()
+            return allowed, wait
+        except Exception:
+            log.exception("Rate limit store error")
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            return True, 0.0
+        finally:
+            try:
+                conn.close()  # back to the pool
+            except Exception:
+                pass
+
+
+def _make_adapter(name):
+    if name == "db":
+        return DbAdapter()
+    return LocalAdapter()
+
+
+# ---------- FLASK INTEGRATION ----------
+
+def _reject(status, message, retry_after):
+    if request.path.startswith("/api/"):
+        resp = jsonify({"error": message})
+    else:
+        resp = make_response(message)
+    resp.status_code = status
+    resp.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return resp
+
+
+def init_admission(app):
+    targets = _parse_pairs(ADMISSION_TARGETS, float)
+    limiters = {
+        name: ClassLimiter(name, limit, targets.get(name, 1.0))
+        for name, limit in _parse_pairs(ADMISSION_LIMITS, int).items()
+    }
+    rates = _parse_pairs(RATE_LIMITS, _parse_rate)
+    store = _make_adapter(RATE_LIMIT_ADAPTER)
+    app.extensions["admission"] = limiters
+
+    @app.before_request
+    def admit_request():
+        cls = route_class(request.endpoint, request.method, request.path)
+        if cls is None:
+            return None
+
+        user_id = session.get("user_id")
+        bucket = bucket_name(request.endpoint, cls)
+        if user_id is not None and bucket in rates:
+            rate, burst = rates[bucket]
+            allowed, wait = store.take(f"{user_id}:{bucket}", rate, burst, time.time())
+            if not allowed:
+                return _reject(429, "Too many requests, please slow down", wait)
+
+        limiter = limiters.get(cls)
+        if limiter is None:
+            return None
+        if not limiter.acquire(ADMISSION_QUEUE_TIMEOUT):
+            return _reject(503, "Server busy, please retry shortly", ADMISSION_RETRY_AFTER)
+        g.admission = (limiter, time.monotonic())
+        return None
+
+    @app.after_request
+    def note_status(resp):
+        if "admission" in g:
+            g.admission_failed = resp.status_code >= 500
+        return resp
+
+    @app.teardown_request
+    def release_slot(exc):
+        admitted = g.pop("admission", None)
+        if admitted:
+            limiter, started = admitted
+            failed = exc is not None or g.pop("admission_failed", False)
+            limiter.release(time.monotonic() - started, failed)
@@ -1,16 +1,115 @@
+import logging
 import os
+import tempfile
+import time
+
+_started = time.perf_counter()
+
 from dotenv import load_dotenv
-from flask import Flask, send_from_directory
+from flask import Flask, request, send_from_directory, session
+from jinja2 import FileSystemBytecodeCache
+
+# db_utils opens the global DB connection at import time; import it on its
+# own so the startup report can tell DB init apart from module imports.
+_db_started = time.perf_counter()
+import db_utils
+_db_elapsed = time.perf_counter() - _db_started
 
 from routes_pages import register_pages
 from routes_api import register_api_routes
 from routes_claims import register_claim_routes
+from routes_events import register_event_routes
+from routes_admin import register_admin_routes
+from asset_utils import init_assets
+from http_utils import init_compression
+from admission_utils import init_admission
+from log_utils import init_logging
+from profile_utils import init_profiling
+from feed_index import feed as feed_index
+from suggest_utils import index as suggest_index
+
+_imports_elapsed = time.perf_counter() - _started - _db_elapsed
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 # Folder where uploaded images are stored (relative to project root)
 UPLOAD_FOLDER = "uploads"
 
+# Compiled templates are shared by every worker through this directory;
+# entries are keyed on the template source checksum, so deploys never
+# pick up stale bytecode. Set JINJA_CACHE_DIR="" to disable.
+JINJA_CACHE_DIR = os.getenv(
+    "JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ecobite-jinja")
+)
+# Compile every template at boot instead of on the first request for it
+TEMPLATE_WARMUP = os.getenv("TEMPLATE_WARMUP", "1") == "1"
+
+# Load the in-memory feed/suggest indexes at boot instead of on first use
+INDEX_WARMUP = os.getenv("INDEX_WARMUP", "1") == "1"
+
+# After a user writes, their reads go to the primary for this many seconds
+# so they never see a replica that hasn't caught up with their own change
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+
+
+def _init_read_routing(app):
+    db_utils.init_read_replicas()
+
+    @app.before_request
+    def pick_read_target():
+        db_utils.route_reads_to_primary(session.get("rw_until", 0) > time.time())
+
+    @app.after_request
+    def remember_write(resp):
+        if (
+            request.method not in ("GET", "HEAD", "OPTIONS")
+            and resp.status_code < 400
+            and "user_id" in session
+        ):
+            session["rw_until"] = time.time() + READ_YOUR_WRITES_WINDOW
+        return resp
+
+    @app.teardown_request
+    def release_connections(exc):
+        db_utils.release_read_connection()
+        db_utils.release_write_connection()
+
+
+def _init_templates(app):
+    """Attach the bytecode cache and optionally precompile all templates."""
+    if JINJA_CACHE_DIR:
+        os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
+    compiled = 0
+    if TEMPLATE_WARMUP:
+        for name in app.jinja_env.list_templates(extensions=["html"]):
+            try:
+                app.jinja_env.get_template(name)
+                compiled += 1
+            except Exception:
+                log.exception("Template compile error", extra={"template": name})
+    return compiled
+
+
+def _init_indexes():
+    """Load the active-post indexes; on failure they load on first request."""
+    if not INDEX_WARMUP:
+        return 0
+    cur = db_utils.get_cursor()
+    if not cur:
+        return 0
+    loaded = 0
+    for name, idx in (("feed", feed_index), ("suggest", suggest_index)):
+        try:
+            idx.sync(cur, force=True)
+            loaded += 1
+        except Exception:
+            log.exception("Index warmup error", extra={"index": name})
+    return loaded
+
 
 def create_app():
     # Point to your existing folders
@@ -23,16 +122,61 @@ def create_app():
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
+    # JSON logs through a background writer; registered first so request
+    # ids exist for every other hook and latency covers all of them
+    init_logging(app)
+
+    # Concurrency limits + per-user rate limits; registered before the
+    # other hooks so rejected requests cost as little as possible
+    init_admission(app)
+
+    # cProfile/tracemalloc for admin-requested or sampled requests; early so
+    # its after_request hook runs last and sees the whole response
+    init_profiling(app)
+
+    # GET routes read from replicas (if configured), with read-your-writes
+    _init_read_routing(app)
+
     # Register route groups
     register_pages(app)
     register_api_routes(app)
     register_claim_routes(app)
+    register_event_routes(app)
+    register_admin_routes(app)
+
+    # Fingerprinted static assets (no-op until build_assets.py has run)
+    init_assets(app)
+
+    # gzip/brotli for JSON/HTML responses (Accept-Encoding negotiated)
+    init_compression(app)
 
     # Serve uploaded files (e.g. images)
     @app.route("/uploads/<path:filename>")
     def uploaded_file(filename):
         return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
 
+    templates_started = time.perf_counter()
+    compiled = _init_templates(app)
+    templates_elapsed = time.perf_counter() - templates_started
+    indexes_started = time.perf_counter()
+    indexes = _init_indexes()
+    timings = {
+        "imports": _imports_elapsed,
+        "db_init": _db_elapsed,
+        "templates": templates_elapsed,
+        "indexes": time.perf_counter() - indexes_started,
+    }
+    app.config["STARTUP_TIMINGS"] = timings
+    log.info(
+        "startup",
+        extra={
+            "pid": os.getpid(),
+            **{f"{name}_s": round(value, 3) for name, value in timings.items()},
+            "templates_compiled": compiled,
+            "indexes_loaded": indexes,
+        },
+    )
+
     return app
 
 
@@ -0,0 +1,142 @@
+"""
+Archive old finished posts (and their claims) out of the hot tables.
+
+    python archive_posts.py                   # posts finished > 30 days ago
+    python archive_posts.py --age-days 14 --chunk-size 200
+
+A post is archived when it is claimed, completed or expired and its
+expires_at (or created_at if it never expires) is older than the age
+threshold. Each chunk runs in its own transaction:
+
+    1. add the chunk's counts/weights to archived_stats
+    2. copy claims -> claims_archive, posts -> posts_archive
+    3. delete them from claims/posts and log the deletes in `changes`
+
+archived_stats keeps compute_stats() totals unchanged after the move.
+Run it from cron (e.g. nightly); it is safe to interrupt between chunks.
+"""
+
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+
+from db_utils import conn, record_changes, CHANGE_DELETE
+
+load_dotenv()
+
+ARCHIVE_AGE_DAYS = int(os.getenv("ARCHIVE_AGE_DAYS", "30"))
+ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", "500"))
+
+
+def archive_chunk(cur, conn, age_days, chunk_size):
+    """Archive up to `chunk_size` posts. Returns the number of posts moved."""
+    cur.execute(
+        """
+        SELECT id FROM posts
+        WHERE (status IN ('claimed', 'completed', 'expired')
+               OR (expires_at IS NOT NULL AND expires_at <= NOW()))
+          AND COALESCE(expires_at, created_at) < NOW() - INTERVAL ? DAY
+        ORDER BY id
+        LIMIT ?
+        FOR UPDATE
+        """,
+        (age_days, chunk_size),
+    )
+    post_ids = [r[0] for r in cur.fetchall()]
+    if not post_ids:
+        conn.rollback()
+        return 0
+
+    marks = ",".join("?" * len(post_ids))
+    ids = tuple(post_ids)
+    shared = "status IN ('claimed', 'completed')"
+
+    try:
+        # Per-owner and global (user_id 0) post totals
+        for owner_col, group_by in (("user_id", "GROUP BY user_id"), ("0", "")):
+            cur.execute(
+                f"""
+                INSERT INTO archived_stats
+                    (user_id, posts_created, posts_shared, weight_shared_kg)
+                SELECT {owner_col}, COUNT(*), SUM({shared}),
+                       COALESCE(SUM(CASE WHEN {shared} THEN estimated_weight_kg END), 0)
+                FROM posts
+                WHERE id IN ({marks})
+                {group_by}
+                ON DUPLICATE KEY UPDATE
+                    posts_created = posts_created + VALUES(posts_created),
+                    posts_shared = posts_shared + VALUES(posts_shared),
+                    weight_shared_kg = weight_shared_kg + VALUES(weight_shared_kg)
+                """,
+                ids,
+            )
+
+        # Per-claimer claim totals
+        cur.execute(
+            f"""
+            INSERT INTO archived_stats
+                (user_id, claims_made, claims_accepted, claims_rejected)
+            SELECT claimer_id, COUNT(*), SUM(status = 'approved'), SUM(status = 'rejected')
+            FROM claims
+            WHERE post_id IN ({marks})
+            GROUP BY claimer_id
+            ON DUPLICATE KEY UPDATE
+                claims_made = claims_made + VALUES(claims_made),
+                claims_accepted = claims_accepted + VALUES(claims_accepted),
+                claims_rejected = claims_rejected + VALUES(claims_rejected)
+            """,
+            ids,
+        )
+
+        cur.execute(f"INSERT INTO claims_archive SELECT * FROM claims WHERE post_id IN ({marks})", ids)
+        cur.execute(f"INSERT INTO posts_archive SELECT * FROM posts WHERE id IN ({marks})", ids)
+
+        cur.execute(f"DELETE FROM claims WHERE post_id IN ({marks}) RETURNING id", ids)
+        claim_ids = [r[0] for r in cur.fetchall()]
+        cur.execute(f"DELETE FROM posts WHERE id IN ({marks})", ids)
+
+        record_changes(cur, "claim", claim_ids, CHANGE_DELETE)
+        record_changes(cur, "post", post_ids, CHANGE_DELETE)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return len(post_ids)
+
+
+def archive(cur, conn, age_days=ARCHIVE_AGE_DAYS, chunk_size=ARCHIVE_CHUNK_SIZE,
+            max_chunks=None, pause=0.0):
+    """Archive chunks until nothing is left (or max_chunks). Returns total moved."""
+    total = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        moved = archive_chunk(cur, conn, age_days, chunk_size)
+        if not moved:
+            break
+        total += moved
+        chunks += 1
+        print(f"Archived {moved} posts (total {total})")
+        if pause:
+            # Give foreground traffic room between chunks
+            time.sleep(pause)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move old finished posts into archive tables.")
+    parser.add_argument("--age-days", type=int, default=ARCHIVE_AGE_DAYS)
+    parser.add_argument("--chunk-size", type=int, default=ARCHIVE_CHUNK_SIZE)
+    parser.add_argument("--max-chunks", type=int, default=None)
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between chunks")
+    args = parser.parse_args(argv)
+
+    cur = conn.cursor()
+    total = archive(cur, conn, args.age_days, args.chunk_size, args.max_chunks, args.pause)
+    print(f"Archive complete: {total} posts moved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Serving for the fingerprinted assets built by build_assets.py.
+
+init_assets(app):
+    - loads static/dist/manifest.json (if the build step has run)
+    - makes url_for('static', filename='js/app.js') resolve to the hashed
+      file, so templates need no changes
+    - replaces the static view: hashed files are served with a one-year
+      immutable Cache-Control, picking the .br/.gz variant from
+      Accept-Encoding and the .webp variant of images from Accept
+
+Without a manifest (local dev) everything falls back to Flask's normal
+static handling.
+"""
+
+import json
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+from build_assets import DIST_DIR, MANIFEST_NAME
+from http_utils import accepts
+
+DIST_PREFIX = "dist/"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Content-Encoding -> file suffix, in server preference order
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def load_manifest(path=None):
+    """Return (assets, webp) mappings, both empty if there is no build."""
+    path = path or os.path.join(DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as f:
+            doc = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
+    return doc.get("assets", {}), doc.get("webp", {})
+
+
+def _immutable(resp, vary):
+    resp.cache_control.public = True
+    resp.cache_control.max_age = IMMUTABLE_MAX_AGE
+    resp.cache_control.immutable = True
+    for v in vary:
+        resp.vary.add(v)
+    return resp
+
+
+def init_assets(app):
+    assets, webp = load_manifest()
+    # hashed name -> webp sibling, for content negotiation on image URLs
+    webp_by_built = {assets[name]: w for name, w in webp.items() if name in assets}
+    app.config["ASSET_MANIFEST"] = assets
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint != "static" or "filename" not in values:
+            return
+        built = assets.get(values["filename"])
+        if built:
+            values["filename"] = DIST_PREFIX + built
+
+    default_static = app.view_functions["static"]
+
+    def static(filename):
+        if not filename.startswith(DIST_PREFIX):
+            return default_static(filename=filename)
+
+        built = filename[len(DIST_PREFIX):]
+        accept = request.headers.get("Accept", "")
+        alt = webp_by_built.get(built)
+        if alt and accepts(accept, "image/webp"):
+            resp = send_from_directory(DIST_DIR, alt, max_age=IMMUTABLE_MAX_AGE)
+            return _immutable(resp, ["Accept"])
+
+        vary = ["Accept"] if alt else []
+        mimetype = mimetypes.guess_type(built)[0] or "application/octet-stream"
+        accept_encoding = request.headers.get("Accept-Encoding", "")
+        for encoding, suffix in ENCODINGS:
+            if (accepts(accept_encoding, encoding)
+                    and os.path.isfile(os.path.join(DIST_DIR, built + suffix))):
+                resp = send_from_directory(
+                    DIST_DIR, built + suffix, mimetype=mimetype,
+                    max_age=IMMUTABLE_MAX_AGE,
+                )
+                resp.headers["Content-Encoding"] = encoding
+                return _immutable(resp, vary + ["Accept-Encoding"])
+
+        has_variants = any(
+            os.path.isfile(os.path.join(DIST_DIR, built + s)) for _, s in ENCODINGS
+        )
+        resp = send_from_directory(DIST_DIR, built, max_age=IMMUTABLE_MAX_AGE)
+        return _immutable(resp, vary + (["Accept-Encoding"] if has_variants else []))
+
+    app.view_functions["static"] = static
@@ -0,0 +1,165 @@
+"""
+Build fingerprinted, precompressed static assets.
+
+    python build_assets.py            # writes static/dist/ + manifest.json
+    python build_assets.py --clean    # wipe static/dist/ first
+
+For every file under static/ (except dist/ itself):
+    - copy it to static/dist/<name>.<hash>.<ext>, hash = sha256 of contents
+    - text assets (css/js/svg) also get .gz and, if the `brotli` package is
+      installed, .br siblings
+    - png/jpg images also get a .webp sibling if Pillow is installed
+
+Relative ES module imports (`from './api.js'`) are rewritten to the hashed
+names before hashing, so a change in api.js also changes app.js's name.
+
+manifest.json maps logical names to built ones and is read by
+asset_utils.init_assets(); url_for('static', filename=...) resolves through
+it and the hashed files are served with immutable one-year caching.
+Re-run after every change to static/ (e.g. as part of the deploy).
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_NAME = "manifest.json"
+
+TEXT_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt"}
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+HASH_LENGTH = 12
+
+_IMPORT_RE = re.compile(r"""(\bfrom\s+|\bimport\s*\(?\s*)(['"])(\.{1,2}/[^'"]+)\2""")
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz variants are built
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # optional: no .webp variants
+    Image = None
+
+
+def _logical_names():
+    for root, dirs, files in os.walk(STATIC_DIR):
+        if os.path.abspath(root) == DIST_DIR:
+            dirs[:] = []
+            continue
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != DIST_DIR]
+        for f in files:
+            if f.startswith("."):
+                continue
+            yield os.path.relpath(os.path.join(root, f), STATIC_DIR).replace(os.sep, "/")
+
+
+def _hashed_name(name, data):
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest}{ext}"
+
+
+def _module_imports(name, text):
+    """Logical names of the relative imports in a JS module."""
+    base = os.path.dirname(name)
+    return {
+        os.path.normpath(os.path.join(base, m.group(3))).replace(os.sep, "/")
+        for m in _IMPORT_RE.finditer(text)
+    }
+
+
+def _rewrite_imports(name, text, manifest):
+    base = os.path.dirname(name)
+
+    def repl(m):
+        target = os.path.normpath(os.path.join(base, m.group(3))).replace(os.sep, "/")
+        built = manifest.get(target)
+        if not built:
+            return m.group(0)
+        rel = os.path.relpath(built, base or ".").replace(os.sep, "/")
+        if not rel.startswith("."):
+            rel = "./" + rel
+        return f"{m.group(1)}{m.group(2)}{rel}{m.group(2)}"
+
+    return _IMPORT_RE.sub(repl, text)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _build_one(name, data, manifest, webp):
+    built = _hashed_name(name, data)
+    out = os.path.join(DIST_DIR, built)
+    _write(out, data)
+    manifest[name] = built
+
+    ext = os.path.splitext(name)[1].lower()
+    if ext in TEXT_EXTENSIONS:
+        _write(out + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(out + ".br", brotli.compress(data, quality=11))
+    elif ext in IMAGE_EXTENSIONS and Image is not None:
+        webp_name = os.path.splitext(built)[0] + ".webp"
+        with Image.open(os.path.join(STATIC_DIR, name)) as img:
+            img.save(os.path.join(DIST_DIR, webp_name), "WEBP", quality=80, method=6)
+        webp[name] = webp_name
+
+
+def build(clean=False):
+    """Build static/dist/ and return the manifest dict that was written."""
+    if clean and os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR, exist_ok=True)
+
+    manifest, webp = {}, {}
+    pending = {}
+    for name in sorted(_logical_names()):
+        with open(os.path.join(STATIC_DIR, name), "rb") as f:
+            data = f.read()
+        if name.endswith(".js"):
+            pending[name] = data.decode("utf-8")
+        else:
+            _build_one(name, data, manifest, webp)
+
+    # JS modules go last, dependencies first, so imports can be rewritten
+    while pending:
+        ready = [
+            n for n, text in pending.items()
+            if not (_module_imports(n, text) & set(pending) - {n})
+        ] or sorted(pending)[:1]  # import cycle: break it anywhere
+        for name in ready:
+            text = _rewrite_imports(name, pending.pop(name), manifest)
+            _build_one(name, text.encode("utf-8"), manifest, webp)
+
+    doc = {"assets": manifest, "webp": webp}
+    with open(os.path.join(DIST_DIR, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2, sort_keys=True)
+    return doc
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress static assets.")
+    parser.add_argument("--clean", action="store_true", help="Remove static/dist/ first")
+    args = parser.parse_args(argv)
+
+    doc = build(clean=args.clean)
+    print(
+        f"Built {len(doc['assets'])} assets ({len(doc['webp'])} webp) -> "
+        f"{os.path.relpath(DIST_DIR)}"
+        + ("" if brotli else " [brotli not installed: .gz only]")
+        + ("" if Image else " [Pillow not installed: no .webp]")
+    )
+
+
+if __name__ == "__main__":
+    main()
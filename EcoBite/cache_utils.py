@@ -0,0 +1,105 @@
+"""
+In-process caches for EcoBite.
+
+LRUCache is a small thread-safe LRU with an optional TTL. `fragments` holds
+rendered HTML partials (feed list, stats widget, ...) keyed by
+(fragment, filter/user, data_version()), so any write to posts/claims
+naturally moves readers onto fresh keys and old entries age out of the LRU.
+`dashboards` does the same for per-user JSON payloads (owner dashboard).
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import render_template
+from markupsafe import Markup
+
+log = logging.getLogger(__name__)
+
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "512"))
+# Upper bound on staleness for things the change log can't see (posts
+# crossing expires_at, users table, ...)
+FRAGMENT_CACHE_TTL = float(os.getenv("FRAGMENT_CACHE_TTL", "30"))
+DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", "1024"))
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "10"))
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded mapping: least recently used entries are evicted first."""
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+fragments = LRUCache(FRAGMENT_CACHE_SIZE, FRAGMENT_CACHE_TTL)
+dashboards = LRUCache(DASHBOARD_CACHE_SIZE, DASHBOARD_CACHE_TTL)
+
+
+def cached_fragment(key, version, render, fallback=None):
+    """
+    Return render()'s output from the fragment cache under (key, version).
+    A version of None (change log unreadable) always re-renders.
+
+    If render() raises, nothing is cached: with a `fallback` the error is
+    logged and fallback()'s output served instead, otherwise it propagates.
+    """
+    try:
+        if version is None:
+            return render()
+        return fragments.get_or_set((key, version), render)
+    except Exception:
+        if fallback is None:
+            raise
+        log.exception("Fragment render error", extra={"fragment": str(key)})
+        return fallback()
+
+
+def render_fragment(template, **context):
+    """Render a partial template to markup that can be cached and embedded."""
+    return Markup(render_template(template, **context))
@@ -0,0 +1,274 @@
+"""
+Claim decision helpers shared by the JSON API and the HTML claim routes.
+
+Quantities are stored twice on posts:
+    - quantity        : the free-text label shown in the UI ("5 kg")
+    - quantity_amount : numeric amount that approvals decrement atomically
+    - quantity_unit   : the unit part of the label ("kg")
+
+Approvals never read-modify-write the amount in Python; the decrement is a
+single guarded UPDATE, so concurrent approvals on the same post can't
+oversell it and don't need a lock beyond the row itself.
+"""
+
+from db_utils import record_change, record_changes, CHANGE_UPDATE
+from event_utils import publish, CLAIM_DECIDED, POST_STATUS_CHANGED
+from quantity_utils import format_quantity
+
+# Upper bound on decisions accepted by one batch request
+MAX_BATCH_DECISIONS = 200
+
+
+class ClaimDecisionError(Exception):
+    """Raised when a claim can't be approved/rejected; carries an HTTP status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def decide_claim(cur, claim_id, owner_id, new_status, expected_version=None):
+    """
+    Approve or reject a pending claim inside the caller's transaction.
+
+    `new_status` is "approved" or "rejected". When `expected_version` is
+    given the post must still be at that version (optimistic check), else a
+    409 is raised so the client can refresh and retry.
+
+    Returns a dict with claim_id, post_id, claimer_id, status and
+    post_status (the post's new status if it changed, else None).
+    The caller commits, or rolls back on ClaimDecisionError.
+    """
+    cur.execute(
+        """
+        SELECT c.post_id, p.user_id, c.claimer_id, c.status,
+               c.requested_amount, p.quantity_amount, p.version
+        FROM claims c
+        JOIN posts p ON c.post_id = p.id
+        WHERE c.id = ?
+        """,
+        (claim_id,),
+    )
+    row = cur.fetchone()
+    if not row:
+        raise ClaimDecisionError("Claim not found", 404)
+
+    post_id, post_owner, claimer_id, claim_status, req_amount, post_amount, version = row
+    if post_owner != owner_id:
+        raise ClaimDecisionError("Forbidden", 403)
+    if claim_status != "pending":
+        raise ClaimDecisionError(f"Claim already {claim_status}", 409)
+    if expected_version is not None and int(expected_version) != version:
+        raise ClaimDecisionError("Post changed, reload and try again", 409)
+
+    # Only the first decision wins if two owners' tabs race on the same claim
+    cur.execute(
+        """
+        UPDATE claims
+        SET status = ?, decided_at = NOW(), version = version + 1
+        WHERE id = ? AND status = 'pending'
+        """,
+        (new_status, claim_id),
+    )
+    if cur.rowcount == 0:
+        raise ClaimDecisionError("Claim already decided", 409)
+    record_change(cur, "claim", claim_id, CHANGE_UPDATE)
+
+    result = {
+        "claim_id": claim_id,
+        "post_id": post_id,
+        "claimer_id": claimer_id,
+        "status": new_status,
+        "post_status": None,
+    }
+    if new_status != "approved":
+        return result
+
+    if post_amount is None:
+        # Post has no numeric quantity: one approval takes the whole item
+        cur.execute(
+            """
+            UPDATE posts
+            SET status = 'claimed', version = version + 1
+            WHERE id = ? AND status = 'active'
+              AND (? IS NULL OR version = ?)
+            """,
+            (post_id, expected_version, expected_version),
+        )
+        if cur.rowcount == 0:
+            raise ClaimDecisionError("Post is no longer available", 409)
+        result["post_status"] = "claimed"
+    else:
+        # No parseable amount on the request means "whatever is left"
+        take = req_amount if req_amount is not None else post_amount
+        # All SET expressions read the pre-update quantity_amount, so the
+        # order below is safe with or without SIMULTANEOUS_ASSIGNMENT.
+        cur.execute(
+            """
+            UPDATE posts
+            SET status = CASE WHEN ROUND(quantity_amount - ?, 3) <= 0
+                              THEN 'claimed' ELSE status END,
+                quantity = TRIM(CONCAT(ROUND(quantity_amount - ?, 3), ' ',
+                                       COALESCE(quantity_unit, ''))),
+                quantity_amount = ROUND(quantity_amount - ?, 3),
+                version = version + 1
+            WHERE id = ? AND status = 'active'
+              AND quantity_amount >= ?
+              AND (? IS NULL OR version = ?)
+            """,
+            (take, take, take, post_id, take, expected_version, expected_version),
+        )
+        if cur.rowcount == 0:
+            raise ClaimDecisionError("Post is no longer available or not enough quantity left", 409)
+        # We hold the row lock now, so this read sees our own update
+        cur.execute("SELECT status FROM posts WHERE id=?", (post_id,))
+        if cur.fetchone()[0] == "claimed":
+            result["post_status"] = "claimed"
+
+    record_change(cur, "post", post_id, CHANGE_UPDATE)
+    return result
+
+
+def decide_claims_batch(cur, owner_id, decisions):
+    """
+    Apply many approve/reject decisions in the caller's transaction.
+
+    `decisions` is a list of (claim_id, new_status) pairs. Ownership and
+    state for every claim are read in one locking query; the claim and post
+    updates then go out with executemany(). Items that fail validation are
+    skipped, the rest are applied together.
+
+    Returns (results, applied): `results` has one dict per input item
+    ({"id", "ok", "status"} or {"id", "ok", "error", "code"}), and
+    `applied` lists decide_claim()-style dicts for publish_decision().
+    """
+    ids = sorted({claim_id for claim_id, _ in decisions})
+    rows = {}
+    if ids:
+        marks = ",".join("?" * len(ids))
+        # FOR UPDATE locks just these claims and their posts until commit, so
+        # the remaining quantities computed below can't go stale.
+        cur.execute(
+            f"""
+            SELECT c.id, c.post_id, p.user_id, c.claimer_id, c.status,
+                   c.requested_amount, p.quantity_amount, p.quantity_unit,
+                   p.status
+            FROM claims c
+            JOIN posts p ON c.post_id = p.id
+            WHERE c.id IN ({marks})
+            FOR UPDATE
+            """,
+            tuple(ids),
+        )
+        rows = {r[0]: r[1:] for r in cur.fetchall()}
+
+    results = []
+    applied = []
+    claim_updates = []
+    posts = {}  # post_id -> [remaining_amount, unit, status, changed]
+    seen = set()
+
+    for claim_id, new_status in decisions:
+        row = rows.get(claim_id)
+        if claim_id in seen:
+            results.append({"id": claim_id, "ok": False, "error": "Duplicate id in batch", "code": 400})
+            continue
+        seen.add(claim_id)
+        if not row:
+            results.append({"id": claim_id, "ok": False, "error": "Claim not found", "code": 404})
+            continue
+
+        post_id, post_owner, claimer_id, claim_status, req_amount, amount, unit, post_status = row
+        if post_owner != owner_id:
+            results.append({"id": claim_id, "ok": False, "error": "Forbidden", "code": 403})
+            continue
+        if claim_status != "pending":
+            results.append({"id": claim_id, "ok": False, "error": f"Claim already {claim_status}", "code": 409})
+            continue
+
+        post = posts.setdefault(post_id, [amount, unit, post_status, False])
+        status_before = post[2]
+        if new_status == "approved":
+            if post[2] != "active":
+                results.append({"id": claim_id, "ok": False, "error": "Post is no longer available", "code": 409})
+                continue
+            if post[0] is None:
+                # No numeric quantity: the first approval takes the whole item
+                post[2] = "claimed"
+            else:
+                take = req_amount if req_amount is not None else post[0]
+                if take > post[0] + 1e-9:
+                    results.append({"id": claim_id, "ok": False, "error": "Not enough quantity left for this claim", "code": 409})
+                    continue
+                post[0] = round(post[0] - take, 3)
+                if post[0] <= 0:
+                    post[2] = "claimed"
+            post[3] = True
+
+        claim_updates.append((new_status, claim_id))
+        results.append({"id": claim_id, "ok": True, "status": new_status})
+        applied.append({
+            "claim_id": claim_id,
+            "post_id": post_id,
+            "claimer_id": claimer_id,
+            "status": new_status,
+            "post_status": post[2] if post[2] != status_before else None,
+        })
+
+    if claim_updates:
+        cur.executemany(
+            """
+            UPDATE claims
+            SET status = ?, decided_at = NOW(), version = version + 1
+            WHERE id = ? AND status = 'pending'
+            """,
+            claim_updates,
+        )
+        record_changes(cur, "claim", [claim_id for _, claim_id in claim_updates], CHANGE_UPDATE)
+
+    post_updates = [
+        (
+            amount,
+            format_quantity(amount, unit) if amount is not None else None,
+            status,
+            post_id,
+        )
+        for post_id, (amount, unit, status, changed) in posts.items()
+        if changed
+    ]
+    if post_updates:
+        cur.executemany(
+            """
+            UPDATE posts
+            SET quantity_amount = ?,
+                quantity = COALESCE(?, quantity),
+                status = ?,
+                version = version + 1
+            WHERE id = ?
+            """,
+            post_updates,
+        )
+        record_changes(cur, "post", [u[3] for u in post_updates], CHANGE_UPDATE)
+
+    return results, applied
+
+
+def publish_decision(result, owner_id):
+    """Push the SSE events for a committed decide_claim() result."""
+    users = [result["claimer_id"], owner_id]
+    publish(
+        CLAIM_DECIDED,
+        {
+            "claim_id": result["claim_id"],
+            "post_id": result["post_id"],
+            "status": result["status"],
+        },
+        users,
+    )
+    if result["post_status"]:
+        publish(
+            POST_STATUS_CHANGED,
+            {"post_id": result["post_id"], "status": result["post_status"]},
+            users,
+        )
@@ -2,16 +2,29 @@
 DB helper functions for EcoBite.
 
 All DB access should go through:
-    - get_cursor()
+    - get_cursor()          (primary: writes and anything read-after-write)
+    - get_read_cursor()     (replica pool for read-only GET routes)
+    - get_write_cursor()    (this request's own primary connection, for
+                             transactions that must not share `conn`)
+    - run_parallel()        (independent read queries, concurrently)
     - conn (global connection)
     - dict_rows()
-    - compute_stats()
+    - compute_stats() / empty_stats()
+    - record_change() / commit_changes() / changes_since() / settled_version()
+    - data_version()
 """
 
+import itertools
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 import mariadb
 from dotenv import load_dotenv
 
+log = logging.getLogger(__name__)
+
 load_dotenv()
 
 # -------- DB CONFIG --------
@@ -29,6 +42,27 @@ DB_PASSWORD = (
 
 DB_NAME = os.getenv("DB_NAME", "ecobite")
 
+# -------- READ REPLICAS --------
+# Comma-separated host[:port] list; empty means all reads go to the primary.
+DB_READ_HOSTS = [h.strip() for h in os.getenv("DB_READ_HOSTS", "").split(",") if h.strip()]
+DB_READ_USER = os.getenv("DB_READ_USER", DB_USER)
+DB_READ_PASSWORD = os.getenv("DB_READ_PASSWORD", DB_PASSWORD)
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+# Replicas further behind than this (seconds) are skipped until they catch up
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "2"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+
+# -------- PARALLEL READS --------
+# Threads (and primary pool connections) for run_parallel(); 0 runs the
+# queries one after another on get_read_cursor() instead.
+DB_PARALLEL_WORKERS = int(os.getenv("DB_PARALLEL_WORKERS", "8"))
+# Seconds a run_parallel() batch may take before QueryDeadlineExceeded
+DB_PARALLEL_TIMEOUT = float(os.getenv("DB_PARALLEL_TIMEOUT", "2"))
+
+# -------- WRITE CONNECTIONS --------
+# Primary connections lent to one request at a time (see get_write_cursor)
+DB_WRITE_POOL_SIZE = int(os.getenv("DB_WRITE_POOL_SIZE", "8"))
+
 _conn = None
 
 
@@ -55,6 +89,82 @@ def get_conn():
 conn = get_conn()
 
 
+# -------- QUERY TIMING --------
+# Cursors handed out by get_cursor()/get_read_cursor() time their calls
+# into the current thread's QueryStats (if one was started for this
+# request), so profiling/logging can split DB time from Python time.
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_query_state = threading.local()
+
+
+def start_query_stats():
+    """Start timing this thread's queries; returns the QueryStats to read."""
+    stats = _query_state.stats = QueryStats()
+    return stats
+
+
+def current_query_stats():
+    """This thread's active QueryStats, or None."""
+    return getattr(_query_state, "stats", None)
+
+
+def stop_query_stats():
+    _query_state.stats = None
+
+
+def _record_query(elapsed, queries=1):
+    stats = getattr(_query_state, "stats", None)
+    if stats is not None:
+        stats.count += queries
+        stats.seconds += elapsed
+
+
+class TimedCursor:
+    """Cursor proxy that adds execute/fetch time to the thread's QueryStats."""
+
+    __slots__ = ("_cur",)
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def _timed(self, method, queries, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _record_query(time.perf_counter() - started, queries)
+
+    def execute(self, *args, **kwargs):
+        return self._timed(self._cur.execute, 1, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed(self._cur.executemany, 1, *args, **kwargs)
+
+    def fetchone(self):
+        return self._timed(self._cur.fetchone, 0)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed(self._cur.fetchmany, 0, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed(self._cur.fetchall, 0)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __getattr__(self, name):
+        # description, rowcount, lastrowid, close, ...
+        return getattr(self._cur, name)
+
+
 def get_cursor():
     """
     Return a cursor. If the connection died, reconnect automatically.
@@ -62,11 +172,399 @@ def get_cursor():
     global conn
     try:
         cur = conn.cursor()
-        return cur
+        return TimedCursor(cur)
     except mariadb.Error:
         # Reconnect
         conn = get_db_connection()
-        return conn.cursor()
+        return TimedCursor(conn.cursor())
+
+
+# -------- PER-REQUEST WRITE CONNECTIONS --------
+# The global `conn` is one session shared by every request thread: a
+# rollback in one request undoes whatever another has written but not yet
+# committed. Transactions that must stay isolated (claim decisions) borrow
+# a primary connection for the whole request instead:
+#
+#     cur = get_write_cursor()
+#     ...
+#     commit_changes(get_write_connection())
+#
+# The connection goes back to its pool in release_write_connection(),
+# called at request teardown; anything left uncommitted is rolled back.
+
+_write_pool = None
+_write_pool_lock = threading.Lock()
+_write_state = threading.local()
+
+
+def _borrow_write_connection():
+    global _write_pool
+    with _write_pool_lock:
+        if _write_pool is None and DB_WRITE_POOL_SIZE > 0:
+            try:
+                _write_pool = mariadb.ConnectionPool(
+                    pool_name="ecobite_write",
+                    pool_size=DB_WRITE_POOL_SIZE,
+                    pool_reset_connection=True,
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    database=DB_NAME,
+                )
+            except mariadb.Error as e:
+                log.error("Write pool error: %s", e)
+    if _write_pool is not None:
+        try:
+            pooled = _write_pool.get_connection()
+            if pooled is not None:
+                return pooled
+        except mariadb.Error as e:
+            log.warning("Write pool connection error: %s", e)
+    # Pool exhausted or unavailable: a dedicated connection, closed at teardown
+    return get_db_connection()
+
+
+def get_write_connection():
+    """This request thread's own primary connection (borrowed on first use)."""
+    write_conn = getattr(_write_state, "conn", None)
+    if write_conn is None:
+        try:
+            write_conn = _borrow_write_connection()
+        except mariadb.Error:
+            log.exception("Write connection error")
+            return None
+        _write_state.conn = write_conn
+    return write_conn
+
+
+def get_write_cursor():
+    """Cursor on get_write_connection(), or None if no connection could be made."""
+    write_conn = get_write_connection()
+    if write_conn is None:
+        return None
+    try:
+        return TimedCursor(write_conn.cursor())
+    except mariadb.Error:
+        # Dead connection: drop it and try once more with a fresh one
+        release_write_connection()
+        write_conn = get_write_connection()
+        return TimedCursor(write_conn.cursor()) if write_conn is not None else None
+
+
+def release_write_connection():
+    """Roll back anything uncommitted and return this thread's write connection."""
+    write_conn = getattr(_write_state, "conn", None)
+    _write_state.conn = None
+    if write_conn is not None:
+        try:
+            write_conn.rollback()
+        except mariadb.Error:
+            pass
+        try:
+            write_conn.close()
+        except mariadb.Error:
+            pass
+
+
+# -------- READ ROUTING --------
+# One mariadb.ConnectionPool per replica. A request thread borrows one
+# connection on its first get_read_cursor() and gives it back in
+# release_read_connection() (called at request teardown).
+
+_replicas = []          # [{"host", "pool", "healthy", "lag"}]
+_replica_cycle = None
+_read_state = threading.local()
+_monitor_started = False
+
+
+def _split_host(host):
+    name, _, port = host.partition(":")
+    return name, int(port or DB_PORT)
+
+
+def init_read_replicas():
+    """Create the replica pools and start the lag monitor (idempotent)."""
+    global _replica_cycle, _monitor_started
+    if _replicas or not DB_READ_HOSTS:
+        return
+    for i, host in enumerate(DB_READ_HOSTS):
+        name, port = _split_host(host)
+        try:
+            pool = mariadb.ConnectionPool(
+                pool_name=f"ecobite_read_{i}",
+                pool_size=DB_READ_POOL_SIZE,
+                # Returned connections are reset, so no REPEATABLE READ
+                # snapshot leaks from one request into the next
+                pool_reset_connection=True,
+                host=name,
+                port=port,
+                user=DB_READ_USER,
+                password=DB_READ_PASSWORD,
+                database=DB_NAME,
+            )
+        except mariadb.Error as e:
+            log.error("Replica pool error: %s", e, extra={"host": host})
+            continue
+        # Unhealthy until the first lag check passes
+        _replicas.append({"host": host, "pool": pool, "healthy": False, "lag": None})
+    _replica_cycle = itertools.cycle(range(len(_replicas))) if _replicas else None
+    if _replicas and not _monitor_started:
+        _monitor_started = True
+        check_replica_lag()
+        threading.Thread(target=_monitor_replicas, name="replica-lag", daemon=True).start()
+
+
+def check_replica_lag():
+    """Refresh each replica's health from SHOW SLAVE STATUS."""
+    for replica in _replicas:
+        name, port = _split_host(replica["host"])
+        lag = None
+        try:
+            # Dedicated short-lived connection: a pooled one may be busy
+            c = mariadb.connect(
+                host=name, port=port, user=DB_READ_USER,
+                password=DB_READ_PASSWORD, database=DB_NAME, connect_timeout=2,
+            )
+            try:
+                cur = c.cursor(dictionary=True)
+                cur.execute("SHOW SLAVE STATUS")
+                row = cur.fetchone()
+                # NULL lag = replication stopped/broken
+                lag = row.get("Seconds_Behind_Master") if row else None
+            finally:
+                c.close()
+        except mariadb.Error as e:
+            log.warning("Replica lag check failed: %s", e, extra={"host": replica["host"]})
+        replica["lag"] = lag
+        healthy = lag is not None and lag <= DB_REPLICA_MAX_LAG
+        if replica["healthy"] and not healthy:
+            log.warning("Replica out of rotation", extra={"host": replica["host"], "lag": lag})
+        replica["healthy"] = healthy
+
+
+def _monitor_replicas():
+    while True:
+        time.sleep(DB_REPLICA_CHECK_INTERVAL)
+        try:
+            check_replica_lag()
+        except Exception:
+            log.exception("Replica monitor error")
+
+
+def route_reads_to_primary(flag):
+    """Send this thread's get_read_cursor() calls to the primary (read-your-writes)."""
+    _read_state.primary = flag
+
+
+def reading_own_writes():
+    """True inside this thread's read-your-writes window (see route_reads_to_primary)."""
+    return getattr(_read_state, "primary", False)
+
+
+def _borrow_replica_connection():
+    for _ in range(len(_replicas)):
+        replica = _replicas[next(_replica_cycle)]
+        if not replica["healthy"]:
+            continue
+        try:
+            return replica["pool"].get_connection()
+        except mariadb.Error as e:
+            # Pool exhausted or replica down: try the next one
+            log.warning("Replica connection error: %s", e, extra={"host": replica["host"]})
+    return None
+
+
+def get_read_cursor():
+    """
+    Cursor for read-only queries: a healthy replica if one is configured,
+    otherwise (or during this user's read-your-writes window) the primary.
+    """
+    if not _replicas or getattr(_read_state, "primary", False):
+        return get_cursor()
+    read_conn = getattr(_read_state, "conn", None)
+    if read_conn is None:
+        read_conn = _borrow_replica_connection()
+        if read_conn is None:
+            return get_cursor()
+        _read_state.conn = read_conn
+    try:
+        return TimedCursor(read_conn.cursor())
+    except mariadb.Error:
+        release_read_connection()
+        return get_cursor()
+
+
+def release_read_connection():
+    """Return this thread's replica connection to its pool."""
+    read_conn = getattr(_read_state, "conn", None)
+    _read_state.conn = None
+    _read_state.primary = False
+    if read_conn is not None:
+        try:
+            read_conn.close()
+        except mariadb.Error:
+            pass
+
+
+def replica_status():
+    return [
+        {"host": r["host"], "healthy": r["healthy"], "lag": r["lag"]} for r in _replicas
+    ]
+
+
+# -------- PARALLEL READS --------
+# run_parallel() sends independent SELECTs to separate pooled connections
+# at once, so a request waits for the slowest query instead of the sum:
+#
+#     res = run_parallel({
+#         "post":   ("SELECT * FROM posts WHERE id=?", (post_id,)),
+#         "claims": ("SELECT * FROM claims WHERE post_id=?", (post_id,)),
+#     })
+#     res["post"], res["claims"]   # dict_rows() lists
+#
+# Connections come from a healthy replica (same rules as get_read_cursor)
+# or from a primary pool sized to the worker count, never from the global
+# `conn`, which isn't safe to share between threads.
+
+class QueryDeadlineExceeded(Exception):
+    """A run_parallel() batch did not finish within its timeout."""
+
+
+_parallel_pool = None
+_parallel_executor = None
+_parallel_lock = threading.Lock()
+# Executor threads reserved by batches in flight (see _reserve_workers)
+_parallel_busy = 0
+
+
+def _reserve_workers(n):
+    """
+    Claim `n` executor threads, or return False if fewer are free. A batch
+    only goes to the executor when every query can start at once, so its
+    deadline never includes time spent queued behind other requests.
+    """
+    global _parallel_busy
+    with _parallel_lock:
+        if _parallel_busy + n > DB_PARALLEL_WORKERS:
+            return False
+        _parallel_busy += n
+        return True
+
+
+def _release_worker(_future=None):
+    global _parallel_busy
+    with _parallel_lock:
+        _parallel_busy -= 1
+
+
+def _parallel_resources():
+    """(primary pool, executor), created on first use; (None, None) if unavailable."""
+    global _parallel_pool, _parallel_executor
+    if DB_PARALLEL_WORKERS <= 0:
+        return None, None
+    with _parallel_lock:
+        if _parallel_executor is None:
+            try:
+                _parallel_pool = mariadb.ConnectionPool(
+                    pool_name="ecobite_parallel",
+                    pool_size=DB_PARALLEL_WORKERS,
+                    pool_reset_connection=True,
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    database=DB_NAME,
+                )
+            except mariadb.Error as e:
+                log.error("Parallel query pool error: %s", e)
+                return None, None
+            _parallel_executor = ThreadPoolExecutor(
+                max_workers=DB_PARALLEL_WORKERS, thread_name_prefix="db-parallel"
+            )
+    return _parallel_pool, _parallel_executor
+
+
+def _run_one(sql, params, use_replica, timeout):
+    c = _borrow_replica_connection() if use_replica else None
+    if c is None:
+        c = _parallel_pool.get_connection()
+    try:
+        cur = c.cursor()
+        # Stop the server-side work too once nobody is waiting for it (the
+        # pool resets session variables when the connection goes back)
+        cur.execute(f"SET SESSION max_statement_time={timeout:.3f}")
+        cur.execute(sql, params)
+        return dict_rows(cur.fetchall(), cur.description)
+    finally:
+        c.close()  # back to its pool
+
+
+def _run_inline(queries, defaults):
+    """Run the queries one after another on this thread's read cursor."""
+    cur = get_read_cursor()
+    if cur is None:
+        raise mariadb.Error("No database connection")
+    results = {}
+    for name, (sql, params) in queries.items():
+        try:
+            cur.execute(sql, params)
+            results[name] = dict_rows(cur.fetchall(), cur.description)
+        except Exception:
+            if name not in defaults:
+                raise
+            results[name] = defaults[name]
+    return results
+
+
+def run_parallel(queries, timeout=DB_PARALLEL_TIMEOUT, defaults=None):
+    """
+    Run independent read queries concurrently.
+
+    queries : {name: (sql, params)}
+    defaults: {name: value} used when that query fails (optional tables)
+    Returns {name: dict_rows list}. Raises the first other query error, or
+    QueryDeadlineExceeded if the batch takes longer than `timeout`.
+
+    A lone query, or a batch arriving while the executor hasn't enough free
+    threads for all of it, runs inline on this thread instead.
+    """
+    defaults = defaults or {}
+    pool, executor = _parallel_resources()
+    # A lone query gains nothing from a thread hop: run it on this thread
+    if executor is None or len(queries) < 2 or not _reserve_workers(len(queries)):
+        return _run_inline(queries, defaults)
+
+    # The read-your-writes decision belongs to the calling request thread
+    use_replica = bool(_replicas) and not getattr(_read_state, "primary", False)
+    started = time.perf_counter()
+    futures = {}
+    for name, (sql, params) in queries.items():
+        future = executor.submit(_run_one, sql, params, use_replica, timeout)
+        # Frees the reserved thread when the query ends, late or not
+        future.add_done_callback(_release_worker)
+        futures[future] = name
+    done, pending = wait(futures, timeout=timeout)
+    # The batch costs the request its wall time, not the sum of the queries
+    _record_query(time.perf_counter() - started, len(queries))
+    if pending:
+        # Every query started straight away, so these are running: the
+        # server stops them at max_statement_time, freeing their connections
+        raise QueryDeadlineExceeded(
+            "queries still running after {:.1f}s: {}".format(
+                timeout, ", ".join(sorted(futures[f] for f in pending))
+            )
+        )
+
+    results = {}
+    for f, name in futures.items():
+        try:
+            results[name] = f.result()
+        except Exception:
+            if name not in defaults:
+                raise
+            results[name] = defaults[name]
+    return results
 
 
 def dict_rows(rows, description):
@@ -96,6 +594,186 @@ def dict_rows(rows, description):
     return out
 
 
+# -------- CHANGE LOG --------
+# Every write to posts/claims appends a row to `changes` inside the same
+# transaction. changes.id is the monotonically increasing version clients
+# pass back to GET /api/changes?since=<version>.
+
+CHANGE_INSERT = "insert"
+CHANGE_UPDATE = "update"
+CHANGE_DELETE = "delete"
+
+
+# How long data_version() may reuse its last answer. Writes made by this
+# process reset it on commit_changes(); other processes are seen within this window.
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "1.0"))
+
+_data_version = {"value": 0, "checked": 0.0}
+
+# Seconds a gap in change-log ids may belong to a transaction that has not
+# committed yet (see changes_since)
+CHANGE_LOG_GRACE = int(os.getenv("CHANGE_LOG_GRACE", "10"))
+
+
+def data_version(cur=None):
+    """
+    Latest change-log id: a cheap cache key that moves on every write to
+    posts/claims. Memoized for DATA_VERSION_TTL seconds.
+    """
+    now = time.monotonic()
+    if now - _data_version["checked"] < DATA_VERSION_TTL:
+        return _data_version["value"]
+    cur = cur or get_cursor()
+    try:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM changes")
+        _data_version["value"] = cur.fetchone()[0]
+        _data_version["checked"] = now
+    except Exception:
+        # Unknown version: force a miss rather than serve something stale
+        return None
+    return _data_version["value"]
+
+
+def _invalidate_data_version():
+    _data_version["checked"] = 0.0
+
+
+# Called with the connection after every commit_changes() in this process
+_commit_listeners = []
+
+
+def on_commit(listener):
+    """Register listener(connection) to run after each local commit_changes()."""
+    _commit_listeners.append(listener)
+    return listener
+
+
+def commit_changes(connection):
+    """
+    Commit a transaction that recorded changes, then drop the data_version()
+    memo. Dropping it before the commit would let another request re-read
+    (and keep for DATA_VERSION_TTL) the version from before this write.
+    """
+    connection.commit()
+    _invalidate_data_version()
+    for listener in _commit_listeners:
+        try:
+            listener(connection)
+        except Exception:
+            # The write is committed; a listener must not fail the request
+            log.exception("Commit listener error")
+
+
+def record_change(cur, entity, entity_id, op):
+    """Append one change-log row. Commit with commit_changes()."""
+    cur.execute(
+        "INSERT INTO changes (entity, entity_id, op) VALUES (?, ?, ?)",
+        (entity, entity_id, op),
+    )
+
+
+def record_changes(cur, entity, entity_ids, op):
+    """Append change-log rows for many ids of the same entity in one round trip."""
+    rows = [(entity, entity_id, op) for entity_id in entity_ids]
+    if rows:
+        cur.executemany(
+            "INSERT INTO changes (entity, entity_id, op) VALUES (?, ?, ?)",
+            rows,
+        )
+
+
+def changes_since(cur, since, limit=500):
+    """
+    Return (changes, version) for change-log rows newer than `since`.
+
+    `changes` is a list of (entity, entity_id, op) tuples in log order and
+    `version` is the id of the last row read (or `since` if none).
+
+    Ids are handed out at INSERT but become visible at COMMIT, so id N+1
+    can be readable while N is still in flight. Reading stops before any
+    gap in the ids that is younger than CHANGE_LOG_GRACE seconds: the
+    missing row may still commit, and a cursor moved past it would never
+    see it. Older gaps are rolled-back transactions and are skipped.
+    """
+    cur.execute(
+        """
+        SELECT id, entity, entity_id, op,
+               created_at < NOW() - INTERVAL ? SECOND AS settled
+        FROM changes
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        (CHANGE_LOG_GRACE, since, limit),
+    )
+    changes = []
+    version = since
+    for row_id, entity, entity_id, op, settled in cur.fetchall():
+        if row_id != version + 1 and not settled:
+            break
+        changes.append((entity, entity_id, op))
+        version = row_id
+    return changes, version
+
+
+def settled_version(cur):
+    """
+    Change-log id a full reload can safely resume from: rows newer than
+    CHANGE_LOG_GRACE seconds may sit behind still-uncommitted ids, so they
+    are replayed through changes_since() after the load.
+    """
+    cur.execute(
+        """
+        SELECT COALESCE(MAX(id), 0) FROM changes
+        WHERE created_at < NOW() - INTERVAL ? SECOND
+        """,
+        (CHANGE_LOG_GRACE,),
+    )
+    return cur.fetchone()[0]
+
+
+def _first_value(rows, default=None):
+    """First column of the first dict_rows() row (a COUNT/SUM result)."""
+    if not rows:
+        return default
+    value = next(iter(rows[0].values()))
+    return default if value is None else value
+
+
+def _archived_row(rows):
+    """
+    Totals for posts/claims already moved out by archive_posts.py, so stats
+    don't drop when history is archived (user_id 0 holds the global row).
+    Returns (posts_created, posts_shared, weight_shared_kg, claims_made,
+    claims_accepted, claims_rejected), zeros if nothing is archived.
+    """
+    if not rows:
+        return (0, 0, 0.0, 0, 0, 0)
+    r = rows[0]
+    return (r["posts_created"], r["posts_shared"], r["weight_shared_kg"],
+            r["claims_made"], r["claims_accepted"], r["claims_rejected"])
+
+
+def empty_stats(user_id=None):
+    """All-zero stats with compute_stats()'s keys, for when it can't run."""
+    if user_id is None:
+        return {
+            "available_now": 0,
+            "successfully_shared": 0,
+            "total_posts": 0,
+            "food_waste_prevented_kg": 0.0,
+        }
+    return {
+        "posts_created": 0,
+        "posts_shared": 0,
+        "weight_shared_kg": 0.0,
+        "claims_made": 0,
+        "claims_accepted": 0,
+        "claims_rejected": 0,
+        "join_date": None,
+    }
+
+
 def compute_stats(user_id=None):
     """
     Compute simple stats either globally or for a specific user.
@@ -103,133 +781,121 @@ def compute_stats(user_id=None):
       - status
       - estimated_weight_kg
       - user_id
+    Query errors (and QueryDeadlineExceeded) propagate, so a failure is
+    never cached as zeros; callers fall back to empty_stats().
     """
-    cur = get_cursor()
     stats = {}
 
-    if cur is None:
-        # if DB totally broken, just return zeros
-        defaults = {
-            "available_now": 0,
-            "successfully_shared": 0,
-            "total_posts": 0,
-            "food_waste_prevented_kg": 0.0,
-            "posts_created": 0,
-            "posts_shared": 0,
-            "weight_shared_kg": 0.0,
-            "claims_made": 0,
-            "claims_accepted": 0,
-            "claims_rejected": 0,
-            "join_date": None,
-        }
-        return defaults if user_id else {
-            k: defaults[k] for k in
-            ["available_now", "successfully_shared", "total_posts", "food_waste_prevented_kg"]
-        }
+    # Every count is an independent query: run them side by side
+    archived_sql = """
+        SELECT posts_created, posts_shared, weight_shared_kg,
+               claims_made, claims_accepted, claims_rejected
+        FROM archived_stats WHERE user_id=?
+    """
+    # archived_stats may not exist yet (archive_posts.py never run)
+    optional = {"archived": []}
 
     # ------- GLOBAL STATS -------
     if user_id is None:
-        try:
+        res = run_parallel({
             # Available now
-            cur.execute(
+            "available_now": (
                 """
                 SELECT COUNT(*) FROM posts
                 WHERE status='active'
                   AND (expires_at IS NULL OR expires_at > NOW())
-                """
-            )
-            stats["available_now"] = cur.fetchone()[0]
-
+                """,
+                (),
+            ),
             # Successfully shared
-            cur.execute(
-                "SELECT COUNT(*) FROM posts WHERE status IN ('claimed', 'completed')"
-            )
-            stats["successfully_shared"] = cur.fetchone()[0]
-
+            "successfully_shared": (
+                "SELECT COUNT(*) FROM posts WHERE status IN ('claimed', 'completed')",
+                (),
+            ),
             # Total posts
-            cur.execute("SELECT COUNT(*) FROM posts")
-            stats["total_posts"] = cur.fetchone()[0]
-
+            "total_posts": ("SELECT COUNT(*) FROM posts", ()),
             # Food waste prevented
-            cur.execute(
+            "food_waste_prevented_kg": (
                 """
                 SELECT SUM(estimated_weight_kg)
                 FROM posts
                 WHERE status IN ('claimed', 'completed')
-                """
-            )
-            weight = cur.fetchone()[0]
-            stats["food_waste_prevented_kg"] = float(weight) if weight else 0.0
-        except Exception:
-            stats.setdefault("available_now", 0)
-            stats.setdefault("successfully_shared", 0)
-            stats.setdefault("total_posts", 0)
-            stats.setdefault("food_waste_prevented_kg", 0.0)
+                """,
+                (),
+            ),
+            "archived": (archived_sql, (0,)),
+        }, defaults=optional)
+
+        stats["available_now"] = _first_value(res["available_now"], 0)
+        stats["successfully_shared"] = _first_value(res["successfully_shared"], 0)
+        stats["total_posts"] = _first_value(res["total_posts"], 0)
+        weight = _first_value(res["food_waste_prevented_kg"])
+        stats["food_waste_prevented_kg"] = float(weight) if weight else 0.0
+
+        archived = _archived_row(res["archived"])
+        stats["total_posts"] += archived[0]
+        stats["successfully_shared"] += archived[1]
+        stats["food_waste_prevented_kg"] += float(archived[2])
         return stats
 
     # ------- PER-USER STATS -------
-    try:
+    res = run_parallel({
         # Posts created
-        cur.execute("SELECT COUNT(*) FROM posts WHERE user_id=?", (user_id,))
-        stats["posts_created"] = cur.fetchone()[0]
-
+        "posts_created": ("SELECT COUNT(*) FROM posts WHERE user_id=?", (user_id,)),
         # Posts shared
-        cur.execute(
+        "posts_shared": (
             """
             SELECT COUNT(*) FROM posts
             WHERE user_id=? AND status IN ('claimed', 'completed')
             """,
             (user_id,),
-        )
-        stats["posts_shared"] = cur.fetchone()[0]
-
+        ),
         # Weight shared
-        cur.execute(
+        "weight_shared_kg": (
             """
             SELECT SUM(estimated_weight_kg)
             FROM posts
             WHERE user_id=? AND status IN ('claimed', 'completed')
             """,
             (user_id,),
-        )
-        weight = cur.fetchone()[0]
-        stats["weight_shared_kg"] = float(weight) if weight else 0.0
-
+        ),
         # Claims made
-        cur.execute("SELECT COUNT(*) FROM claims WHERE claimer_id=?", (user_id,))
-        stats["claims_made"] = cur.fetchone()[0]
-
+        "claims_made": ("SELECT COUNT(*) FROM claims WHERE claimer_id=?", (user_id,)),
         # Claims accepted
-        cur.execute(
+        "claims_accepted": (
             """
             SELECT COUNT(*) FROM claims
             WHERE claimer_id=? AND status='approved'
             """,
             (user_id,),
-        )
-        stats["claims_accepted"] = cur.fetchone()[0]
-
+        ),
         # Claims rejected
-        cur.execute(
+        "claims_rejected": (
             """
             SELECT COUNT(*) FROM claims
             WHERE claimer_id=? AND status='rejected'
             """,
             (user_id,),
-        )
-        stats["claims_rejected"] = cur.fetchone()[0]
-
+        ),
         # Join date
-        cur.execute("SELECT created_at FROM users WHERE id=?", (user_id,))
-        row = cur.fetchone()
-        stats["join_date"] = row[0] if row else None
-    except Exception:
-        stats.setdefault("posts_created", 0)
-        stats.setdefault("posts_shared", 0)
-        stats.setdefault("weight_shared_kg", 0.0)
-        stats.setdefault("claims_made", 0)
-        stats.setdefault("claims_accepted", 0)
-        stats.setdefault("claims_rejected", 0)
-        stats.setdefault("join_date", None)
-
+        "join_date": ("SELECT created_at FROM users WHERE id=?", (user_id,)),
+        "archived": (archived_sql, (user_id,)),
+    }, defaults=optional)
+
+    stats["posts_created"] = _first_value(res["posts_created"], 0)
+    stats["posts_shared"] = _first_value(res["posts_shared"], 0)
+    weight = _first_value(res["weight_shared_kg"])
+    stats["weight_shared_kg"] = float(weight) if weight else 0.0
+    stats["claims_made"] = _first_value(res["claims_made"], 0)
+    stats["claims_accepted"] = _first_value(res["claims_accepted"], 0)
+    stats["claims_rejected"] = _first_value(res["claims_rejected"], 0)
+    stats["join_date"] = _first_value(res["join_date"])
+
+    archived = _archived_row(res["archived"])
+    stats["posts_created"] += archived[0]
+    stats["posts_shared"] += archived[1]
+    stats["weight_shared_kg"] += float(archived[2])
+    stats["claims_made"] += archived[3]
+    stats["claims_accepted"] += archived[4]
+    stats["claims_rejected"] += archived[5]
     return stats
@@ -0,0 +1,200 @@
+"""
+Pub/sub helpers for the /api/events Server-Sent Events stream.
+
+Routes call publish() *after* a successful commit; every open stream that
+belongs to one of the affected users receives the event.
+
+How events reach the streams is decided by the adapter:
+    - LocalAdapter  (default) : in-process only, fine for a single worker
+    - SpoolAdapter            : append-only file shared by every worker on
+                                the same host (local stand-in for a real
+                                broker such as Redis pub/sub)
+
+Pick one with EVENTS_ADAPTER=local|spool (EVENTS_SPOOL_PATH for the file).
+SSE keeps a connection open per browser tab, so run gunicorn with a
+threaded worker class (e.g. --worker-class gthread --threads 8).
+"""
+
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
+# -------- EVENTS CONFIG --------
+EVENTS_ADAPTER = os.getenv("EVENTS_ADAPTER", "local")
+EVENTS_SPOOL_PATH = os.getenv(
+    "EVENTS_SPOOL_PATH",
+    os.path.join(tempfile.gettempdir(), "ecobite-events.spool"),
+)
+# Truncate the spool file once it grows past this many bytes
+EVENTS_SPOOL_MAX_BYTES = int(os.getenv("EVENTS_SPOOL_MAX_BYTES", str(5 * 1024 * 1024)))
+# Max undelivered events per open stream before we start dropping
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+
+# Event names pushed to clients
+CLAIM_CREATED = "claim.created"
+CLAIM_DECIDED = "claim.decided"
+CLAIM_CANCELLED = "claim.cancelled"
+POST_STATUS_CHANGED = "post.status_changed"
+
+
+class LocalAdapter:
+    """Deliver events straight to subscribers of this process."""
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def send(self, message):
+        self._deliver(message)
+
+
+class SpoolAdapter:
+    """
+    Fan events out across worker processes through an append-only file.
+
+    Every process appends one JSON line per event and runs a tail thread
+    that delivers new lines to its own subscribers (including the process
+    that wrote them, so nothing is delivered twice).
+    """
+
+    def __init__(self, path=EVENTS_SPOOL_PATH, max_bytes=EVENTS_SPOOL_MAX_BYTES,
+                 poll_interval=0.2):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self._write_lock = threading.Lock()
+
+    def start(self, deliver):
+        self._deliver = deliver
+        # Touch the file so the tail thread can open it
+        open(self.path, "a").close()
+        t = threading.Thread(target=self._tail, name="events-spool", daemon=True)
+        t.start()
+
+    def send(self, message):
+        line = json.dumps(message, default=str) + "\n"
+        with self._write_lock:
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    # Readers notice the shrink and restart from offset 0
+                    open(self.path, "w").close()
+            except OSError:
+                pass
+            # O_APPEND keeps concurrent single-line writes from interleaving
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+
+    def _tail(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.seek(0, os.SEEK_END)
+            buf = ""
+            while True:
+                chunk = f.readline()
+                if chunk:
+                    buf += chunk
+                    if not buf.endswith("\n"):
+                        # Partial line, wait for the writer to finish it
+                        continue
+                    try:
+                        self._deliver(json.loads(buf))
+                    except ValueError:
+                        pass
+                    buf = ""
+                    continue
+
+                try:
+                    if os.path.getsize(self.path) < f.tell():
+                        f.seek(0)
+                        buf = ""
+                except OSError:
+                    pass
+                time.sleep(self.poll_interval)
+
+
+class EventBroker:
+    """In-process pub/sub: one bounded queue per open SSE stream."""
+
+    def __init__(self, adapter=None):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._adapter = adapter or LocalAdapter()
+        self._adapter.start(self._deliver)
+
+    def subscribe(self, user_id):
+        q = queue.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            subs = self._subscribers.get(user_id)
+            if subs:
+                subs.discard(q)
+                if not subs:
+                    del self._subscribers[user_id]
+
+    def publish(self, event, data, user_ids):
+        """Send `event` with JSON-serialisable `data` to every user in user_ids."""
+        users = sorted({u for u in user_ids if u is not None})
+        if not users:
+            return
+        message = {
+            "id": uuid.uuid4().hex,
+            "event": event,
+            "data": data,
+            "users": users,
+        }
+        try:
+            self._adapter.send(message)
+        except Exception:
+            # Events are best-effort; never fail the request that published
+            log.exception("Event publish error")
+
+    def _deliver(self, message):
+        with self._lock:
+            targets = [
+                q
+                for uid in message.get("users", [])
+                for q in self._subscribers.get(uid, ())
+            ]
+        for q in targets:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # Slow consumer: drop, the client resyncs on its next reload
+                pass
+
+
+def format_sse(message):
+    """Serialise a broker message into the text/event-stream wire format."""
+    payload = json.dumps(message["data"], default=str)
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {payload}\n\n"
+
+
+def _make_adapter(name):
+    if name == "spool":
+        return SpoolAdapter()
+    return LocalAdapter()
+
+
+# Global broker used by the rest of the app
+broker = EventBroker(_make_adapter(EVENTS_ADAPTER))
+
+
+def publish(event, data, user_ids):
+    """Shortcut for broker.publish() on the global broker."""
+    broker.publish(event, data, user_ids)
@@ -0,0 +1,193 @@
+"""
+In-process index of the active feed (status='active', not expired).
+
+There are only a few thousand live posts, so the "available" feed is
+answered from memory instead of a join + sort per request:
+
+    posts = active_posts(cur, category="Meals", dietary="Vegan",
+                         search="rice", sort="endingSoon")
+    # None -> index not loaded (or the user's read-your-writes window
+    #         is open), use the database
+
+Each post is a PostRecord (__slots__) holding its ready-to-serialize
+payload (same shape as the SQL path: p.* + owner_email/ownerEmail) plus
+the fields the filters need. The index keeps:
+    - two orderings: created_at DESC and expires_at ASC (NULLs first,
+      like MariaDB), as sorted key lists maintained with bisect
+    - buckets: category -> ids, dietary tag -> ids
+
+Loading and change-log syncing come from index_utils.ChangeLogIndex.
+"""
+
+import bisect
+import json
+import logging
+import os
+from datetime import datetime
+
+from db_utils import reading_own_writes
+from index_utils import ChangeLogIndex, is_live
+
+log = logging.getLogger(__name__)
+
+FEED_SYNC_INTERVAL = float(os.getenv("FEED_SYNC_INTERVAL", "1.0"))
+FEED_EXPIRE_SWEEP = float(os.getenv("FEED_EXPIRE_SWEEP", "30"))
+
+_NEG_INF = float("-inf")
+
+
+class PostRecord:
+    __slots__ = ("id", "created_key", "expires_key", "expires_at",
+                 "category", "tags", "dietary", "haystack", "payload")
+
+    def __init__(self, row):
+        self.id = row["id"]
+        created = row.get("created_at")
+        self.created_key = (-(created.timestamp() if created else 0.0), self.id)
+        self.expires_at = row.get("expires_at")
+        self.expires_key = (
+            self.expires_at.timestamp() if self.expires_at else _NEG_INF, self.id
+        )
+        self.category = row.get("category")
+        self.dietary = (row.get("dietary_json") or "").lower()
+        try:
+            tags = json.loads(row.get("dietary_json") or "[]")
+        except (TypeError, ValueError):
+            tags = []
+        self.tags = frozenset(str(t).lower() for t in tags) if isinstance(tags, list) else frozenset()
+        self.haystack = f"{row.get('title') or ''}\n{row.get('description') or ''}".lower()
+        row["ownerEmail"] = row.get("owner_email")
+        self.payload = row
+
+
+def _remove_key(keys, key):
+    i = bisect.bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+
+class FeedIndex(ChangeLogIndex):
+    """Active posts with created/expires orderings and category/tag buckets."""
+
+    SELECT_SQL = """
+        SELECT p.*, u.email AS owner_email
+        FROM posts p
+        JOIN users u ON p.user_id = u.id
+    """
+    sync_interval = FEED_SYNC_INTERVAL
+    sweep_interval = FEED_EXPIRE_SWEEP
+
+    def __init__(self):
+        super().__init__()
+        self.records = {}        # id -> PostRecord
+        self.by_created = []     # sorted (created_key, id) ... newest first
+        self.by_expires = []     # sorted (expires_key, id) ... ending soonest first
+        self.by_category = {}    # category -> set(ids)
+        self.by_tag = {}         # lowercased dietary tag -> set(ids)
+
+    # ---------- maintenance ----------
+
+    def _bucket_add(self, rec):
+        self.by_category.setdefault(rec.category, set()).add(rec.id)
+        for tag in rec.tags:
+            self.by_tag.setdefault(tag, set()).add(rec.id)
+
+    def _remove(self, post_id):
+        rec = self.records.pop(post_id, None)
+        if rec is None:
+            return
+        _remove_key(self.by_created, rec.created_key)
+        _remove_key(self.by_expires, rec.expires_key)
+        for bucket, key in [(self.by_category, rec.category)] + [(self.by_tag, t) for t in rec.tags]:
+            ids = bucket.get(key)
+            if ids is not None:
+                ids.discard(post_id)
+                if not ids:
+                    del bucket[key]
+
+    def _load(self, rows, now):
+        self.records, self.by_category, self.by_tag = {}, {}, {}
+        for row in rows:
+            rec = PostRecord(row)
+            self.records[rec.id] = rec
+            self._bucket_add(rec)
+        self.by_created = sorted(r.created_key for r in self.records.values())
+        self.by_expires = sorted(r.expires_key for r in self.records.values())
+
+    def _apply(self, post_ids, rows, now):
+        for post_id in post_ids:
+            self._remove(post_id)
+        for row in rows:
+            if is_live(row, now):
+                rec = PostRecord(row)
+                self.records[rec.id] = rec
+                bisect.insort(self.by_created, rec.created_key)
+                bisect.insort(self.by_expires, rec.expires_key)
+                self._bucket_add(rec)
+
+    def _sweep(self, now):
+        # by_expires is ordered by expiry, so expired posts sit right after
+        # the no-expiry (-inf) block
+        i = bisect.bisect_left(self.by_expires, (_NEG_INF, float("inf")))
+        expired = []
+        for ts, post_id in self.by_expires[i:]:
+            if ts > now.timestamp():
+                break
+            expired.append(post_id)
+        for post_id in expired:
+            self._remove(post_id)
+
+    # ---------- queries ----------
+
+    def query(self, category=None, dietary=None, search=None, sort="newest", limit=None):
+        """Payload dicts for live posts matching the filters, or None if not loaded."""
+        if not self.ready:
+            return None
+        now = datetime.now()
+        search = (search or "").strip().lower()
+        dietary = (dietary or "").strip().lower()
+
+        with self._lock:
+            allowed = None
+            if category:
+                allowed = self.by_category.get(category, set())
+            if dietary and dietary in self.by_tag:
+                tagged = self.by_tag[dietary]
+                allowed = tagged if allowed is None else allowed & tagged
+                dietary = ""  # satisfied by the bucket
+
+            ordering = self.by_expires if sort == "endingSoon" else self.by_created
+            out = []
+            for _, post_id in ordering:
+                if allowed is not None and post_id not in allowed:
+                    continue
+                rec = self.records[post_id]
+                if rec.expires_at is not None and rec.expires_at <= now:
+                    continue
+                if search and search not in rec.haystack:
+                    continue
+                if dietary and dietary not in rec.dietary:
+                    continue
+                out.append(rec.payload)
+                if limit and len(out) >= limit:
+                    break
+        return out
+
+
+# Global index used by the feed routes
+feed = FeedIndex()
+
+
+def active_posts(cur, **filters):
+    """Sync the feed index and query it; None means fall back to SQL."""
+    # Read-your-writes window: the index may still trail this user's write
+    # (e.g. behind an unsettled change-log gap), the database does not
+    if reading_own_writes():
+        return None
+    if cur is not None:
+        try:
+            feed.sync(cur)
+        except Exception:
+            # A stale index is still better than failing the feed
+            log.exception("Feed index sync error")
+    return feed.query(**filters)
@@ -0,0 +1,182 @@
+"""
+HTTP helpers shared by the app: Accept-* negotiation, conditional GET
+validators and response compression.
+
+init_compression(app) registers an after_request hook that gzip/brotli
+encodes responses when the client asks for it:
+    - only compressible types (JSON, HTML, CSS/JS, text, SVG)
+    - buffered bodies smaller than COMPRESS_MIN_SIZE are left alone
+    - streamed bodies (CSV export, ...) are compressed chunk by chunk and
+      flushed after every chunk so they still arrive incrementally
+    - responses that already have a Content-Encoding (precompressed
+      static assets), file passthroughs, event streams and anything
+      marked Cache-Control: no-transform are skipped
+"""
+
+import gzip
+import hashlib
+import os
+import zlib
+from datetime import timezone
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+# Brotli 4-5 is roughly gzip-6 speed with a better ratio
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+# text/* is compressible except for these
+UNCOMPRESSED_TEXT_TYPES = {"text/event-stream"}
+
+
+def accepts(header_value, token):
+    """True if a comma-separated Accept* header lists `token` with q > 0."""
+    for part in (header_value or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() != token:
+            continue
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+# ---------- CONDITIONAL GET ----------
+
+def make_etag(*parts):
+    """Opaque ETag value from the parts that identify a representation."""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+
+
+def _utc(dt):
+    return dt.replace(tzinfo=timezone.utc, microsecond=0) if dt else None
+
+
+def set_validators(resp, etag, last_modified=None):
+    """Attach ETag/Last-Modified; clients must revalidate before reuse."""
+    resp.set_etag(etag)
+    if last_modified:
+        resp.last_modified = _utc(last_modified)
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Return a 304 response if the request's If-None-Match (or, without it,
+    If-Modified-Since) matches the current validators, else None.
+    """
+    if request.if_none_match:
+        # Weak comparison: compression downgrades our ETags to weak ones
+        if not request.if_none_match.contains_weak(etag):
+            return None
+    elif not (
+        last_modified
+        and request.if_modified_since
+        and _utc(last_modified) <= request.if_modified_since
+    ):
+        return None
+    return set_validators(Response(status=304), etag, last_modified)
+
+
+# ---------- COMPRESSION ----------
+
+def choose_encoding(accept_encoding):
+    """Best supported Content-Encoding for an Accept-Encoding header, or None."""
+    if brotli is not None and accepts(accept_encoding, "br"):
+        return "br"
+    if accepts(accept_encoding, "gzip"):
+        return "gzip"
+    return None
+
+
+def _compressible(mimetype):
+    if not mimetype:
+        return False
+    if mimetype.startswith("text/"):
+        return mimetype not in UNCOMPRESSED_TEXT_TYPES
+    return mimetype in COMPRESSIBLE_TYPES or mimetype.endswith("+json")
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL)
+
+
+def _compress_stream(chunks, encoding):
+    """Re-yield a response iterable compressed, flushing after every chunk."""
+    if encoding == "br":
+        comp = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        step, flush, finish = comp.process, comp.flush, comp.finish
+    else:
+        comp = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+        step = comp.compress
+        flush = lambda: comp.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+        finish = comp.flush
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            out = step(chunk) + flush()
+            if out:
+                yield out
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+def init_compression(app):
+    @app.after_request
+    def compress_response(resp):
+        if (
+            resp.status_code < 200
+            or resp.status_code in (204, 206, 304)
+            or resp.direct_passthrough
+            or "Content-Encoding" in resp.headers
+            or "no-transform" in (resp.headers.get("Cache-Control") or "")
+            or not _compressible(resp.mimetype)
+        ):
+            return resp
+
+        resp.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is None or request.method == "HEAD":
+            return resp
+
+        if resp.is_streamed:
+            resp.response = _compress_stream(resp.response, encoding)
+            resp.headers.pop("Content-Length", None)
+        else:
+            data = resp.get_data()
+            if len(data) < COMPRESS_MIN_SIZE:
+                return resp
+            resp.set_data(_compress(data, encoding))
+
+        resp.headers["Content-Encoding"] = encoding
+        # The encoded body is a different byte sequence than the one a
+        # strong ETag describes
+        etag, weak = resp.get_etag()
+        if etag and not weak:
+            resp.set_etag(etag, weak=True)
+        return resp
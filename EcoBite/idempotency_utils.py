@@ -0,0 +1,397 @@
+"""
+Idempotency-Key support for create endpoints.
+
+    @app.route("/api/food-posts", methods=["GET", "POST"])
+    @idempotent
+    def api_food_posts(): ...
+
+When a POST carries an `Idempotency-Key` header, the first request runs
+normally and its response is kept for IDEMPOTENCY_TTL seconds. A retry with
+the same key (same user, method and path) gets that stored response back,
+marked `Idempotent-Replayed: true`, without running the view (no insert,
+no Cloudinary upload). A retry that arrives while the first request is
+still running waits for it (up to IDEMPOTENCY_WAIT_TIMEOUT, then 409).
+Reusing a key with a different request body (for forms: different fields
+or file contents) is a 422.
+
+5xx responses and exceptions are not stored, so the client can retry them.
+
+Keys are shared by every worker through the idempotency_keys table
+(migrate_db.py). A request claims its key by inserting the key's row: the
+primary key makes the insert the lock, and whoever fails it polls the row
+until the owner stores a response (or deletes the row on failure). Claims
+expire after IDEMPOTENCY_CLAIM_TTL so a crashed worker does not hold a key
+forever. In front of the table sits a bounded per-process map
+(IDEMPOTENCY_MAX_KEYS, oldest evicted): retries on the same worker wait on
+it and replay from memory without a round trip. If the table cannot be
+reached, keys are only deduplicated within the process.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, jsonify, make_response, request, session
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+# An unfinished claim older than this is taken over by the next retry
+IDEMPOTENCY_CLAIM_TTL = float(os.getenv("IDEMPOTENCY_CLAIM_TTL", "300"))
+# How often a retry re-reads a key another worker is still running
+IDEMPOTENCY_POLL_INTERVAL = float(os.getenv("IDEMPOTENCY_POLL_INTERVAL", "0.2"))
+IDEMPOTENCY_DB_POOL_SIZE = int(os.getenv("IDEMPOTENCY_DB_POOL_SIZE", "4"))
+IDEMPOTENCY_DB_TIMEOUT = int(os.getenv("IDEMPOTENCY_DB_TIMEOUT", "2"))
+# After a connect error, how long to stay process-local before retrying
+IDEMPOTENCY_DB_RETRY = float(os.getenv("IDEMPOTENCY_DB_RETRY", "30"))
+# Seconds between deletes of expired rows (per process)
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300"))
+MAX_KEY_LENGTH = 255
+
+# Response headers worth replaying
+_REPLAY_HEADERS = ("Content-Type", "Location", "ETag", "Last-Modified")
+# Bodies fingerprinted by their parsed fields instead of their raw bytes
+_FORM_MIMETYPES = ("multipart/form-data", "application/x-www-form-urlencoded")
+
+log = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "response", "expires")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None  # (status, headers, body) once stored
+        self.expires = None
+
+
+class IdempotencyStore:
+    """Bounded, TTL'd map of idempotency scope -> in-flight or finished entry."""
+
+    def __init__(self, max_keys=IDEMPOTENCY_MAX_KEYS, ttl=IDEMPOTENCY_TTL):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, scope, fingerprint):
+        """Return (entry, is_owner). The owner must call complete() or abandon()."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry is not None and entry.expires is not None and entry.expires <= now:
+                del self._entries[scope]
+                entry = None
+            if entry is not None:
+                return entry, False
+
+            entry = self._entries[scope] = _Entry(fingerprint)
+            # Evict oldest finished entries first; never drop in-flight ones
+            if len(self._entries) > self.max_keys:
+                for old_scope, old in list(self._entries.items()):
+                    if len(self._entries) <= self.max_keys:
+                        break
+                    if old.done.is_set():
+                        del self._entries[old_scope]
+            return entry, True
+
+    def complete(self, scope, entry, status, headers, body):
+        with self._lock:
+            entry.response = (status, headers, body)
+            entry.expires = time.monotonic() + self.ttl
+            self._entries.move_to_end(scope)
+        entry.done.set()
+
+    def abandon(self, scope, entry):
+        """Forget an attempt that should not be replayed (error / 5xx)."""
+        with self._lock:
+            if self._entries.get(scope) is entry:
+                del self._entries[scope]
+        entry.done.set()
+
+
+class SharedStore:
+    """
+    Claims and stored responses in the idempotency_keys table.
+
+    Like admission_utils.DbAdapter it borrows from a small pool of its own
+    (never the request's transaction) with short timeouts. Every method
+    returns None when the table cannot be used, and the caller carries on
+    with the process-local store alone.
+    """
+
+    _KEY_WHERE = "user_id=? AND method=? AND path=? AND idem_key=?"
+
+    def __init__(self):
+        self._pool = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+        self._purge_at = 0.0
+
+    def _get_pool(self):
+        import mariadb
+        from db_utils import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+
+        with self._lock:
+            if self._pool is None and time.monotonic() >= self._retry_at:
+                try:
+                    self._pool = mariadb.ConnectionPool(
+                        pool_name="ecobite_idempotency",
+                        pool_size=IDEMPOTENCY_DB_POOL_SIZE,
+                        # Every call ends in commit/rollback: skip the reset
+                        pool_reset_connection=False,
+                        host=DB_HOST,
+                        port=DB_PORT,
+                        user=DB_USER,
+                        password=DB_PASSWORD,
+                        database=DB_NAME,
+                        connect_timeout=IDEMPOTENCY_DB_TIMEOUT,
+                        read_timeout=IDEMPOTENCY_DB_TIMEOUT,
+                        write_timeout=IDEMPOTENCY_DB_TIMEOUT,
+                    )
+                except Exception:
+                    log.exception("Idempotency store error")
+                    self._retry_at = time.monotonic() + IDEMPOTENCY_DB_RETRY
+            return self._pool
+
+    def _run(self, work):
+        """Run work(cur) in its own transaction; None if the table is unusable."""
+        pool = self._get_pool()
+        if pool is None:
+            return None
+        try:
+            conn = pool.get_connection()
+        except Exception:
+            conn = None
+        if conn is None:
+            log.warning("Idempotency store busy, deduplicating in-process only")
+            return None
+
+        try:
+            result = work(conn.cursor())
+            conn.commit()
+            return result
+        except Exception:
+            log.exception("Idempotency store error")
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            return None
+        finally:
+            try:
+                conn.close()  # back to the pool
+            except Exception:
+                pass
+
+    @staticmethod
+    def _key(scope):
+        user_id, method, path, key = scope
+        return (user_id or 0, method, path, key)
+
+    def claim(self, scope, fingerprint):
+        """
+        Insert the key's row. Returns (True, None) if this request now owns
+        the key, (False, row) if another request does, row being
+        (fingerprint, status, headers, body) with status None while it
+        runs, or (False, None) if that row vanished in between.
+        """
+        import mariadb
+
+        key = self._key(scope)
+        now = time.time()
+
+        def work(cur):
+            if now >= self._purge_at:
+                self._purge_at = now + IDEMPOTENCY_PURGE_INTERVAL
+                cur.execute(
+                    "DELETE FROM idempotency_keys WHERE expires_at <= ? LIMIT 1000", (now,)
+                )
+            # An expired row (finished or abandoned by a dead worker) is free
+            cur.execute(
+                f"DELETE FROM idempotency_keys WHERE {self._KEY_WHERE} AND expires_at <= ?",
+                key + (now,),
+            )
+            try:
+                cur.execute(
+                    """
+                    INSERT INTO idempotency_keys
+                        (user_id, method, path, idem_key, fingerprint, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    key + (fingerprint, now + IDEMPOTENCY_CLAIM_TTL),
+                )
+                return True, None
+            except mariadb.IntegrityError:
+                pass
+            cur.execute(
+                f"""
+                SELECT fingerprint, status, headers, body FROM idempotency_keys
+                WHERE {self._KEY_WHERE}
+                """,
+                key,
+            )
+            row = cur.fetchone()
+            if row is None:
+                return False, None
+            stored, status, headers, body = row
+            headers = json.loads(headers) if headers else []
+            return False, (stored, status, headers, bytes(body or b""))
+
+        return self._run(work)
+
+    def complete(self, scope, status, headers, body):
+        def work(cur):
+            cur.execute(
+                f"""
+                UPDATE idempotency_keys SET status=?, headers=?, body=?, expires_at=?
+                WHERE {self._KEY_WHERE}
+                """,
+                (status, json.dumps(headers), body, time.time() + IDEMPOTENCY_TTL)
+                + self._key(scope),
+            )
+            return True
+
+        return self._run(work)
+
+    def abandon(self, scope):
+        def work(cur):
+            cur.execute(
+                f"DELETE FROM idempotency_keys WHERE {self._KEY_WHERE} AND status IS NULL",
+                self._key(scope),
+            )
+            return True
+
+        return self._run(work)
+
+
+store = IdempotencyStore()
+shared = SharedStore()
+
+
+def _replay(entry):
+    status, headers, body = entry.response
+    resp = Response(body, status=status)
+    for name, value in headers:
+        resp.headers[name] = value
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def _key_reused():
+    return jsonify({
+        "error": f"{IDEMPOTENCY_HEADER} was already used for a different request"
+    }), 422
+
+
+def _key_in_progress():
+    return jsonify({
+        "error": "A request with this Idempotency-Key is still in progress"
+    }), 409
+
+
+def _file_digest(storage):
+    """sha256 of an uploaded file, leaving it rewound for the view."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: storage.stream.read(64 * 1024), b""):
+        digest.update(chunk)
+    storage.stream.seek(0)
+    return digest.hexdigest()
+
+
+def _fingerprint():
+    """
+    Hash of the request body as the view will see it. Form posts are hashed
+    from their parsed fields and file contents: a multipart body's boundary
+    is random per send, so the raw bytes differ on every retry.
+    """
+    if request.mimetype in _FORM_MIMETYPES:
+        parts = {
+            "form": sorted(request.form.items(multi=True)),
+            "files": sorted(
+                (name, f.filename or "", _file_digest(f))
+                for name, f in request.files.items(multi=True)
+            ),
+        }
+        body = json.dumps(parts, separators=(",", ":")).encode()
+    else:
+        body = request.get_data()
+    return hashlib.sha256(body).hexdigest()
+
+
+def idempotent(view):
+    """Make a view's POSTs replay-safe under an Idempotency-Key header."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if request.method != "POST" or not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} too long"}), 400
+
+        scope = (session.get("user_id"), request.method, request.path, key)
+        fingerprint = _fingerprint()
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            entry, owner = store.begin(scope, fingerprint)
+            if owner:
+                break
+            if entry.fingerprint != fingerprint:
+                return _key_reused()
+            if not entry.done.wait(max(0.0, deadline - time.monotonic())):
+                return _key_in_progress()
+            if entry.response is not None:
+                return _replay(entry)
+            # The first attempt failed without a stored response: try to
+            # become the owner and run it ourselves
+
+        # Owner within this process; now claim the key across workers
+        while True:
+            claim = shared.claim(scope, fingerprint)
+            if claim is None or claim[0]:
+                break
+            row = claim[1]
+            if row is not None:
+                stored, status, headers, body = row
+                if stored != fingerprint:
+                    store.abandon(scope, entry)
+                    return _key_reused()
+                if status is not None:
+                    store.complete(scope, entry, status, headers, body)
+                    return _replay(entry)
+            if time.monotonic() >= deadline:
+                store.abandon(scope, entry)
+                return _key_in_progress()
+            time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+        claimed = claim is not None
+
+        try:
+            resp = make_response(view(*args, **kwargs))
+        except Exception:
+            if claimed:
+                shared.abandon(scope)
+            store.abandon(scope, entry)
+            raise
+
+        if resp.status_code >= 500 or resp.is_streamed:
+            if claimed:
+                shared.abandon(scope)
+            store.abandon(scope, entry)
+        else:
+            headers = [(h, resp.headers[h]) for h in _REPLAY_HEADERS if h in resp.headers]
+            body = resp.get_data()
+            if claimed:
+                shared.complete(scope, resp.status_code, headers, body)
+            store.complete(scope, entry, resp.status_code, headers, body)
+        return resp
+
+    return wrapper
@@ -0,0 +1,245 @@
+"""
+Offline sustainability report: food waste prevented and CO2-equivalent,
+broken down by category, dietary tag and region, over the full history
+(live + archive tables).
+
+    python impact_report.py --out reports/
+    python impact_report.py --out reports/ --since 2025-01-01 --batch-size 50000
+
+Rows are streamed through an unbuffered (server-side) cursor in fixed-size
+batches, turned into NumPy arrays and folded into running totals with
+np.bincount, so memory stays bounded by the batch size and the number of
+distinct groups, not by the table size.
+
+Writes impact_by_category.csv, impact_by_dietary_tag.csv and
+impact_by_region.csv to --out.
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+
+from db_utils import get_db_connection
+
+load_dotenv()
+
+# kg CO2e avoided per kg of food that is eaten instead of thrown away
+CO2E_PER_KG = float(os.getenv("CO2E_PER_KG", "2.5"))
+REPORT_BATCH_SIZE = int(os.getenv("REPORT_BATCH_SIZE", "20000"))
+
+# Columns of the per-group metric matrix
+POST_METRICS = ["posts", "posts_shared", "posts_expired", "kg_posted", "kg_saved", "kg_wasted"]
+CLAIM_METRICS = ["claims_made", "claims_approved"]
+
+
+class GroupTotals:
+    """Running per-group sums: a key->row index plus a growable 2-D array."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.index = {}
+        self.sums = np.zeros((16, len(metrics)))
+
+    def add(self, keys, values):
+        """
+        keys:   1-D object array of group labels, one per row
+        values: 2-D float array (rows x metrics)
+        """
+        if len(keys) == 0:
+            return
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        codes = np.array([self._code(k) for k in uniq])[inverse]
+
+        n = len(self.index)
+        if n > len(self.sums):
+            grown = np.zeros((max(n, 2 * len(self.sums)), len(self.metrics)))
+            grown[: len(self.sums)] = self.sums
+            self.sums = grown
+
+        for j in range(len(self.metrics)):
+            self.sums[:n, j] += np.bincount(codes, weights=values[:, j], minlength=n)
+
+    def _code(self, key):
+        code = self.index.get(key)
+        if code is None:
+            code = self.index[key] = len(self.index)
+        return code
+
+    def rows(self):
+        for key, code in sorted(self.index.items(), key=lambda kv: str(kv[0])):
+            yield key, self.sums[code]
+
+
+def _region(location):
+    """Coarse region: the last comma-separated part of the location text."""
+    if not location:
+        return "Unknown"
+    return location.rsplit(",", 1)[-1].strip() or "Unknown"
+
+
+def _tags(dietary_json):
+    try:
+        tags = json.loads(dietary_json) if dietary_json else []
+    except (TypeError, ValueError):
+        return []
+    return [str(t) for t in tags] if isinstance(tags, list) else []
+
+
+def _date_filter(column, since, until):
+    clauses, params = [], []
+    if since:
+        clauses.append(f"{column} >= ?")
+        params.append(since)
+    if until:
+        clauses.append(f"{column} < ?")
+        params.append(until)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _stream(conn, query, params, batch_size):
+    """Yield lists of rows from an unbuffered cursor, batch_size at a time."""
+    cur = conn.cursor(buffered=False)
+    try:
+        cur.execute(query, tuple(params))
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cur.close()
+
+
+def _decode(value):
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="ignore")
+    return value
+
+
+def aggregate_posts(conn, since, until, batch_size, by_category, by_tag, by_region):
+    where, params = _date_filter("created_at", since, until)
+    cols = "category, dietary_json, location, status, estimated_weight_kg, expires_at"
+    query = f"""
+        SELECT {cols} FROM posts{where}
+        UNION ALL
+        SELECT {cols} FROM posts_archive{where}
+    """
+    # expires_at is naive server-local time (compared with NOW() elsewhere);
+    # np.datetime64("now") would be UTC
+    now = np.datetime64(datetime.now().replace(microsecond=0))
+    total = 0
+
+    for rows in _stream(conn, query, params * 2, batch_size):
+        categories = np.array([_decode(r[0]) or "Other" for r in rows], dtype=object)
+        status = np.array([_decode(r[3]) or "" for r in rows], dtype=object)
+        weight = np.array([float(r[4] or 0) for r in rows])
+        expires = np.array([r[5] or "NaT" for r in rows], dtype="datetime64[s]")
+
+        shared = np.isin(status, ("claimed", "completed"))
+        expired = ~shared & ((status == "expired") | (expires <= now))
+
+        values = np.column_stack([
+            np.ones(len(rows)),
+            shared,
+            expired,
+            weight,
+            weight * shared,
+            weight * expired,
+        ]).astype(float)
+
+        by_category.add(categories, values)
+        by_region.add(np.array([_region(_decode(r[2])) for r in rows], dtype=object), values)
+
+        # Explode multi-valued dietary tags: repeat each row once per tag
+        tag_lists = [_tags(_decode(r[1])) for r in rows]
+        counts = np.array([len(t) for t in tag_lists])
+        if counts.sum():
+            flat = np.array([t for tags in tag_lists for t in tags], dtype=object)
+            by_tag.add(flat, np.repeat(values, counts, axis=0))
+
+        total += len(rows)
+    return total
+
+
+def aggregate_claims(conn, since, until, batch_size, claims_by_category):
+    where, params = _date_filter("c.created_at", since, until)
+    query = f"""
+        SELECT p.category, c.status
+        FROM (SELECT post_id, status, created_at FROM claims
+              UNION ALL
+              SELECT post_id, status, created_at FROM claims_archive) c
+        JOIN (SELECT id, category FROM posts
+              UNION ALL
+              SELECT id, category FROM posts_archive) p ON p.id = c.post_id
+        {where}
+    """
+    total = 0
+    for rows in _stream(conn, query, params, batch_size):
+        categories = np.array([_decode(r[0]) or "Other" for r in rows], dtype=object)
+        approved = np.array([_decode(r[1]) == "approved" for r in rows], dtype=float)
+        claims_by_category.add(categories, np.column_stack([np.ones(len(rows)), approved]))
+        total += len(rows)
+    return total
+
+
+def _fmt(value):
+    value = round(float(value), 3)
+    return int(value) if value.is_integer() else value
+
+
+def _write_csv(path, label, totals, extra=None):
+    extra_metrics = extra.metrics if extra else []
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow([label] + totals.metrics + ["co2e_kg"] + extra_metrics)
+        for key, sums in totals.rows():
+            kg_saved = sums[totals.metrics.index("kg_saved")]
+            row = [key] + [_fmt(v) for v in sums] + [_fmt(kg_saved * CO2E_PER_KG)]
+            if extra:
+                code = extra.index.get(key)
+                row += [int(v) for v in (extra.sums[code] if code is not None else [0] * len(extra_metrics))]
+            w.writerow(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the EcoBite impact report.")
+    parser.add_argument("--out", default="reports", help="Output directory")
+    parser.add_argument("--since", help="Only posts/claims created on or after this date")
+    parser.add_argument("--until", help="Only posts/claims created before this date")
+    parser.add_argument("--batch-size", type=int, default=REPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    by_category = GroupTotals(POST_METRICS)
+    by_tag = GroupTotals(POST_METRICS)
+    by_region = GroupTotals(POST_METRICS)
+    claims_by_category = GroupTotals(CLAIM_METRICS)
+
+    started = time.perf_counter()
+    # Dedicated connection: an unbuffered cursor holds it until fully read
+    conn = get_db_connection()
+    try:
+        n_posts = aggregate_posts(conn, args.since, args.until, args.batch_size,
+                                  by_category, by_tag, by_region)
+        n_claims = aggregate_claims(conn, args.since, args.until, args.batch_size,
+                                    claims_by_category)
+    finally:
+        conn.close()
+
+    _write_csv(os.path.join(args.out, "impact_by_category.csv"), "category",
+               by_category, claims_by_category)
+    _write_csv(os.path.join(args.out, "impact_by_dietary_tag.csv"), "dietary_tag", by_tag)
+    _write_csv(os.path.join(args.out, "impact_by_region.csv"), "region", by_region)
+
+    elapsed = time.perf_counter() - started
+    print(f"Processed {n_posts} posts and {n_claims} claims in {elapsed:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
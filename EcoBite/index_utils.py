@@ -0,0 +1,120 @@
+"""
+Shared plumbing for in-memory indexes over active posts (suggest_utils,
+feed_index).
+
+ChangeLogIndex loads every active, unexpired post once, then follows the
+`changes` log: each sync() re-reads only the posts changed since the last
+applied version. Subclasses provide SELECT_SQL (aliasing posts as `p`)
+and the _load/_apply/_sweep hooks, which run under self._lock.
+
+Writes committed by this process (db_utils.commit_changes) are applied
+straight away on the committing connection instead of waiting for the
+next throttled sync.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from db_utils import TimedCursor, changes_since, dict_rows, on_commit, settled_version
+
+log = logging.getLogger(__name__)
+
+ACTIVE_WHERE = "p.status='active' AND (p.expires_at IS NULL OR p.expires_at > NOW())"
+# Change-log rows read per round trip while syncing
+SYNC_BATCH = 500
+
+
+def is_live(row, now):
+    """True if a posts row belongs in an active-posts index."""
+    expires_at = row.get("expires_at")
+    return row.get("status") == "active" and (expires_at is None or expires_at > now)
+
+
+class ChangeLogIndex:
+    SELECT_SQL = None           # "SELECT ... FROM posts p ..." without WHERE
+    sync_interval = 1.0         # seconds between change-log checks
+    sweep_interval = 60.0       # seconds between expired-post sweeps
+
+    def __init__(self):
+        self.version = None     # last change-log id applied
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._last_sync = 0.0
+        self._last_sweep = 0.0
+        on_commit(self._after_commit)
+
+    # ---------- subclass hooks (called under self._lock) ----------
+
+    def _load(self, rows, now):
+        raise NotImplementedError
+
+    def _apply(self, post_ids, rows, now):
+        """rows: current posts rows for post_ids; ids without a row are gone."""
+        raise NotImplementedError
+
+    def _sweep(self, now):
+        raise NotImplementedError
+
+    # ---------- loading / syncing ----------
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def rebuild(self, cur):
+        """Full load of every active post."""
+        # Version first, trailing the grace window: anything written during
+        # the load, or committed late behind a newer id, is re-applied
+        version = settled_version(cur)
+        cur.execute(f"{self.SELECT_SQL} WHERE {ACTIVE_WHERE}")
+        rows = dict_rows(cur.fetchall(), cur.description)
+        with self._lock:
+            self._load(rows, datetime.now())
+            self.version = version
+
+    def sync(self, cur, force=False):
+        """Apply change-log entries newer than self.version (throttled)."""
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        # One syncing thread at a time; the others keep serving the index
+        if not self._sync_lock.acquire(blocking=force or not self.ready):
+            return
+        try:
+            self._last_sync = now
+            if not self.ready:
+                self.rebuild(cur)
+                return
+            while True:
+                changes, version = changes_since(cur, self.version, SYNC_BATCH)
+                post_ids = sorted({eid for entity, eid, _ in changes if entity == "post"})
+                rows = []
+                if post_ids:
+                    marks = ",".join("?" * len(post_ids))
+                    cur.execute(f"{self.SELECT_SQL} WHERE p.id IN ({marks})", tuple(post_ids))
+                    rows = dict_rows(cur.fetchall(), cur.description)
+                with self._lock:
+                    self._apply(post_ids, rows, datetime.now())
+                    self.version = version
+                if len(changes) < SYNC_BATCH:
+                    break
+            if now - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = now
+                with self._lock:
+                    self._sweep(datetime.now())
+        finally:
+            self._sync_lock.release()
+
+    def _after_commit(self, connection):
+        """Local write: catch up now so the writer's next read sees it."""
+        if not self.ready:
+            return      # the first reader loads everything anyway
+        cur = TimedCursor(connection.cursor())
+        try:
+            self.sync(cur, force=True)
+        except Exception:
+            log.exception("Index sync after commit failed")
+        finally:
+            cur.close()
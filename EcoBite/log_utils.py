@@ -0,0 +1,170 @@
+"""
+Structured, non-blocking logging.
+
+init_logging(app) routes every `logging` record through a bounded queue:
+request threads only enqueue (never touch stdout), and a QueueListener
+thread formats JSON lines and writes them. If the queue is full the
+record is dropped and counted instead of blocking the request.
+
+Each line is one JSON object:
+    {"ts": ..., "level": "ERROR", "logger": "routes_api", "msg": "...",
+     "request_id": "...", "route": "api_food_posts", "user_id": 7, ...}
+
+Records logged while handling a request carry request_id / route /
+user_id automatically; `extra={...}` fields are added as-is. Every
+request also produces one "request" line with method, path, status,
+latency_ms, db_ms and db_queries. Successful fast requests are sampled
+at LOG_SAMPLE_RATE; errors (>= 400) and requests slower than
+LOG_SLOW_MS are always logged.
+
+The request id comes from an incoming X-Request-ID header (if sane) or
+is generated, and is echoed back on the response.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request, session
+
+from db_utils import start_query_stats, stop_query_stats
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of successful, fast requests that get a "request" line
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+# Requests slower than this are always logged (milliseconds)
+LOG_SLOW_MS = float(os.getenv("LOG_SLOW_MS", "500"))
+# Records buffered between request threads and the writer thread
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+log = logging.getLogger(__name__)
+
+# Attributes every LogRecord has; anything else came from `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Runs in the thread that logged: resolve what can't travel (args,
+        # tracebacks, request context); the JSON is built by the listener
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context():
+            record.request_id = g.get("request_id")
+            record.route = request.endpoint
+            record.user_id = session.get("user_id")
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            # Report the gap on the next record that gets through
+            record.log_dropped = self.dropped
+        try:
+            self.queue.put_nowait(record)
+            self.dropped = 0
+        except queue.Full:
+            self.dropped += 1
+
+
+def _request_id():
+    incoming = request.headers.get(REQUEST_ID_HEADER, "")
+    return incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex[:16]
+
+
+def _configure_root():
+    """Point the root logger at the queue once per process."""
+    global _listener
+    if _listener is not None:
+        return
+    q = queue.Queue(LOG_QUEUE_SIZE)
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(q, writer, respect_handler_level=False)
+    _listener.start()
+    # Flush what's queued on shutdown
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [DroppingQueueHandler(q)]
+    root.setLevel(LOG_LEVEL)
+
+
+def init_logging(app):
+    _configure_root()
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = _request_id()
+        g.request_started = time.perf_counter()
+        g.query_stats = start_query_stats()
+
+    @app.after_request
+    def tag_response(resp):
+        resp.headers[REQUEST_ID_HEADER] = g.get("request_id", "")
+        g.response_status = resp.status_code
+        return resp
+
+    @app.teardown_request
+    def finish_request_log(exc):
+        started = g.pop("request_started", None)
+        stats = g.pop("query_stats", None)
+        stop_query_stats()
+        if started is None:
+            return
+        latency_ms = (time.perf_counter() - started) * 1000
+        status = 500 if exc is not None else g.get("response_status", 500)
+        if status < 400 and latency_ms < LOG_SLOW_MS and random.random() >= LOG_SAMPLE_RATE:
+            return
+        log.log(
+            logging.ERROR if status >= 500 else logging.INFO,
+            "request",
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "status": status,
+                "latency_ms": round(latency_ms, 2),
+                "db_ms": round(stats.seconds * 1000, 2) if stats else None,
+                "db_queries": stats.count if stats else None,
+                "sampled": status < 400 and latency_ms < LOG_SLOW_MS,
+            },
+        )
@@ -2,6 +2,8 @@ import mariadb
 import os
 from dotenv import load_dotenv
 
+from quantity_utils import parse_quantity
+
 load_dotenv()
 
 DB_USER = os.getenv("DB_USER", "root")
@@ -78,6 +80,36 @@ def migrate():
             else:
                 print(f"Error adding image_url: {e}")
 
+        for column, ddl in [
+            ("quantity_amount", "DOUBLE DEFAULT NULL"),
+            ("quantity_unit", "VARCHAR(32) DEFAULT NULL"),
+            ("version", "INT NOT NULL DEFAULT 0"),
+        ]:
+            try:
+                cursor.execute(f"ALTER TABLE posts ADD COLUMN {column} {ddl}")
+                print(f"Added {column} to posts")
+            except mariadb.Error as e:
+                if "Duplicate column" in str(e):
+                    print(f"{column} already exists")
+                else:
+                    print(f"Error adding {column}: {e}")
+
+        # Backfill numeric quantities from the free-text column
+        cursor.execute(
+            "SELECT id, quantity FROM posts WHERE quantity_amount IS NULL AND quantity IS NOT NULL"
+        )
+        updates = []
+        for post_id, quantity in cursor.fetchall():
+            amount, unit = parse_quantity(quantity)
+            if amount is not None:
+                updates.append((amount, unit, post_id))
+        if updates:
+            cursor.executemany(
+                "UPDATE posts SET quantity_amount=?, quantity_unit=? WHERE id=?",
+                updates,
+            )
+        print(f"Backfilled quantity_amount for {len(updates)} posts")
+
         # ----- CLAIMS -----
         print("Migrating claims table...")
 
@@ -92,6 +124,197 @@ def migrate():
             else:
                 print(f"Error adding requested_quantity: {e}")
 
+        try:
+            cursor.execute(
+                "ALTER TABLE claims ADD COLUMN requested_amount DOUBLE DEFAULT NULL"
+            )
+            print("Added requested_amount to claims")
+        except mariadb.Error as e:
+            if "Duplicate column" in str(e):
+                print("requested_amount already exists")
+            else:
+                print(f"Error adding requested_amount: {e}")
+
+        cursor.execute(
+            """
+            SELECT id, requested_quantity FROM claims
+            WHERE requested_amount IS NULL AND requested_quantity IS NOT NULL
+            """
+        )
+        updates = []
+        for claim_id, requested in cursor.fetchall():
+            amount, _ = parse_quantity(requested)
+            if amount is not None:
+                updates.append((amount, claim_id))
+        if updates:
+            cursor.executemany(
+                "UPDATE claims SET requested_amount=? WHERE id=?",
+                updates,
+            )
+        print(f"Backfilled requested_amount for {len(updates)} claims")
+
+        # ----- CHANGE LOG -----
+        print("Migrating changes table...")
+
+        try:
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS changes (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    entity VARCHAR(16) NOT NULL,
+                    entity_id INT NOT NULL,
+                    op VARCHAR(8) NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    INDEX idx_changes_entity (entity, entity_id)
+                )
+                """
+            )
+            print("changes table ready")
+        except mariadb.Error as e:
+            print(f"Error creating changes: {e}")
+
+        # ----- ARCHIVE -----
+        # Archive tables mirror posts/claims column-for-column (the archive
+        # job copies with SELECT *), so any later ALTER on posts/claims must
+        # be applied to posts_archive/claims_archive too.
+        print("Migrating archive tables...")
+
+        for table in ("posts", "claims"):
+            try:
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_archive LIKE {table}")
+                print(f"{table}_archive table ready")
+            except mariadb.Error as e:
+                print(f"Error creating {table}_archive: {e}")
+
+        try:
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS archived_stats (
+                    user_id INT PRIMARY KEY,
+                    posts_created INT NOT NULL DEFAULT 0,
+                    posts_shared INT NOT NULL DEFAULT 0,
+                    weight_shared_kg DOUBLE NOT NULL DEFAULT 0,
+                    claims_made INT NOT NULL DEFAULT 0,
+                    claims_accepted INT NOT NULL DEFAULT 0,
+                    claims_rejected INT NOT NULL DEFAULT 0
+                )
+                """
+            )
+            print("archived_stats table ready")
+        except mariadb.Error as e:
+            print(f"Error creating archived_stats: {e}")
+
+        # ----- ROW VERSIONS -----
+        # updated_at/version back the ETag/Last-Modified validators on the
+        # post and claims endpoints. Applied to the archive copies as well.
+        print("Migrating row version columns...")
+
+        row_columns = [
+            ("updated_at", "DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP "
+                           "ON UPDATE CURRENT_TIMESTAMP"),
+        ]
+        for table, columns in [
+            ("posts", row_columns),
+            ("posts_archive", row_columns),
+            ("claims", row_columns + [("version", "INT NOT NULL DEFAULT 0")]),
+            ("claims_archive", row_columns + [("version", "INT NOT NULL DEFAULT 0")]),
+        ]:
+            for column, ddl in columns:
+                try:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+                    print(f"Added {column} to {table}")
+                    if column == "updated_at":
+                        # Existing rows: last known change is their creation
+                        cursor.execute(
+                            f"UPDATE {table} SET updated_at = COALESCE(created_at, updated_at)"
+                        )
+                except mariadb.Error as e:
+                    if "Duplicate column" in str(e):
+                        print(f"{column} already exists on {table}")
+                    else:
+                        print(f"Error adding {column} to {table}: {e}")
+
+        # ----- ROLLUPS -----
+        print("Migrating rollup tables...")
+
+        try:
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS impact_daily (
+                    day DATE NOT NULL,
+                    user_id INT NOT NULL,
+                    category VARCHAR(64) NOT NULL,
+                    posts_created INT NOT NULL DEFAULT 0,
+                    posts_shared INT NOT NULL DEFAULT 0,
+                    weight_shared_kg DOUBLE NOT NULL DEFAULT 0,
+                    claims_made INT NOT NULL DEFAULT 0,
+                    claims_approved INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, user_id, category),
+                    INDEX idx_impact_user_day (user_id, day)
+                )
+                """
+            )
+            print("impact_daily table ready")
+        except mariadb.Error as e:
+            print(f"Error creating impact_daily: {e}")
+
+        # rollup_stats finds touched days by updated_at, then reads only the
+        # rows created on those days
+        for table in ("posts", "posts_archive", "claims", "claims_archive"):
+            for column in ("created_at", "updated_at"):
+                try:
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})"
+                    )
+                except mariadb.Error as e:
+                    print(f"Error indexing {table}.{column}: {e}")
+        print("Rollup source indexes ready")
+
+        # ----- RATE LIMITS -----
+        # Shared token buckets for RATE_LIMIT_ADAPTER=db
+        print("Migrating rate_buckets table...")
+
+        try:
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    bucket_key VARCHAR(96) PRIMARY KEY,
+                    tokens DOUBLE NOT NULL,
+                    updated_at DOUBLE NOT NULL
+                )
+                """
+            )
+            print("rate_buckets table ready")
+        except mariadb.Error as e:
+            print(f"Error creating rate_buckets: {e}")
+
+        # ----- IDEMPOTENCY KEYS -----
+        # Idempotency-Key claims and stored responses, shared by every worker
+        # (status NULL = still running)
+        print("Migrating idempotency_keys table...")
+
+        try:
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    user_id INT NOT NULL,
+                    method VARCHAR(8) NOT NULL,
+                    path VARCHAR(255) NOT NULL,
+                    idem_key VARCHAR(255) NOT NULL,
+                    fingerprint CHAR(64) NOT NULL,
+                    status SMALLINT NULL,
+                    headers TEXT NULL,
+                    body MEDIUMBLOB NULL,
+                    expires_at DOUBLE NOT NULL,
+                    PRIMARY KEY (user_id, method, path, idem_key),
+                    INDEX idx_idempotency_expires (expires_at)
+                )
+                """
+            )
+            print("idempotency_keys table ready")
+        except mariadb.Error as e:
+            print(f"Error creating idempotency_keys: {e}")
+
         conn.commit()
         conn.close()
         print("Migration complete!")
@@ -0,0 +1,172 @@
+"""
+Password hashing off the request threads.
+
+scrypt/pbkdf2 are deliberately slow and hold the GIL while they run, so a
+login spike used to stall every other request in the worker. Hashing and
+verification now run in a small process pool:
+
+    pw_hash = hash_password(password)
+    ok, new_hash = verify_password(stored_hash, password)
+    # new_hash is set when stored_hash used older parameters: save it
+
+At most PASSWORD_HASH_MAX_PENDING jobs may be queued or running per app
+process; past that, callers wait up to PASSWORD_HASH_QUEUE_TIMEOUT seconds
+and then get HashQueueFull, so a spike turns into fast "try again" errors
+instead of an unbounded backlog. PASSWORD_HASH_WORKERS=0 hashes inline.
+"""
+
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+log = logging.getLogger(__name__)
+
+# Any werkzeug method string, e.g. "scrypt", "scrypt:32768:8:1",
+# "pbkdf2:sha256:600000". Changing it rehashes users on their next login.
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", "16"))
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(
+    os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(1, PASSWORD_HASH_WORKERS) * 8))
+)
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2.0"))
+
+
+class HashQueueFull(Exception):
+    """Too many hash jobs already pending; the caller should ask for a retry."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+_method_prefix = None
+
+
+@contextmanager
+def _main_script_hidden():
+    """
+    Hide the __main__ script from multiprocessing while workers start.
+    spawn/forkserver children otherwise re-run it to rebuild __main__; for
+    `python app.py` that means every app import and a DB connection per
+    worker. The workers only need this module, which imports no app code.
+    """
+    main = sys.modules["__main__"]
+    spec = getattr(main, "__spec__", None)
+    path = main.__dict__.pop("__file__", None)
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        main.__spec__ = spec
+        if path is not None:
+            main.__file__ = path
+
+
+def _new_pool():
+    methods = multiprocessing.get_all_start_methods()
+    # forkserver/spawn children start clean: no copies of the app's threads,
+    # locks or DB sockets, as a fork of a threaded server would have
+    ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    if ctx.get_start_method() == "forkserver":
+        # The fork server imports just this module; workers fork from it
+        ctx.set_forkserver_preload([__name__])
+    pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=ctx)
+    # Non-fork pools launch every worker on the first submit: do it now
+    with _main_script_hidden():
+        pool.submit(_noop).result()
+    return pool
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _new_pool()
+        return _pool
+
+
+def _discard_pool(broken):
+    """Drop `broken` so the next _get_pool() builds a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    if not _slots.acquire(timeout=PASSWORD_HASH_QUEUE_TIMEOUT):
+        raise HashQueueFull("Password hashing is busy")
+    try:
+        pool = _get_pool()
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A worker died (OOM kill, crash): the executor never recovers on
+            # its own, so replace it and retry this job once
+            log.warning("Password hash pool broken, restarting it")
+            _discard_pool(pool)
+            return _get_pool().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+# ---------- worker functions (run in the pool) ----------
+
+def _noop():
+    return None
+
+
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def _prefix(method):
+    # werkzeug fills in default params ("scrypt" -> "scrypt:32768:8:1");
+    # a throwaway hash with a 1-byte salt is the reliable way to see them
+    return generate_password_hash("", method=method, salt_length=1).split("$", 1)[0]
+
+
+def _verify(stored_hash, password, method, salt_length, method_prefix):
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    if stored_hash.split("$", 1)[0] != method_prefix:
+        return True, _hash(password, method, salt_length)
+    return True, None
+
+
+# ---------- public API ----------
+
+def current_method_prefix():
+    """The `method:params` prefix hashes made with the current settings carry."""
+    global _method_prefix
+    if _method_prefix is None:
+        _method_prefix = _run(_prefix, PASSWORD_HASH_METHOD)
+    return _method_prefix
+
+
+def hash_password(password):
+    return _run(_hash, password, PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH)
+
+
+def verify_password(stored_hash, password):
+    """
+    Return (ok, new_hash). new_hash is a fresh hash with the current
+    parameters when the password is right but stored_hash is outdated.
+    """
+    if not stored_hash:
+        return False, None
+    return _run(
+        _verify, stored_hash, password,
+        PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH, current_method_prefix(),
+    )
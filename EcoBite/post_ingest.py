@@ -0,0 +1,323 @@
+"""
+Bulk post ingestion for partner kitchens and food banks.
+
+Used by POST /api/food-posts/bulk and as a CLI:
+
+    python post_ingest.py closing.csv --email kitchen@example.com
+    python post_ingest.py closing.json --email kitchen@example.com --chunk-size 200
+
+Input is a JSON array of post objects (same keys as POST /api/food-posts)
+or a CSV with a header row. In CSV, dietary_tags is a ";"-separated list.
+
+Rows are validated one check at a time across all rows, then inserted with
+executemany() in chunked transactions. Images given as image_url are NOT
+fetched inline: the posts are created straight away and the uploads run in a
+background pool that fills in image_url afterwards.
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from quantity_utils import parse_quantity
+
+log = logging.getLogger(__name__)
+
+# Max rows accepted by one API call (the CLI has no limit)
+MAX_BULK_ROWS = int(os.getenv("MAX_BULK_ROWS", "1000"))
+DEFAULT_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "100"))
+
+_image_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BULK_IMAGE_WORKERS", "2")),
+    thread_name_prefix="bulk-images",
+)
+
+
+def read_rows(raw, content_type=""):
+    """Parse a JSON array (or {"posts": [...]}) or CSV text into a list of dicts."""
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8-sig")
+    text = raw.strip()
+
+    if "csv" in (content_type or "") or not text.startswith(("[", "{")):
+        return [dict(r) for r in csv.DictReader(io.StringIO(text))]
+
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("posts", [])
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of posts")
+    return [r if isinstance(r, dict) else {} for r in data]
+
+
+def _column(rows, *keys):
+    """Pull one stripped string column out of the rows, trying keys in order."""
+    out = []
+    for r in rows:
+        value = None
+        for k in keys:
+            value = r.get(k)
+            if value not in (None, ""):
+                break
+        out.append(value.strip() if isinstance(value, str) else value)
+    return out
+
+
+def _parse_dt(value):
+    if value in (None, ""):
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        # Stored and compared as naive server-local time, like datetime.now()
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _parse_dt_column(values):
+    parsed, bad = [], []
+    for v in values:
+        try:
+            parsed.append(_parse_dt(v))
+            bad.append(False)
+        except (TypeError, ValueError, OverflowError):
+            parsed.append(None)
+            bad.append(True)
+    return parsed, bad
+
+
+def _parse_float_column(values):
+    parsed, bad = [], []
+    for v in values:
+        try:
+            parsed.append(float(v or 0))
+            bad.append(False)
+        except (TypeError, ValueError):
+            parsed.append(None)
+            bad.append(True)
+    return parsed, bad
+
+
+def _is_http_url(value):
+    # Anything else would reach cloudinary's uploader as a local file path
+    return isinstance(value, str) and value.lower().startswith(("http://", "https://"))
+
+
+def _parse_tags(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(t).strip() for t in value if str(t).strip()]
+    return [t.strip() for t in str(value).split(";") if t.strip()]
+
+
+def _flag(problems, failed, message):
+    """Record `message` for each failing row that has no earlier problem."""
+    for i, bad in enumerate(failed):
+        if bad and problems[i] is None:
+            problems[i] = message
+
+
+def validate_rows(rows):
+    """
+    Validate the rows one column (check) at a time; a row reports the
+    first check it fails.
+
+    Returns (records, errors): `records` is a list of (row_index, values,
+    image_source) ready for insert_posts(); `errors` is a list of
+    {"row": i, "error": msg}.
+    """
+    titles = _column(rows, "title")
+    descs = _column(rows, "description")
+    categories = _column(rows, "category")
+    quantities = _column(rows, "quantity", "qty")
+    locations = _column(rows, "location_text", "location")
+    weights, bad_weights = _parse_float_column(_column(rows, "estimated_weight_kg"))
+    tags = [_parse_tags(r.get("dietary_tags") or r.get("diet")) for r in rows]
+    images = _column(rows, "image_url", "image")
+
+    expires, bad_expires = _parse_dt_column(_column(rows, "expires_at", "expiry_time"))
+    starts, bad_starts = _parse_dt_column(_column(rows, "pickup_window_start"))
+    ends, bad_ends = _parse_dt_column(_column(rows, "pickup_window_end"))
+
+    now = datetime.now()
+    problems = [None] * len(rows)
+    _flag(problems, bad_expires, "Invalid expires_at")
+    _flag(problems, [not (t and d and loc and e) for t, d, loc, e in zip(titles, descs, locations, expires)],
+          "Missing required fields")
+    _flag(problems, [a or b for a, b in zip(bad_starts, bad_ends)], "Invalid pickup window")
+    _flag(problems, [e is not None and e <= now for e in expires], "expires_at is in the past")
+    _flag(problems, bad_weights, "Invalid estimated_weight_kg")
+    _flag(problems, [bool(img) and not _is_http_url(img) for img in images],
+          "image_url must be an http(s) URL")
+
+    records, errors = [], []
+    for i, problem in enumerate(problems):
+        if problem:
+            errors.append({"row": i, "error": problem})
+            continue
+
+        quantity = str(quantities[i] or "")
+        amount, unit = parse_quantity(quantity)
+        values = (
+            titles[i],
+            descs[i],
+            categories[i] or "Other",
+            quantity,
+            amount,
+            unit,
+            weights[i],
+            json.dumps(tags[i]),
+            locations[i],
+            starts[i],
+            ends[i],
+            expires[i],
+        )
+        records.append((i, values, images[i]))
+
+    return records, errors
+
+
+def insert_posts(cur, conn, user_id, records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert validated records in chunks of `chunk_size`, one transaction each.
+
+    Returns (results, uploads): per-row {"row", "id"} or {"row", "error"}
+    dicts, and (post_id, image_source) pairs still waiting for an upload.
+    A failing chunk is rolled back on its own; earlier chunks stay committed.
+    """
+    # Imported here so the validation helpers stay usable without a DB
+    from db_utils import commit_changes, record_changes, CHANGE_INSERT
+
+    results, uploads = [], []
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        try:
+            cur.executemany(
+                """
+                INSERT INTO posts (
+                    user_id, title, description, category, quantity,
+                    quantity_amount, quantity_unit,
+                    estimated_weight_kg, dietary_json, location,
+                    pickup_window_start, pickup_window_end, expires_at,
+                    status, created_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'active', NOW())
+                RETURNING id
+                """,
+                [(user_id,) + values for _, values, _ in chunk],
+            )
+            ids = [r[0] for r in cur.fetchall()]
+            record_changes(cur, "post", ids, CHANGE_INSERT)
+            commit_changes(conn)
+        except Exception as e:
+            conn.rollback()
+            log.exception("Bulk insert chunk error")
+            results.extend({"row": i, "error": str(e)} for i, _, _ in chunk)
+            continue
+
+        for (i, _, image), post_id in zip(chunk, ids):
+            results.append({"row": i, "id": post_id})
+            if image:
+                uploads.append((post_id, image))
+
+    return results, uploads
+
+
+def _upload_images(uploads):
+    """Fetch each remote image into Cloudinary and store the resulting URL."""
+    import cloudinary
+    import cloudinary.uploader
+    from db_utils import commit_changes, get_db_connection, record_change, CHANGE_UPDATE
+
+    cloudinary.config(secure=True)
+    # Own connection: this runs outside any request
+    db = get_db_connection()
+    try:
+        cur = db.cursor()
+        for post_id, source in uploads:
+            if not _is_http_url(source):
+                log.warning("Skipped non-URL image source", extra={"post_id": post_id})
+                continue
+            try:
+                uploaded = cloudinary.uploader.upload(
+                    source, folder="ecobite_uploads", resource_type="image"
+                )
+                cur.execute(
+                    "UPDATE posts SET image_url=?, version=version+1 WHERE id=?",
+                    (uploaded.get("secure_url"), post_id),
+                )
+                record_change(cur, "post", post_id, CHANGE_UPDATE)
+                commit_changes(db)
+            except Exception:
+                db.rollback()
+                log.exception("Deferred image upload error", extra={"post_id": post_id})
+    finally:
+        db.close()
+
+
+def schedule_image_uploads(uploads):
+    """Queue deferred image uploads on the background pool."""
+    if uploads:
+        return _image_pool.submit(_upload_images, uploads)
+    return None
+
+
+def ingest(cur, conn, user_id, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Validate + insert + schedule uploads. Returns (results sorted by row, created, future)."""
+    records, errors = validate_rows(rows)
+    results, uploads = insert_posts(cur, conn, user_id, records, chunk_size)
+    future = schedule_image_uploads(uploads)
+    results = sorted(errors + results, key=lambda r: r["row"])
+    created = sum(1 for r in results if "id" in r)
+    return results, created, future
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-create EcoBite posts from JSON or CSV.")
+    parser.add_argument("file", help="Path to a .json or .csv file ('-' for stdin)")
+    parser.add_argument("--email", required=True, help="Email of the posting account")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    from db_utils import conn
+
+    if args.file == "-":
+        raw = sys.stdin.read()
+    else:
+        with open(args.file, encoding="utf-8-sig") as f:
+            raw = f.read()
+    content_type = "text/csv" if args.file.lower().endswith(".csv") else "application/json"
+    rows = read_rows(raw, content_type)
+
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM users WHERE email=?", (args.email.strip().lower(),))
+    row = cur.fetchone()
+    if not row:
+        print(f"No user with email {args.email}")
+        return 1
+
+    started = datetime.now()
+    results, created, future = ingest(cur, conn, row[0], rows, args.chunk_size)
+    elapsed = (datetime.now() - started).total_seconds()
+
+    for r in results:
+        if "error" in r:
+            print(f"row {r['row']}: {r['error']}")
+    print(f"Created {created}/{len(rows)} posts in {elapsed:.2f}s")
+
+    if future:
+        print("Waiting for image uploads...")
+        future.result()
+    conn.close()
+    return 0 if created == len(rows) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
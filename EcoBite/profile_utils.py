@@ -0,0 +1,167 @@
+"""
+On-demand request profiling.
+
+init_profiling(app) wraps selected requests in cProfile + tracemalloc:
+    - admins, by sending `X-EcoBite-Profile: 1`
+    - a random PROFILE_SAMPLE_RATE fraction of all requests (0 = off)
+
+Each profiled request writes into PROFILE_DIR/<endpoint>/:
+    <stamp>.prof  pstats dump (snakeviz / `python -m pstats`)
+    <stamp>.txt   wall / DB / Python time split, peak traced memory,
+                  top functions by cumulative time, top allocating lines
+Only the newest PROFILE_KEEP profiles per endpoint are kept. The response
+gets a Server-Timing header (db / app) and X-Profile naming the files.
+
+One request is profiled at a time per process: cProfile and tracemalloc
+are process-wide, and overlapping runs would mix their numbers.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from flask import g, request, session
+
+from db_utils import current_query_stats, start_query_stats, stop_query_stats
+
+log = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-EcoBite-Profile"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "ecobite-profiles")
+)
+# Profiles kept per endpoint (oldest deleted first)
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+# Rows in the function / allocation tables of the summary
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "30"))
+
+# Never profiled: long-lived streams and plain file serving
+UNPROFILED_ENDPOINTS = {"static", "uploaded_file", "api_events"}
+
+_profile_lock = threading.Lock()
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _wants_profile():
+    if request.endpoint is None or request.endpoint in UNPROFILED_ENDPOINTS:
+        return False
+    if request.headers.get(PROFILE_HEADER) == "1" and session.get("role") == "admin":
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _rotate(folder):
+    stamps = sorted({
+        os.path.splitext(n)[0] for n in os.listdir(folder)
+        if n.endswith(".txt") or n.endswith(".prof")
+    })
+    for stamp in stamps[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        for ext in (".txt", ".prof"):
+            try:
+                os.remove(os.path.join(folder, stamp + ext))
+            except FileNotFoundError:
+                pass
+
+
+def _summary(state, status, wall, cpu, peak, profiler, allocations):
+    stats = state["stats"]
+    db = stats.seconds
+    out = io.StringIO()
+    out.write(f"{request.method} {request.full_path.rstrip('?')} -> {status}\n")
+    out.write(f"endpoint {request.endpoint}, pid {os.getpid()}, {state['stamp']}\n")
+    out.write(
+        "wall {:.1f} ms | db {:.1f} ms ({} queries) | python {:.1f} ms | cpu {:.1f} ms\n".format(
+            wall * 1000, db * 1000, stats.count, max(0.0, wall - db) * 1000, cpu * 1000
+        )
+    )
+    out.write(f"peak traced memory {peak / 1024:.1f} KiB\n")
+    out.write("\n---------- top functions (cumulative) ----------\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    out.write("---------- top allocations (net, by line) ----------\n")
+    for diff in allocations[:PROFILE_TOP]:
+        out.write(f"{diff}\n")
+    return out.getvalue()
+
+
+def _finish(resp=None):
+    """Stop profiling this request; write the files if a response was produced."""
+    state = g.pop("profile", None)
+    if state is None:
+        return
+    profiler = state["profiler"]
+    try:
+        profiler.disable()
+        wall = time.perf_counter() - state["wall"]
+        cpu = time.thread_time() - state["cpu"]
+        peak = tracemalloc.get_traced_memory()[1]
+        allocations = tracemalloc.take_snapshot().compare_to(state["snapshot"], "lineno")
+        if state["started_tracemalloc"]:
+            tracemalloc.stop()
+        if state["own_stats"]:
+            stop_query_stats()
+        if resp is None:
+            return
+
+        folder = os.path.join(PROFILE_DIR, _SAFE_NAME.sub("_", request.endpoint))
+        os.makedirs(folder, exist_ok=True)
+        base = os.path.join(folder, state["stamp"])
+        profiler.dump_stats(base + ".prof")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(_summary(state, resp.status_code, wall, cpu, peak, profiler, allocations))
+        _rotate(folder)
+
+        db_ms = state["stats"].seconds * 1000
+        resp.headers["Server-Timing"] = (
+            f'db;dur={db_ms:.1f};desc="{state["stats"].count} queries", '
+            f"app;dur={max(0.0, wall * 1000 - db_ms):.1f}"
+        )
+        resp.headers["X-Profile"] = f"{os.path.basename(folder)}/{state['stamp']}"
+    except Exception:
+        log.exception("Profile write error")
+    finally:
+        _profile_lock.release()
+
+
+def init_profiling(app):
+    @app.before_request
+    def start_profile():
+        if not _wants_profile() or not _profile_lock.acquire(blocking=False):
+            return None
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        # Share the request log's QueryStats when it already counts queries
+        stats = current_query_stats()
+        g.profile = {
+            "stamp": "{}-{}".format(datetime.now().strftime("%Y%m%d-%H%M%S-%f"), os.getpid()),
+            "started_tracemalloc": started_tracemalloc,
+            "snapshot": tracemalloc.take_snapshot(),
+            "stats": stats or start_query_stats(),
+            "own_stats": stats is None,
+            "profiler": cProfile.Profile(),
+            "wall": time.perf_counter(),
+            "cpu": time.thread_time(),
+        }
+        g.profile["profiler"].enable()
+        return None
+
+    @app.after_request
+    def finish_profile(resp):
+        _finish(resp)
+        return resp
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # after_request never ran (unhandled error): still release the lock
+        _finish()
@@ -0,0 +1,37 @@
+"""
+Quantity parsing for posts and claims.
+
+Kept free of DB imports so scripts like migrate_db.py can use it without
+opening the app's global connection.
+"""
+
+import re
+
+_QTY_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*(.*?)\s*$")
+
+
+def parse_quantity(text):
+    """
+    Split a free-text quantity into (amount, unit).
+
+        "5 kg"      -> (5.0, "kg")
+        "2 slices"  -> (2.0, "slices")
+        "3"         -> (3.0, None)
+        "a few"     -> (None, None)
+    """
+    if text is None:
+        return None, None
+    m = _QTY_RE.match(str(text))
+    if not m:
+        return None, None
+    amount = float(m.group(1).replace(",", "."))
+    unit = m.group(2)[:32] or None
+    return amount, unit
+
+
+def format_quantity(amount, unit=None):
+    """Inverse of parse_quantity() for display: (2.5, "kg") -> "2.5 kg"."""
+    if amount is None:
+        return ""
+    text = f"{round(amount, 3):g}"
+    return f"{text} {unit}" if unit else text
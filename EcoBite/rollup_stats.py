@@ -0,0 +1,166 @@
+"""
+Rebuild the impact_daily rollup used by /api/stats/timeseries and
+/api/stats/leaderboard.
+
+    python rollup_stats.py              # refresh days touched in the last 3 days
+    python rollup_stats.py --days 30
+    python rollup_stats.py --full       # rebuild everything
+
+impact_daily has one row per (day, user_id, category):
+    - posts_created / posts_shared / weight_shared_kg : by post owner,
+      bucketed on the post's created_at day
+    - claims_made / claims_approved                   : by claimer,
+      bucketed on the claim's created_at day, category of the claimed post
+
+Rows come from posts/claims plus their *_archive tables, so archived
+history still counts. A post approved today may have been created weeks
+ago, so each run re-rolls every day that has a post or claim updated in
+the last `--days` days (plus those recent days themselves), and reads only
+source rows created on those days. Run it from cron more often than
+`--days`; each run rewrites its days in one transaction, so readers never
+see a half-built day.
+"""
+
+import argparse
+import os
+from datetime import timedelta
+
+from dotenv import load_dotenv
+
+from db_utils import conn
+
+load_dotenv()
+
+ROLLUP_DAYS = int(os.getenv("ROLLUP_DAYS", "3"))
+
+_SOURCES = {
+    "posts": ("posts", "posts_archive"),
+    "claims": ("claims", "claims_archive"),
+}
+
+
+def touched_days(cur, days=ROLLUP_DAYS):
+    """Days whose rollup rows may be stale: recent ones and any with recent updates."""
+    cur.execute("SELECT CURDATE()")
+    today = cur.fetchone()[0]
+    touched = {today - timedelta(days=i) for i in range(days + 1)}
+
+    tables = [t for group in _SOURCES.values() for t in group]
+    cur.execute(
+        " UNION ".join(
+            f"SELECT DATE(created_at) FROM {t} "
+            f"WHERE updated_at >= CURDATE() - INTERVAL ? DAY"
+            for t in tables
+        ),
+        (days,) * len(tables),
+    )
+    touched.update(r[0] for r in cur.fetchall() if r[0] is not None)
+    return sorted(touched)
+
+
+def _day_ranges(days):
+    """Merge sorted dates into [start, end) datetime ranges of consecutive days."""
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return ranges
+
+
+def _created_on(alias, days):
+    """WHERE fragment + params limiting `alias`.created_at to the given days."""
+    if days is None:
+        return "1=1", ()
+    ranges = _day_ranges(days)
+    sql = " OR ".join(f"({alias}.created_at >= ? AND {alias}.created_at < ?)" for _ in ranges)
+    return f"({sql})", tuple(v for r in ranges for v in r)
+
+
+def _union(kind, columns, alias, days):
+    where, params = _created_on(alias, days)
+    sql = " UNION ALL ".join(
+        f"SELECT {columns} FROM {table} {alias} WHERE {where}"
+        for table in _SOURCES[kind]
+    )
+    return sql, params * len(_SOURCES[kind])
+
+
+def rebuild(cur, conn, days=ROLLUP_DAYS, full=False):
+    """Recompute impact_daily for the touched days (or all of it). Returns the days."""
+    day_list = None if full else touched_days(cur, days)
+    posts_sql, posts_params = _union(
+        "posts", "p.user_id, p.category, p.status, p.estimated_weight_kg, p.created_at",
+        "p", day_list,
+    )
+    claims_sql, claims_params = _union(
+        "claims", "c.post_id, c.claimer_id, c.status, c.created_at", "c", day_list,
+    )
+
+    try:
+        if day_list is None:
+            cur.execute("DELETE FROM impact_daily")
+        else:
+            marks = ",".join("?" * len(day_list))
+            cur.execute(f"DELETE FROM impact_daily WHERE day IN ({marks})", tuple(day_list))
+
+        cur.execute(
+            f"""
+            INSERT INTO impact_daily
+                (day, user_id, category, posts_created, posts_shared, weight_shared_kg)
+            SELECT DATE(p.created_at), p.user_id, COALESCE(p.category, 'Other'),
+                   COUNT(*),
+                   SUM(p.status IN ('claimed', 'completed')),
+                   COALESCE(SUM(CASE WHEN p.status IN ('claimed', 'completed')
+                                     THEN p.estimated_weight_kg END), 0)
+            FROM ({posts_sql}) p
+            GROUP BY DATE(p.created_at), p.user_id, COALESCE(p.category, 'Other')
+            """,
+            posts_params,
+        )
+
+        # The claimed post's category: primary-key lookups into both tables
+        # instead of a join against every post ever made
+        cur.execute(
+            f"""
+            INSERT INTO impact_daily
+                (day, user_id, category, claims_made, claims_approved)
+            SELECT DATE(c.created_at), c.claimer_id,
+                   COALESCE(p.category, pa.category, 'Other'),
+                   COUNT(*), SUM(c.status = 'approved')
+            FROM ({claims_sql}) c
+            LEFT JOIN posts p ON p.id = c.post_id
+            LEFT JOIN posts_archive pa ON pa.id = c.post_id
+            WHERE p.id IS NOT NULL OR pa.id IS NOT NULL
+            GROUP BY DATE(c.created_at), c.claimer_id,
+                     COALESCE(p.category, pa.category, 'Other')
+            ON DUPLICATE KEY UPDATE
+                claims_made = VALUES(claims_made),
+                claims_approved = VALUES(claims_approved)
+            """,
+            claims_params,
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return day_list
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the impact_daily rollup table.")
+    parser.add_argument("--days", type=int, default=ROLLUP_DAYS)
+    parser.add_argument("--full", action="store_true", help="Rebuild the whole history")
+    args = parser.parse_args(argv)
+
+    cur = conn.cursor()
+    day_list = rebuild(cur, conn, args.days, args.full)
+    if day_list is None:
+        print("Rollup complete (full rebuild)!")
+    else:
+        print(f"Rollup complete! {len(day_list)} day(s) refreshed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# routes_admin.py
+
+import csv
+import io
+import os
+from datetime import datetime
+
+from flask import Response, jsonify, request, send_from_directory, stream_with_context
+
+from db_utils import get_db_connection
+from auth_utils import require_login
+from profile_utils import PROFILE_DIR
+
+# Rows pulled from the server per fetchmany() while exporting
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_QUERIES = {
+    "posts": """
+        SELECT p.*, u.email AS owner_email
+        FROM {table} p
+        JOIN users u ON p.user_id = u.id
+    """,
+    "claims": """
+        SELECT c.*, u.email AS claimer_email
+        FROM {table} c
+        JOIN users u ON c.claimer_id = u.id
+    """,
+}
+
+
+def _parse_date(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def register_admin_routes(app):
+    # ---------- CSV EXPORT (admin only) ----------
+    @app.get("/admin/export/<any(posts, claims):table>.csv")
+    def admin_export(table):
+        """
+        Stream a full posts/claims dump as CSV.
+
+        ?from=2025-01-01&to=2025-02-01 filter on created_at (to is exclusive),
+        ?archived=1 also includes the *_archive tables.
+        """
+        need = require_login(role="admin")
+        if need:
+            return need
+
+        try:
+            since = _parse_date(request.args.get("from"))
+            until = _parse_date(request.args.get("to"))
+        except ValueError:
+            return "Invalid from/to date (use YYYY-MM-DD)", 400
+
+        alias = "p" if table == "posts" else "c"
+        clauses, params = [], []
+        if since:
+            clauses.append(f"{alias}.created_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append(f"{alias}.created_at < ?")
+            params.append(until)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+        sources = [table]
+        if request.args.get("archived") == "1":
+            sources.append(f"{table}_archive")
+        query = " UNION ALL ".join(
+            EXPORT_QUERIES[table].format(table=src) + where for src in sources
+        )
+        params = params * len(sources)
+
+        def generate():
+            # Own connection + unbuffered cursor: rows stream from the server
+            # and the shared request connection stays free.
+            db = get_db_connection()
+            cur = db.cursor(buffered=False)
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            try:
+                cur.execute(query, tuple(params))
+                writer.writerow([col[0] for col in cur.description])
+                while True:
+                    rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+                    if not rows:
+                        break
+                    for row in rows:
+                        writer.writerow([
+                            v.decode("utf-8", errors="ignore")
+                            if isinstance(v, (bytes, bytearray)) else v
+                            for v in row
+                        ])
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate(0)
+                # Header-only export (no rows)
+                if buf.tell():
+                    yield buf.getvalue()
+            finally:
+                cur.close()
+                db.close()
+
+        stamp = datetime.now().strftime("%Y%m%d")
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/csv",
+            headers={
+                "Content-Disposition": f"attachment; filename=ecobite-{table}-{stamp}.csv",
+                "Cache-Control": "no-store",
+                "X-Accel-Buffering": "no",
+            },
+        )
+
+    # ---------- PROFILES (see profile_utils.py) ----------
+    @app.get("/admin/profiles")
+    def admin_profiles():
+        """Newest request profiles per endpoint: [{"endpoint", "name", "size"}]."""
+        need = require_login(role="admin")
+        if need:
+            return need
+
+        out = []
+        if os.path.isdir(PROFILE_DIR):
+            for endpoint in sorted(os.listdir(PROFILE_DIR)):
+                folder = os.path.join(PROFILE_DIR, endpoint)
+                if not os.path.isdir(folder):
+                    continue
+                for name in sorted(os.listdir(folder), reverse=True):
+                    path = os.path.join(folder, name)
+                    out.append({"endpoint": endpoint, "name": name, "size": os.path.getsize(path)})
+        return jsonify(out)
+
+    @app.get("/admin/profiles/<endpoint>/<name>")
+    def admin_profile_file(endpoint, name):
+        """Download one .txt summary or .prof dump."""
+        need = require_login(role="admin")
+        if need:
+            return need
+
+        # send_from_directory rejects paths escaping PROFILE_DIR
+        return send_from_directory(
+            PROFILE_DIR, f"{endpoint}/{name}",
+            mimetype="text/plain" if name.endswith(".txt") else "application/octet-stream",
+            max_age=0,
+        )
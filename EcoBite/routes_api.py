@@ -2,12 +2,29 @@
 
 from datetime import datetime
 import json
+import logging
 import os
 
 from flask import request, jsonify, session
 
-from db_utils import get_cursor, dict_rows, conn
+from db_utils import (
+    get_cursor, get_read_cursor, get_write_cursor, get_write_connection,
+    dict_rows, conn, commit_changes, record_change, record_changes,
+    changes_since, data_version, run_parallel, CHANGE_INSERT, CHANGE_UPDATE, CHANGE_DELETE,
+)
 from auth_utils import require_login
+from event_utils import publish, CLAIM_CREATED, CLAIM_CANCELLED, POST_STATUS_CHANGED
+from claim_utils import (
+    ClaimDecisionError, decide_claim, decide_claims_batch, publish_decision,
+    MAX_BATCH_DECISIONS,
+)
+from quantity_utils import parse_quantity
+from cache_utils import dashboards
+from http_utils import make_etag, not_modified, set_validators
+from idempotency_utils import idempotent
+from suggest_utils import index as suggest_index, SUGGEST_LIMIT, SUGGEST_MAX_LIMIT
+from feed_index import active_posts
+from post_ingest import read_rows, ingest, MAX_BULK_ROWS
 
 import cloudinary
 import cloudinary.uploader
@@ -15,13 +32,155 @@ import cloudinary.uploader
 # Use CLOUDINARY_URL from environment (Render env var). This line ensures HTTPS URLs.
 cloudinary.config(secure=True)
 
+log = logging.getLogger(__name__)
+
+
+def _post_write_error(cur, post_id):
+    """
+    Explain why a conditional `... WHERE id=? AND user_id=?` write touched no
+    rows. Only runs on the failure path, so the happy path stays one query.
+    Returns a (response, status) tuple, or None if the caller owns the post.
+    """
+    cur.execute("SELECT user_id FROM posts WHERE id=?", (post_id,))
+    row = cur.fetchone()
+    if not row:
+        return jsonify({"error": "Post not found"}), 404
+    if row[0] != session["user_id"]:
+        return jsonify({"error": "Forbidden"}), 403
+    return None
+
+
+def _latest(*stamps):
+    stamps = [s for s in stamps if s]
+    return max(stamps) if stamps else None
+
+
+def _claims_list_validators(cur, owner_column, user_id):
+    """
+    (etag, last_modified) for a claims list filtered on `owner_column`
+    (c.claimer_id or p.user_id), from one aggregate over the index instead
+    of the full joined list. Row count and max id catch inserts/deletes,
+    the version sums catch updates to the claims and their posts.
+    """
+    cur.execute(
+        f"""
+        SELECT COUNT(*), COALESCE(MAX(c.id), 0),
+               COALESCE(SUM(c.version), 0), COALESCE(SUM(p.version), 0),
+               MAX(c.updated_at), MAX(p.updated_at)
+        FROM claims c
+        JOIN posts p ON c.post_id = p.id
+        WHERE {owner_column} = ?
+        """,
+        (user_id,),
+    )
+    row = cur.fetchone()
+    etag = make_etag("claims", owner_column, user_id, *row[:4])
+    return etag, _latest(row[4], row[5])
+
+
+def _owner_dashboard(cur, user_id):
+    """
+    Everything the My Posts page needs in a fixed number of queries,
+    whatever the number of posts: the owner's posts, every claim on them
+    (claims_summary is counted from these in Python), one row of per-user
+    stats and the archived totals, if that table exists. The stats match
+    compute_stats(user_id).
+    """
+    cur.execute(
+        """
+        SELECT * FROM posts
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+        """,
+        (user_id,),
+    )
+    posts = dict_rows(cur.fetchall(), cur.description)
+
+    cur.execute(
+        """
+        SELECT c.*, p.title AS post_title, u.email AS claimer_email
+        FROM claims c
+        JOIN posts p ON c.post_id = p.id
+        JOIN users u ON c.claimer_id = u.id
+        WHERE p.user_id = ?
+        ORDER BY c.created_at DESC
+        """,
+        (user_id,),
+    )
+    claims = dict_rows(cur.fetchall(), cur.description)
+
+    cur.execute(
+        """
+        SELECT u.created_at,
+               COALESCE(cm.made, 0), COALESCE(cm.accepted, 0), COALESCE(cm.rejected, 0)
+        FROM users u
+        LEFT JOIN (
+            SELECT claimer_id,
+                   COUNT(*) AS made,
+                   SUM(status = 'approved') AS accepted,
+                   SUM(status = 'rejected') AS rejected
+            FROM claims
+            WHERE claimer_id = ?
+            GROUP BY claimer_id
+        ) cm ON cm.claimer_id = u.id
+        WHERE u.id = ?
+        """,
+        (user_id, user_id),
+    )
+    row = cur.fetchone() or (None, 0, 0, 0)
+
+    archived = (0, 0, 0, 0, 0, 0)
+    try:
+        cur.execute(
+            """
+            SELECT posts_created, posts_shared, weight_shared_kg,
+                   claims_made, claims_accepted, claims_rejected
+            FROM archived_stats WHERE user_id = ?
+            """,
+            (user_id,),
+        )
+        archived = cur.fetchone() or archived
+    except Exception:
+        # archived_stats may not exist yet (archive_posts.py never run):
+        # live totals only, like compute_stats
+        pass
+
+    claims_by_post = {}
+    for c in claims:
+        claims_by_post.setdefault(c["post_id"], []).append(c)
+
+    shared_weight = 0.0
+    shared = 0
+    for p in posts:
+        post_claims = claims_by_post.get(p["id"], [])
+        p["claims_summary"] = {
+            "pending": sum(c["status"] == "pending" for c in post_claims),
+            "accepted": sum(c["status"] == "approved" for c in post_claims),
+            "rejected": sum(c["status"] == "rejected" for c in post_claims),
+        }
+        if p["status"] in ("claimed", "completed"):
+            shared += 1
+            shared_weight += float(p.get("estimated_weight_kg") or 0)
+
+    stats = {
+        "posts_created": len(posts) + int(archived[0]),
+        "posts_shared": shared + int(archived[1]),
+        "weight_shared_kg": shared_weight + float(archived[2]),
+        "claims_made": int(row[1]) + int(archived[3]),
+        "claims_accepted": int(row[2]) + int(archived[4]),
+        "claims_rejected": int(row[3]) + int(archived[5]),
+        "join_date": row[0],
+    }
+    return {"posts": posts, "claims": claims_by_post, "stats": stats}
+
 
 def register_api_routes(app):
     # ---------- FOOD POSTS LIST + CREATE ----------
 
     @app.route("/api/food-posts", methods=["GET", "POST"])
+    @idempotent
     def api_food_posts():
-        cur = get_cursor()
+        cur = get_cursor() if request.method == "POST" else get_read_cursor()
         if not cur:
             return jsonify({"error": "Database error"}), 500
 
@@ -75,21 +234,23 @@ def register_api_routes(app):
                             resource_type="image"
                         )
                         image_url = uploaded.get("secure_url")
-                except Exception as e:
-                    print("❌ Cloudinary upload error:", e)
+                except Exception:
+                    log.exception("Cloudinary upload error")
 
             dietary_json = json.dumps(dietary)
+            qty_amount, qty_unit = parse_quantity(quantity)
 
             try:
                 cur.execute(
                     """
                     INSERT INTO posts (
                         user_id, title, description, category, quantity,
+                        quantity_amount, quantity_unit,
                         estimated_weight_kg, dietary_json, location,
                         pickup_window_start, pickup_window_end, expires_at,
                         status, image_url, created_at
                     )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'active', ?, NOW())
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'active', ?, NOW())
                     """,
                     (
                         session["user_id"],
@@ -97,6 +258,8 @@ def register_api_routes(app):
                         desc,
                         category,
                         quantity,
+                        qty_amount,
+                        qty_unit,
                         weight,
                         dietary_json,
                         location,
@@ -106,8 +269,9 @@ def register_api_routes(app):
                         image_url,
                     ),
                 )
-                conn.commit()
                 post_id = cur.lastrowid
+                record_change(cur, "post", post_id, CHANGE_INSERT)
+                commit_changes(conn)
 
                 new_post = {
                     "id": post_id,
@@ -116,6 +280,9 @@ def register_api_routes(app):
                     "description": desc,
                     "category": category,
                     "quantity": quantity,
+                    "quantity_amount": qty_amount,
+                    "quantity_unit": qty_unit,
+                    "version": 0,
                     "estimated_weight_kg": weight,
                     "dietary_json": dietary_json,
                     "location": location,
@@ -130,7 +297,7 @@ def register_api_routes(app):
                 return jsonify(new_post), 201
 
             except Exception as e:
-                print(f"❌ API Create Post Error: {e}")
+                log.exception("API create post error")
                 conn.rollback()
                 return jsonify({"error": str(e)}), 500
 
@@ -146,6 +313,18 @@ def register_api_routes(app):
             diet_filter = request.args.get("dietary", "")
             sort_order = request.args.get("sort", "newest")
 
+            # Active feed: answer from the in-memory index when it is loaded
+            if status_filter == "available":
+                posts = active_posts(
+                    cur,
+                    category=None if cat_filter == "All Types" else cat_filter,
+                    dietary=diet_filter,
+                    search=search,
+                    sort=sort_order,
+                )
+                if posts is not None:
+                    return jsonify(posts)
+
             query = """
                 SELECT p.*, u.email AS owner_email
                 FROM posts p
@@ -188,7 +367,7 @@ def register_api_routes(app):
             return jsonify(posts)
 
         except Exception as e:
-            print(f"❌ API List Posts Error: {e}")
+            log.exception("API list posts error")
             return jsonify({"error": str(e)}), 500
 
 
@@ -243,9 +422,63 @@ def register_api_routes(app):
             return jsonify(posts)
 
         except Exception as e:
-            print(f"❌ API List Posts Error: {e}")
+            log.exception("API list posts error")
             return jsonify({"error": str(e)}), 500
 
+    # ---------- BULK CREATE POSTS ----------
+    @app.post("/api/food-posts/bulk")
+    def api_bulk_create_posts():
+        """
+        Create many posts at once from a JSON array, a CSV body, or a CSV/JSON
+        file uploaded as `file`. Returns per-row ids or errors.
+        """
+        need = require_login()
+        if need:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        upload = request.files.get("file")
+        try:
+            if upload:
+                rows = read_rows(upload.read(), upload.mimetype or upload.filename)
+            else:
+                rows = read_rows(request.get_data(), request.content_type)
+        except ValueError as e:
+            return jsonify({"error": f"Could not parse input: {e}"}), 400
+
+        if not rows:
+            return jsonify({"error": "No rows to import"}), 400
+        if len(rows) > MAX_BULK_ROWS:
+            return jsonify({"error": f"At most {MAX_BULK_ROWS} rows per request"}), 400
+
+        cur = get_cursor()
+        if not cur:
+            return jsonify({"error": "Database error"}), 500
+
+        results, created, _ = ingest(cur, conn, session["user_id"], rows)
+        return jsonify({"created": created, "failed": len(rows) - created, "results": results})
+
+    # ---------- AUTOCOMPLETE ----------
+    @app.get("/api/suggest")
+    def api_suggest():
+        """?q=piz -> [{"text": "Pizza slices", "kind": "title"}, ...]"""
+        q = request.args.get("q", "")
+        try:
+            limit = min(SUGGEST_MAX_LIMIT, max(1, int(request.args.get("limit", SUGGEST_LIMIT))))
+        except ValueError:
+            limit = SUGGEST_LIMIT
+
+        cur = get_read_cursor()
+        if cur:
+            try:
+                suggest_index.sync(cur)
+            except Exception:
+                # Serve whatever the index already has
+                log.exception("Suggest sync error")
+        resp = jsonify(suggest_index.suggest(q, limit))
+        resp.cache_control.private = True
+        resp.cache_control.max_age = 5
+        return resp
+
     # ---------- MY POSTS ----------
     @app.get("/api/food-posts/mine")
     def api_my_posts():
@@ -253,7 +486,7 @@ def register_api_routes(app):
         if need:
             return jsonify({"error": "Unauthorized"}), 401
 
-        cur = get_cursor()
+        cur = get_read_cursor()
         if not cur:
             return jsonify({"error": "Database error"}), 500
 
@@ -286,36 +519,63 @@ def register_api_routes(app):
 
             return jsonify(posts)
         except Exception as e:
-            print(f"❌ API My Posts Error: {e}")
+            log.exception("API my posts error")
             return jsonify({"error": str(e)}), 500
 
     # ---------- SINGLE POST ----------
     @app.get("/api/food-posts/<int:id>")
     def api_get_post(id):
-        cur = get_cursor()
+        cur = get_read_cursor()
         if not cur:
             return jsonify({"error": "Database error"}), 500
 
         try:
+            # Cheap validator lookup first: pollers that already have the
+            # current version get a 304 without the joined queries.
             cur.execute(
                 """
-                SELECT p.*, u.email AS owner_email
+                SELECT p.user_id, p.version, p.updated_at,
+                       COUNT(c.id), COALESCE(MAX(c.id), 0),
+                       COALESCE(SUM(c.version), 0), MAX(c.updated_at)
                 FROM posts p
-                JOIN users u ON p.user_id = u.id
+                LEFT JOIN claims c ON c.post_id = p.id
                 WHERE p.id = ?
+                GROUP BY p.id, p.user_id, p.version, p.updated_at
                 """,
                 (id,),
             )
-            rows = cur.fetchall()
-            if not rows:
+            row = cur.fetchone()
+            if not row:
                 return jsonify({"error": "Post not found"}), 404
 
-            post = dict_rows(rows, cur.description)[0]
-            post["ownerEmail"] = post.get("owner_email")
-
-            # If owner, also include claims
-            if "user_id" in session and session["user_id"] == post["user_id"]:
-                cur.execute(
+            owner_id, version, updated_at = row[0], row[1], row[2]
+            # Owners also get the claims, so their representation (and
+            # validators) depend on the claims too
+            is_owner = session.get("user_id") == owner_id
+            if is_owner:
+                etag = make_etag("post", id, version, updated_at, *row[3:6])
+                last_modified = _latest(updated_at, row[6])
+            else:
+                etag = make_etag("post", id, version, updated_at)
+                last_modified = updated_at
+            cached = not_modified(etag, last_modified)
+            if cached:
+                return cached
+
+            queries = {
+                "post": (
+                    """
+                    SELECT p.*, u.email AS owner_email
+                    FROM posts p
+                    JOIN users u ON p.user_id = u.id
+                    WHERE p.id = ?
+                    """,
+                    (id,),
+                ),
+            }
+            # If owner, also include claims (fetched alongside the post)
+            if is_owner:
+                queries["claims"] = (
                     """
                     SELECT c.*, u.email AS claimer_email
                     FROM claims c
@@ -324,9 +584,16 @@ def register_api_routes(app):
                     """,
                     (id,),
                 )
-                post["claims"] = dict_rows(cur.fetchall(), cur.description)
+            res = run_parallel(queries)
+            if not res["post"]:
+                return jsonify({"error": "Post not found"}), 404
+
+            post = res["post"][0]
+            post["ownerEmail"] = post.get("owner_email")
+            if is_owner:
+                post["claims"] = res["claims"]
 
-            return jsonify(post)
+            return set_validators(jsonify(post), etag, last_modified)
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -342,19 +609,40 @@ def register_api_routes(app):
             return jsonify({"error": "Database error"}), 500
 
         try:
-            cur.execute("SELECT user_id FROM posts WHERE id=?", (id,))
-            row = cur.fetchone()
-            if not row:
-                return jsonify({"error": "Post not found"}), 404
-            if row[0] != session["user_id"]:
-                return jsonify({"error": "Forbidden"}), 403
+            # Delete related claims first (safe if no FK / works even if FK exists).
+            # The ownership check rides along in the WHERE clause and RETURNING
+            # hands back the claimers we need to notify.
+            cur.execute(
+                """
+                DELETE FROM claims
+                WHERE post_id = ?
+                  AND post_id IN (SELECT id FROM posts WHERE id = ? AND user_id = ?)
+                RETURNING id, claimer_id
+                """,
+                (id, id, session["user_id"]),
+            )
+            claim_rows = cur.fetchall()
+            claimer_ids = list({r[1] for r in claim_rows})
 
-            # Delete related claims first (safe if no FK / works even if FK exists)
-            cur.execute("DELETE FROM claims WHERE post_id=?", (id,))
             # Delete the post
-            cur.execute("DELETE FROM posts WHERE id=?", (id,))
+            cur.execute(
+                "DELETE FROM posts WHERE id=? AND user_id=?",
+                (id, session["user_id"]),
+            )
+            if cur.rowcount == 0:
+                conn.rollback()
+                return _post_write_error(cur, id) or (
+                    jsonify({"error": "Post not found"}), 404
+                )
 
-            conn.commit()
+            record_changes(cur, "claim", [r[0] for r in claim_rows], CHANGE_DELETE)
+            record_change(cur, "post", id, CHANGE_DELETE)
+            commit_changes(conn)
+            publish(
+                POST_STATUS_CHANGED,
+                {"post_id": id, "status": "deleted"},
+                claimer_ids + [session["user_id"]],
+            )
             return jsonify({"success": True})
         except Exception as e:
             conn.rollback()
@@ -377,15 +665,28 @@ def register_api_routes(app):
             return jsonify({"error": "Status required"}), 400
 
         try:
-            cur.execute("SELECT user_id FROM posts WHERE id=?", (id,))
-            row = cur.fetchone()
-            if not row:
-                return jsonify({"error": "Post not found"}), 404
-            if row[0] != session["user_id"]:
-                return jsonify({"error": "Forbidden"}), 403
+            cur.execute(
+                """
+                UPDATE posts SET status=?, version=version+1
+                WHERE id=? AND user_id=?
+                """,
+                (new_status, id, session["user_id"]),
+            )
+            if cur.rowcount == 0:
+                conn.rollback()
+                return _post_write_error(cur, id) or (
+                    jsonify({"error": "Post not found"}), 404
+                )
 
-            cur.execute("UPDATE posts SET status=? WHERE id=?", (new_status, id))
-            conn.commit()
+            record_change(cur, "post", id, CHANGE_UPDATE)
+            cur.execute("SELECT DISTINCT claimer_id FROM claims WHERE post_id=?", (id,))
+            claimer_ids = [r[0] for r in cur.fetchall()]
+            commit_changes(conn)
+            publish(
+                POST_STATUS_CHANGED,
+                {"post_id": id, "status": new_status},
+                claimer_ids + [session["user_id"]],
+            )
             return jsonify({"success": True, "status": new_status})
         except Exception as e:
             conn.rollback()
@@ -393,6 +694,7 @@ def register_api_routes(app):
 
     # ---------- CREATE CLAIM ----------
     @app.post("/api/food-posts/<int:id>/claims")
+    @idempotent
     def api_create_claim(id):
         need = require_login()
         if need:
@@ -405,38 +707,65 @@ def register_api_routes(app):
         data = request.get_json() or {}
         req_qty = data.get("requested_quantity", "1")
         msg = data.get("message", "")
+        req_amount, _ = parse_quantity(req_qty)
+        if req_amount is not None and req_amount <= 0:
+            return jsonify({"error": "Requested quantity must be positive"}), 400
 
         try:
-            cur.execute(
-                "SELECT user_id, status, expires_at, quantity FROM posts WHERE id=?",
-                (id,),
-            )
-            row = cur.fetchone()
-            if not row:
-                return jsonify({"error": "Post not found"}), 404
-
-            owner_id, status, expires_at, qty = row
-
-            if owner_id == session["user_id"]:
-                return jsonify({"error": "Cannot claim own post"}), 400
-            if status != "active":
-                return jsonify({"error": "Post not available"}), 400
-            if expires_at and expires_at <= datetime.now():
-                return jsonify({"error": "Post expired"}), 400
-
+            # Validate and insert in one statement: the SELECT only yields a row
+            # when the post is claimable, and RETURNING gives back the new claim.
             cur.execute(
                 """
                 INSERT INTO claims (post_id, claimer_id, message, requested_quantity,
-                                    status, created_at)
-                VALUES (?, ?, ?, ?, 'pending', NOW())
+                                    requested_amount, status, created_at)
+                SELECT p.id, ?, ?, ?, ?, 'pending', NOW()
+                FROM posts p
+                WHERE p.id = ?
+                  AND p.user_id <> ?
+                  AND p.status = 'active'
+                  AND (p.expires_at IS NULL OR p.expires_at > NOW())
+                  AND (p.quantity_amount IS NULL OR ? IS NULL
+                       OR p.quantity_amount >= ?)
+                RETURNING *,
+                          (SELECT o.user_id FROM posts o WHERE o.id = claims.post_id) AS owner_id
                 """,
-                (id, session["user_id"], msg, req_qty),
+                (
+                    session["user_id"], msg, req_qty, req_amount,
+                    id, session["user_id"], req_amount, req_amount,
+                ),
             )
-            conn.commit()
+            rows = cur.fetchall()
+            if not rows:
+                # Slow path: work out which rule the post failed
+                cur.execute(
+                    "SELECT user_id, status, expires_at, quantity_amount FROM posts WHERE id=?",
+                    (id,),
+                )
+                row = cur.fetchone()
+                if not row:
+                    return jsonify({"error": "Post not found"}), 404
+                owner_id, status, expires_at, qty_amount = row
+                if owner_id == session["user_id"]:
+                    return jsonify({"error": "Cannot claim own post"}), 400
+                if status != "active":
+                    return jsonify({"error": "Post not available"}), 400
+                if expires_at and expires_at <= datetime.now():
+                    return jsonify({"error": "Post expired"}), 400
+                if qty_amount is not None and req_amount is not None and req_amount > qty_amount:
+                    return jsonify({"error": "Requested quantity exceeds what's left"}), 400
+                return jsonify({"error": "Post not available"}), 400
+
+            new_claim = dict_rows(rows, cur.description)[0]
+            owner_id = new_claim.pop("owner_id")
+            claim_id = new_claim["id"]
+            record_change(cur, "claim", claim_id, CHANGE_INSERT)
+            commit_changes(conn)
 
-            claim_id = cur.lastrowid
-            cur.execute("SELECT * FROM claims WHERE id=?", (claim_id,))
-            new_claim = dict_rows(cur.fetchall(), cur.description)[0]
+            publish(
+                CLAIM_CREATED,
+                {"claim_id": claim_id, "post_id": id, "status": "pending"},
+                [owner_id, session["user_id"]],
+            )
             return jsonify(new_claim), 201
 
         except Exception as e:
@@ -450,11 +779,18 @@ def register_api_routes(app):
         if need:
             return jsonify({"error": "Unauthorized"}), 401
 
-        cur = get_cursor()
+        cur = get_read_cursor()
         if not cur:
             return jsonify({"error": "Database error"}), 500
 
         try:
+            etag, last_modified = _claims_list_validators(
+                cur, "c.claimer_id", session["user_id"]
+            )
+            cached = not_modified(etag, last_modified)
+            if cached:
+                return cached
+
             cur.execute(
                 """
                 SELECT c.*, p.title AS post_title, p.location, p.expires_at,
@@ -468,7 +804,7 @@ def register_api_routes(app):
                 (session["user_id"],),
             )
             claims = dict_rows(cur.fetchall(), cur.description)
-            return jsonify(claims)
+            return set_validators(jsonify(claims), etag, last_modified)
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -479,11 +815,18 @@ def register_api_routes(app):
         if need:
             return jsonify({"error": "Unauthorized"}), 401
 
-        cur = get_cursor()
+        cur = get_read_cursor()
         if not cur:
             return jsonify({"error": "Database error"}), 500
 
         try:
+            etag, last_modified = _claims_list_validators(
+                cur, "p.user_id", session["user_id"]
+            )
+            cached = not_modified(etag, last_modified)
+            if cached:
+                return cached
+
             cur.execute(
                 """
                 SELECT c.*, p.title AS post_title, u.email AS claimer_email
@@ -496,30 +839,157 @@ def register_api_routes(app):
                 (session["user_id"],),
             )
             claims = dict_rows(cur.fetchall(), cur.description)
-            return jsonify(claims)
+            return set_validators(jsonify(claims), etag, last_modified)
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
-    # ---------- UPDATE CLAIM (approve / reject) ----------
-    @app.patch("/api/claims/<int:id>")
-    def api_update_claim(id):
+    # ---------- OWNER DASHBOARD (My Posts page in one request) ----------
+    @app.get("/api/dashboard/owner")
+    def api_owner_dashboard():
+        """{"posts": [...], "claims": {post_id: [...]}, "stats": {...}}"""
         need = require_login()
         if need:
             return jsonify({"error": "Unauthorized"}), 401
 
-        cur = get_cursor()
+        cur = get_read_cursor()
+        if not cur:
+            return jsonify({"error": "Database error"}), 500
+
+        user_id = session["user_id"]
+        try:
+            # Keyed by data version: any post/claim write moves to a fresh key
+            version = data_version(cur)
+            if version is None:
+                payload = _owner_dashboard(cur, user_id)
+            else:
+                payload = dashboards.get_or_set(
+                    (user_id, version), lambda: _owner_dashboard(cur, user_id)
+                )
+            resp = jsonify(payload)
+            resp.cache_control.private = True
+            resp.cache_control.no_cache = True
+            return resp
+        except Exception as e:
+            log.exception("API owner dashboard error")
+            return jsonify({"error": str(e)}), 500
+
+    # ---------- BATCH UPDATE CLAIMS (approve / reject many) ----------
+    @app.patch("/api/claims/batch")
+    def api_update_claims_batch():
+        """
+        Body: {"decisions": [{"id": 12, "status": "accepted"}, ...]}
+        Returns one result per item; valid items are applied in one transaction.
+        """
+        need = require_login()
+        if need:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        data = request.get_json(silent=True)
+        items = data.get("decisions") if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "decisions must be a non-empty list"}), 400
+        if len(items) > MAX_BATCH_DECISIONS:
+            return jsonify({"error": f"At most {MAX_BATCH_DECISIONS} decisions per batch"}), 400
+
+        # `slots` keeps the response in request order: either an error dict for
+        # an item that failed validation here, or None for one sent to the DB.
+        decisions = []
+        slots = []
+        for item in items:
+            item = item if isinstance(item, dict) else {}
+            try:
+                claim_id = int(item.get("id"))
+            except (TypeError, ValueError):
+                slots.append({"id": item.get("id"), "ok": False, "error": "Invalid id", "code": 400})
+                continue
+            action = item.get("status")
+            if action not in ["accepted", "rejected"]:
+                slots.append({"id": claim_id, "ok": False, "error": "Invalid status", "code": 400})
+                continue
+            decisions.append((claim_id, "approved" if action == "accepted" else "rejected"))
+            slots.append(None)
+
+        # Own connection: a rollback here must not touch other requests' writes
+        cur = get_write_cursor()
         if not cur:
             return jsonify({"error": "Database error"}), 500
+        wconn = get_write_connection()
+
+        try:
+            results, applied = decide_claims_batch(cur, session["user_id"], decisions)
+            commit_changes(wconn)
+        except Exception as e:
+            wconn.rollback()
+            log.exception("API batch claims error")
+            return jsonify({"error": str(e)}), 500
+
+        for item in applied:
+            publish_decision(item, session["user_id"])
+
+        db_results = iter(results)
+        ordered = [slot or next(db_results) for slot in slots]
+        return jsonify({"applied": len(applied), "results": ordered})
+
+    # ---------- UPDATE CLAIM (approve / reject) ----------
+    @app.patch("/api/claims/<int:id>")
+    def api_update_claim(id):
+        need = require_login()
+        if need:
+            return jsonify({"error": "Unauthorized"}), 401
 
         data = request.get_json() or {}
         action = data.get("status")  # accepted or rejected
         if action not in ["accepted", "rejected"]:
             return jsonify({"error": "Invalid status"}), 400
 
+        new_status = "approved" if action == "accepted" else "rejected"
+        # Optional optimistic check: the post version the owner was looking at
+        expected_version = data.get("version")
+        if expected_version is not None:
+            try:
+                expected_version = int(expected_version)
+            except (TypeError, ValueError):
+                return jsonify({"error": "Invalid version"}), 400
+
+        # Own connection: a rollback here must not touch other requests' writes
+        cur = get_write_cursor()
+        if not cur:
+            return jsonify({"error": "Database error"}), 500
+        wconn = get_write_connection()
+
+        try:
+            result = decide_claim(
+                cur, id, session["user_id"], new_status, expected_version
+            )
+            commit_changes(wconn)
+            publish_decision(result, session["user_id"])
+            return jsonify({
+                "success": True,
+                "status": new_status,
+                "post_status": result["post_status"],
+            })
+        except ClaimDecisionError as e:
+            wconn.rollback()
+            return jsonify({"error": e.message}), e.status
+        except Exception as e:
+            wconn.rollback()
+            return jsonify({"error": str(e)}), 500
+
+    # ---------- CANCEL CLAIM ----------
+    @app.patch("/api/claims/<int:id>/cancel")
+    def api_cancel_claim(id):
+        need = require_login()
+        if need:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        cur = get_cursor()
+        if not cur:
+            return jsonify({"error": "Database error"}), 500
+
         try:
             cur.execute(
                 """
-                SELECT c.post_id, p.user_id, c.requested_quantity, p.quantity
+                SELECT c.claimer_id, c.post_id, p.user_id
                 FROM claims c
                 JOIN posts p ON c.post_id = p.id
                 WHERE c.id = ?
@@ -529,68 +999,105 @@ def register_api_routes(app):
             row = cur.fetchone()
             if not row:
                 return jsonify({"error": "Claim not found"}), 404
-
-            post_id, owner_id, req_qty, post_qty = row
-            if owner_id != session["user_id"]:
+            claimer_id, post_id, owner_id = row
+            if claimer_id != session["user_id"]:
                 return jsonify({"error": "Forbidden"}), 403
 
-            new_status = "approved" if action == "accepted" else "rejected"
-
             cur.execute(
-                "UPDATE claims SET status=?, decided_at=NOW() WHERE id=?",
-                (new_status, id),
+                "UPDATE claims SET status='cancelled', version=version+1 WHERE id=?",
+                (id,),
             )
-
-            # If approved, optionally decrement quantity / mark claimed
-            if new_status == "approved":
-                try:
-                    p_q = float(str(post_qty).split()[0])
-                    r_q = float(str(req_qty).split()[0])
-                    rem_q = max(0, p_q - r_q)
-
-                    if rem_q <= 0:
-                        cur.execute(
-                            "UPDATE posts SET status='claimed', quantity='0' WHERE id=?",
-                            (post_id,),
-                        )
-                    else:
-                        cur.execute(
-                            "UPDATE posts SET quantity=? WHERE id=?",
-                            (str(rem_q), post_id),
-                        )
-                except Exception:
-                    pass
-
-            conn.commit()
-            return jsonify({"success": True, "status": new_status})
+            record_change(cur, "claim", id, CHANGE_UPDATE)
+            commit_changes(conn)
+            publish(
+                CLAIM_CANCELLED,
+                {"claim_id": id, "post_id": post_id, "status": "cancelled"},
+                [owner_id, claimer_id],
+            )
+            return jsonify({"success": True})
         except Exception as e:
             conn.rollback()
             return jsonify({"error": str(e)}), 500
 
-    # ---------- CANCEL CLAIM ----------
-    @app.patch("/api/claims/<int:id>/cancel")
-    def api_cancel_claim(id):
-        need = require_login()
-        if need:
-            return jsonify({"error": "Unauthorized"}), 401
+    # ---------- DELTA SYNC ----------
+    @app.get("/api/changes")
+    def api_changes():
+        """
+        Return posts/claims inserted, updated or deleted after ?since=<version>.
+
+        Clients keep the returned `version` and send it back next time; when
+        `has_more` is true they should call again straight away. `version`
+        never moves past a change that may still be committing (see
+        changes_since), so nothing is skipped.
+        """
+        try:
+            since = max(0, int(request.args.get("since", 0)))
+            limit = min(1000, max(1, int(request.args.get("limit", 500))))
+        except ValueError:
+            return jsonify({"error": "since and limit must be integers"}), 400
 
-        cur = get_cursor()
+        cur = get_read_cursor()
         if not cur:
             return jsonify({"error": "Database error"}), 500
 
         try:
-            cur.execute("SELECT claimer_id FROM claims WHERE id=?", (id,))
-            row = cur.fetchone()
-            if not row:
-                return jsonify({"error": "Claim not found"}), 404
-            if row[0] != session["user_id"]:
-                return jsonify({"error": "Forbidden"}), 403
+            changes, version = changes_since(cur, since, limit)
 
-            cur.execute("UPDATE claims SET status='cancelled' WHERE id=?", (id,))
-            conn.commit()
-            return jsonify({"success": True})
+            # Only the latest op per row matters to the client
+            latest = {}
+            for entity, entity_id, op in changes:
+                latest[(entity, entity_id)] = op
+
+            post_ids = [i for (e, i), op in latest.items() if e == "post" and op != CHANGE_DELETE]
+            claim_ids = [i for (e, i), op in latest.items() if e == "claim" and op != CHANGE_DELETE]
+            deleted_posts = [i for (e, i), op in latest.items() if e == "post" and op == CHANGE_DELETE]
+            deleted_claims = [i for (e, i), op in latest.items() if e == "claim" and op == CHANGE_DELETE]
+
+            posts = []
+            if post_ids:
+                marks = ",".join("?" * len(post_ids))
+                cur.execute(
+                    f"""
+                    SELECT p.*, u.email AS owner_email
+                    FROM posts p
+                    JOIN users u ON p.user_id = u.id
+                    WHERE p.id IN ({marks})
+                    """,
+                    tuple(post_ids),
+                )
+                posts = dict_rows(cur.fetchall(), cur.description)
+                for p in posts:
+                    p["ownerEmail"] = p.get("owner_email")
+                # Rows gone since the change was logged count as deletes
+                found = {p["id"] for p in posts}
+                deleted_posts += [i for i in post_ids if i not in found]
+
+            claims = []
+            if claim_ids and "user_id" in session:
+                # Claims are private to the claimer and the post owner
+                marks = ",".join("?" * len(claim_ids))
+                cur.execute(
+                    f"""
+                    SELECT c.*, p.title AS post_title, p.user_id AS post_owner_id,
+                           u.email AS claimer_email
+                    FROM claims c
+                    JOIN posts p ON c.post_id = p.id
+                    JOIN users u ON c.claimer_id = u.id
+                    WHERE c.id IN ({marks})
+                      AND (c.claimer_id = ? OR p.user_id = ?)
+                    """,
+                    tuple(claim_ids) + (session["user_id"], session["user_id"]),
+                )
+                claims = dict_rows(cur.fetchall(), cur.description)
+
+            return jsonify({
+                "version": version,
+                "has_more": len(changes) == limit,
+                "posts": {"upserted": posts, "deleted": deleted_posts},
+                "claims": {"upserted": claims, "deleted": deleted_claims},
+            })
         except Exception as e:
-            conn.rollback()
+            log.exception("API changes error")
             return jsonify({"error": str(e)}), 500
 
     # ---------- STATS ----------
@@ -598,7 +1105,11 @@ def register_api_routes(app):
     def api_stats_global():
         from db_utils import compute_stats
 
-        return jsonify(compute_stats())
+        try:
+            return jsonify(compute_stats())
+        except Exception:
+            log.exception("API stats error")
+            return jsonify({"error": "Database error"}), 500
 
     @app.get("/api/stats/me")
     def api_stats_me():
@@ -608,4 +1119,120 @@ def register_api_routes(app):
 
         from db_utils import compute_stats
 
-        return jsonify(compute_stats(session["user_id"]))
+        try:
+            return jsonify(compute_stats(session["user_id"]))
+        except Exception:
+            log.exception("API stats error")
+            return jsonify({"error": "Database error"}), 500
+
+    # ---------- STATS: ROLLUPS (see rollup_stats.py) ----------
+    @app.get("/api/stats/timeseries")
+    def api_stats_timeseries():
+        """
+        ?bucket=day|week  &days=30  &scope=global|me  &category=Meals
+        Returns [{period, posts_created, posts_shared, kg_saved, claims_made,
+        claims_approved}, ...] oldest first.
+        """
+        bucket = request.args.get("bucket", "day")
+        scope = request.args.get("scope", "global")
+        category = request.args.get("category")
+        try:
+            days = min(366, max(1, int(request.args.get("days", 30))))
+        except ValueError:
+            return jsonify({"error": "days must be an integer"}), 400
+        if bucket not in ("day", "week"):
+            return jsonify({"error": "bucket must be day or week"}), 400
+
+        period = "day" if bucket == "day" else "day - INTERVAL WEEKDAY(day) DAY"
+        query = f"""
+            SELECT {period} AS period,
+                   SUM(posts_created) AS posts_created,
+                   SUM(posts_shared) AS posts_shared,
+                   SUM(weight_shared_kg) AS kg_saved,
+                   SUM(claims_made) AS claims_made,
+                   SUM(claims_approved) AS claims_approved
+            FROM impact_daily
+            WHERE day >= CURDATE() - INTERVAL ? DAY
+        """
+        params = [days]
+
+        if scope == "me":
+            need = require_login()
+            if need:
+                return jsonify({"error": "Unauthorized"}), 401
+            query += " AND user_id = ?"
+            params.append(session["user_id"])
+        if category:
+            query += " AND category = ?"
+            params.append(category)
+        query += " GROUP BY period ORDER BY period"
+
+        cur = get_read_cursor()
+        if not cur:
+            return jsonify({"error": "Database error"}), 500
+        try:
+            cur.execute(query, tuple(params))
+            rows = dict_rows(cur.fetchall(), cur.description)
+            for r in rows:
+                r["period"] = r["period"].isoformat() if r["period"] else None
+                r["kg_saved"] = float(r["kg_saved"] or 0)
+            return jsonify(rows)
+        except Exception as e:
+            log.exception("API timeseries error")
+            return jsonify({"error": str(e)}), 500
+
+    @app.get("/api/stats/leaderboard")
+    def api_stats_leaderboard():
+        """
+        ?by=donors|categories  &days=30  &limit=10
+        donors:     top users by kg of food shared
+        categories: claims made/approved and kg shared per category
+        """
+        by = request.args.get("by", "donors")
+        try:
+            days = min(3660, max(1, int(request.args.get("days", 30))))
+            limit = min(100, max(1, int(request.args.get("limit", 10))))
+        except ValueError:
+            return jsonify({"error": "days and limit must be integers"}), 400
+
+        if by == "donors":
+            query = """
+                SELECT i.user_id, u.name,
+                       SUM(i.weight_shared_kg) AS kg_saved,
+                       SUM(i.posts_shared) AS posts_shared,
+                       SUM(i.posts_created) AS posts_created
+                FROM impact_daily i
+                JOIN users u ON u.id = i.user_id
+                WHERE i.day >= CURDATE() - INTERVAL ? DAY
+                GROUP BY i.user_id, u.name
+                HAVING SUM(i.posts_created) > 0
+                ORDER BY kg_saved DESC, posts_shared DESC
+                LIMIT ?
+            """
+        elif by == "categories":
+            query = """
+                SELECT category,
+                       SUM(claims_made) AS claims_made,
+                       SUM(claims_approved) AS claims_approved,
+                       SUM(weight_shared_kg) AS kg_saved
+                FROM impact_daily
+                WHERE day >= CURDATE() - INTERVAL ? DAY
+                GROUP BY category
+                ORDER BY claims_made DESC
+                LIMIT ?
+            """
+        else:
+            return jsonify({"error": "by must be donors or categories"}), 400
+
+        cur = get_read_cursor()
+        if not cur:
+            return jsonify({"error": "Database error"}), 500
+        try:
+            cur.execute(query, (days, limit))
+            rows = dict_rows(cur.fetchall(), cur.description)
+            for r in rows:
+                r["kg_saved"] = float(r["kg_saved"] or 0)
+            return jsonify(rows)
+        except Exception as e:
+            log.exception("API leaderboard error")
+            return jsonify({"error": str(e)}), 500
@@ -1,13 +1,35 @@
 # routes_claims.py
 
+import logging
 from datetime import datetime
 from flask import (
     request, redirect, url_for, flash,
     session, render_template
 )
 
-from db_utils import get_cursor, dict_rows, conn
+from db_utils import (
+    get_cursor, get_read_cursor, get_write_cursor, get_write_connection,
+    dict_rows, conn, commit_changes, record_change, CHANGE_INSERT, data_version,
+)
 from auth_utils import require_login
+from cache_utils import cached_fragment, render_fragment
+from event_utils import publish, CLAIM_CREATED
+from claim_utils import ClaimDecisionError, decide_claim, publish_decision
+from quantity_utils import parse_quantity
+
+log = logging.getLogger(__name__)
+
+
+def _claim_fragments(claims, icon, email_field, empty_pending, empty_history):
+    """Render (pending, everything else) claim-card fragments."""
+    pending = [c for c in claims if c["status"] == "pending"]
+    history = [c for c in claims if c["status"] != "pending"]
+    return (
+        render_fragment("partials/claim_list.html", claims=pending, icon=icon,
+                        email_field=email_field, empty=empty_pending),
+        render_fragment("partials/claim_list.html", claims=history, icon=icon,
+                        email_field=email_field, empty=empty_history),
+    )
 
 
 def register_claim_routes(app):
@@ -23,6 +45,13 @@ def register_claim_routes(app):
             return need
 
         message = request.form.get("message", "").strip()
+        # Same quantity handling as POST /api/food-posts/<id>/claims
+        req_qty = (request.form.get("requested_quantity") or "1").strip()
+        req_amount, _ = parse_quantity(req_qty)
+        if req_amount is not None and req_amount <= 0:
+            flash("Requested quantity must be positive.", "error")
+            return redirect(url_for("home"))
+
         cur = get_cursor()
         if cur is None:
             flash("Database connection error. Please try again.", "error")
@@ -30,7 +59,10 @@ def register_claim_routes(app):
 
         try:
             # Prevent claiming own post
-            cur.execute("SELECT user_id,status FROM posts WHERE id=?", (post_id,))
+            cur.execute(
+                "SELECT user_id,status,quantity_amount FROM posts WHERE id=?",
+                (post_id,),
+            )
             row = cur.fetchone()
 
             if not row:
@@ -45,15 +77,27 @@ def register_claim_routes(app):
                 flash("Post is not available.", "error")
                 return redirect(url_for("home"))
 
+            if row[2] is not None and req_amount is not None and req_amount > row[2]:
+                flash("Requested quantity exceeds what's left.", "error")
+                return redirect(url_for("home"))
+
             # Insert claim
             cur.execute(
                 """
-                INSERT INTO claims (post_id, claimer_id, message)
-                VALUES (?, ?, ?)
+                INSERT INTO claims (post_id, claimer_id, message,
+                                    requested_quantity, requested_amount)
+                VALUES (?, ?, ?, ?, ?)
                 """,
-                (post_id, session["user_id"], message or None),
+                (post_id, session["user_id"], message or None, req_qty, req_amount),
+            )
+            claim_id = cur.lastrowid
+            record_change(cur, "claim", claim_id, CHANGE_INSERT)
+            commit_changes(conn)
+            publish(
+                CLAIM_CREATED,
+                {"claim_id": claim_id, "post_id": post_id, "status": "pending"},
+                [row[0], session["user_id"]],
             )
-            conn.commit()
             flash("Request sent to owner!", "success")
 
         except Exception as e:
@@ -63,7 +107,7 @@ def register_claim_routes(app):
             if "Duplicate" in msg or "duplicate" in msg:
                 flash("You already requested this item.", "warning")
             else:
-                print("❌ Claim error:", e)
+                log.exception("Claim error")
                 flash("Could not process claim.", "error")
 
         return redirect(url_for("home"))
@@ -78,52 +122,32 @@ def register_claim_routes(app):
         if action not in ("approve", "reject"):
             return "Invalid action", 400
 
-        cur = get_cursor()
+        # Own connection: a rollback here must not touch other requests' writes
+        cur = get_write_cursor()
         if cur is None:
             flash("Database connection error. Please try again.", "error")
             return redirect(url_for("myposts"))
+        wconn = get_write_connection()
+
+        new_status = "approved" if action == "approve" else "rejected"
 
         try:
-            cur.execute(
-                """
-                SELECT c.post_id, p.user_id
-                FROM claims c
-                JOIN posts p ON c.post_id = p.id
-                WHERE c.id = ?
-                """,
-                (claim_id,),
-            )
-            claim = cur.fetchone()
-            if not claim:
-                flash("Claim not found.", "error")
-                return redirect(url_for("myposts"))
+            # Same atomic quantity accounting as PATCH /api/claims/<id>
+            result = decide_claim(cur, claim_id, session["user_id"], new_status)
+            commit_changes(wconn)
+            publish_decision(result, session["user_id"])
+            flash(f"Claim {new_status}.", "success")
 
-            post_id, owner_id = claim
-            if owner_id != session["user_id"]:
+        except ClaimDecisionError as e:
+            wconn.rollback()
+            if e.status == 403:
                 flash("You are not authorized.", "error")
-                return redirect(url_for("myposts"))
-
-            new_status = "approved" if action == "approve" else "rejected"
-
-            cur.execute(
-                """
-                UPDATE claims
-                SET status = ?, decided_at = NOW()
-                WHERE id = ?
-                """,
-                (new_status, claim_id),
-            )
-
-            # If approved -> mark post as claimed
-            if new_status == "approved":
-                cur.execute("UPDATE posts SET status='claimed' WHERE id=?", (post_id,))
-
-            conn.commit()
-            flash(f"Claim {new_status}.", "success")
+            else:
+                flash(f"{e.message}.", "error")
 
-        except Exception as e:
-            print("❌ Approve/Reject error:", e)
-            conn.rollback()
+        except Exception:
+            log.exception("Approve/reject error")
+            wconn.rollback()
             flash("Action failed.", "error")
 
         return redirect(url_for("myposts"))
@@ -135,32 +159,40 @@ def register_claim_routes(app):
         if need:
             return need
 
-        cur = get_cursor()
+        cur = get_read_cursor()
         if cur is None:
             flash("Database connection error. Please try again.", "error")
             return redirect(url_for("home"))
 
-        claims = []
-        try:
-            cur.execute(
-                """
-                SELECT c.id, c.status, c.message, c.created_at,
-                       p.description, p.category, p.location,
-                       u.email AS owner_email
-                FROM claims c
-                JOIN posts p ON c.post_id = p.id
-                JOIN users u ON p.user_id = u.id
-                WHERE c.claimer_id = ?
-                ORDER BY c.created_at DESC
-                """,
-                (session["user_id"],),
-            )
-            claims = dict_rows(cur.fetchall(), cur.description)
-        except Exception as e:
-            print("❌ Requests error:", e)
-            claims = []
-
-        return render_template("requests.html", claims=claims)
+        user_id = session["user_id"]
+
+        def my_requests(claims=None):
+            if claims is None:
+                cur.execute(
+                    """
+                    SELECT c.id, c.status, c.message, c.created_at,
+                           p.description, p.category, p.location,
+                           u.email AS owner_email
+                    FROM claims c
+                    JOIN posts p ON c.post_id = p.id
+                    JOIN users u ON p.user_id = u.id
+                    WHERE c.claimer_id = ?
+                    ORDER BY c.created_at DESC
+                    """,
+                    (user_id,),
+                )
+                claims = dict_rows(cur.fetchall(), cur.description)
+            return _claim_fragments(claims, "🍱", "owner_email",
+                                    "No pending requests.", "No past requests.")
+
+        # A DB error renders an empty list once instead of caching it
+        pending_html, history_html = cached_fragment(
+            ("requests", user_id), data_version(cur), my_requests,
+            fallback=lambda: my_requests([]),
+        )
+        return render_template(
+            "requests.html", pending_html=pending_html, history_html=history_html
+        )
 
     # ---- 4. Claims Received (requests on my posts) ----
     @app.get("/claims")
@@ -169,29 +201,37 @@ def register_claim_routes(app):
         if need:
             return need
 
-        cur = get_cursor()
+        cur = get_read_cursor()
         if cur is None:
             flash("Database connection error. Please try again.", "error")
             return redirect(url_for("home"))
 
-        incoming = []
-        try:
-            cur.execute(
-                """
-                SELECT c.id, c.status, c.message, c.created_at,
-                       p.description,
-                       u.email AS claimer_email
-                FROM claims c
-                JOIN posts p ON c.post_id = p.id
-                JOIN users u ON c.claimer_id = u.id
-                WHERE p.user_id = ?
-                ORDER BY c.created_at DESC
-                """,
-                (session["user_id"],),
-            )
-            incoming = dict_rows(cur.fetchall(), cur.description)
-        except Exception as e:
-            print("❌ Claims error:", e)
-            incoming = []
-
-        return render_template("claims.html", claims=incoming)
+        user_id = session["user_id"]
+
+        def incoming_claims(incoming=None):
+            if incoming is None:
+                cur.execute(
+                    """
+                    SELECT c.id, c.status, c.message, c.created_at,
+                           p.description,
+                           u.email AS claimer_email
+                    FROM claims c
+                    JOIN posts p ON c.post_id = p.id
+                    JOIN users u ON c.claimer_id = u.id
+                    WHERE p.user_id = ?
+                    ORDER BY c.created_at DESC
+                    """,
+                    (user_id,),
+                )
+                incoming = dict_rows(cur.fetchall(), cur.description)
+            return _claim_fragments(incoming, "👤", "claimer_email",
+                                    "Nothing active.", "No history yet.")
+
+        # A DB error renders an empty list once instead of caching it
+        active_html, history_html = cached_fragment(
+            ("claims", user_id), data_version(cur), incoming_claims,
+            fallback=lambda: incoming_claims([]),
+        )
+        return render_template(
+            "claims.html", active_html=active_html, history_html=history_html
+        )
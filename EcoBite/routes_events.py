@@ -0,0 +1,47 @@
+# routes_events.py
+
+import queue
+
+from flask import Response, jsonify, session, stream_with_context
+
+from auth_utils import require_login
+from event_utils import broker, format_sse
+
+# Send a comment line this often so proxies don't close idle streams
+KEEPALIVE_SECONDS = 15
+
+
+def register_event_routes(app):
+    # ---------- SERVER-SENT EVENTS ----------
+    @app.get("/api/events")
+    def api_events():
+        need = require_login()
+        if need:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        user_id = session["user_id"]
+        q = broker.subscribe(user_id)
+
+        def stream():
+            try:
+                # Ask the browser to reconnect after 5s if the stream drops
+                yield "retry: 5000\n\n"
+                while True:
+                    try:
+                        message = q.get(timeout=KEEPALIVE_SECONDS)
+                    except queue.Empty:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield format_sse(message)
+            finally:
+                broker.unsubscribe(user_id, q)
+
+        return Response(
+            stream_with_context(stream()),
+            mimetype="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                # Disable response buffering in nginx
+                "X-Accel-Buffering": "no",
+            },
+        )
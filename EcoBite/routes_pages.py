@@ -1,4 +1,5 @@
 import json
+import logging
 import os
 from datetime import datetime, timedelta
 
@@ -10,11 +11,19 @@ from flask import (
     session,
     flash,
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 
-from db_utils import get_cursor, compute_stats, dict_rows, conn
+from db_utils import (
+    get_cursor, get_read_cursor, compute_stats, empty_stats, dict_rows, conn,
+    commit_changes, record_change, CHANGE_INSERT, data_version, reading_own_writes,
+)
 from auth_utils import require_login, ALLOWED_ROLES
+from cache_utils import cached_fragment, render_fragment
+from feed_index import active_posts
+from quantity_utils import parse_quantity
+from password_utils import hash_password, verify_password, HashQueueFull
+
+log = logging.getLogger(__name__)
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -54,14 +63,29 @@ def register_pages(app):
                 (email,),
             )
             row = cur.fetchone()
-            if not row or not check_password_hash(row[2], password):
+            ok, new_hash = verify_password(row[2], password) if row else (False, None)
+            if not ok:
                 flash("Invalid email or password.", "error")
                 return redirect(url_for("login"))
+            if new_hash:
+                # Hash parameters changed since this password was stored
+                try:
+                    cur.execute(
+                        "UPDATE users SET password_hash=? WHERE id=? AND password_hash=?",
+                        (new_hash, row[0], row[2]),
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    log.exception("Password rehash error")
             session.update({"user_id": row[0], "email": row[1], "role": row[3]})
             flash("Welcome back!", "success")
             return redirect(url_for("home"))
-        except Exception as e:
-            print(f"❌ Login error: {e}")
+        except HashQueueFull:
+            flash("Lots of people are signing in right now. Please try again.", "error")
+            return redirect(url_for("login"))
+        except Exception:
+            log.exception("Login error")
             flash("An error occurred. Please try again.", "error")
             return redirect(url_for("login"))
 
@@ -90,35 +114,51 @@ def register_pages(app):
             flash("Email, name, and password are required.", "error")
             return redirect(url_for("signup"))
 
-        pw_hash = generate_password_hash(password)
+        try:
+            pw_hash = hash_password(password)
+        except HashQueueFull:
+            flash("Lots of people are signing up right now. Please try again.", "error")
+            return redirect(url_for("signup"))
         cur = get_cursor()
         if cur is None:
             flash("Database connection error. Please try again.", "error")
             return redirect(url_for("signup"))
 
         try:
-            cur.execute("SELECT id FROM users WHERE email=?", (email,))
-            if cur.fetchone():
+            # Insert only if the email is free and read the new id back in the
+            # same round trip.
+            cur.execute(
+                """
+                INSERT INTO users (name,email,password_hash,role)
+                SELECT ?,?,?,? FROM DUAL
+                WHERE NOT EXISTS (SELECT 1 FROM users WHERE email=?)
+                RETURNING id,role
+                """,
+                (name, email, pw_hash, role, email),
+            )
+            u = cur.fetchone()
+            if not u:
+                conn.rollback()
                 flash(
                     "Email already exists. Please use a different email or login instead.",
                     "error",
                 )
                 return redirect(url_for("signup"))
+            commit_changes(conn)
 
-            cur.execute(
-                "INSERT INTO users (name,email,password_hash,role) VALUES (?,?,?,?)",
-                (name, email, pw_hash, role),
-            )
-            conn.commit()
-
-            cur.execute("SELECT id,role FROM users WHERE email=?", (email,))
-            u = cur.fetchone()
             session.update({"user_id": u[0], "email": email, "role": u[1]})
             flash("Account created!", "success")
             return redirect(url_for("home"))
         except Exception as e:
             conn.rollback()
-            print(f"❌ Signup error: {e}")
+            if "Duplicate" in str(e):
+                # Lost a race with a concurrent signup for the same email
+                flash(
+                    "Email already exists. Please use a different email or login instead.",
+                    "error",
+                )
+                return redirect(url_for("signup"))
+            log.exception("Signup error")
             flash("An error occurred. Please try again.", "error")
             return redirect(url_for("signup"))
 
@@ -128,14 +168,18 @@ def register_pages(app):
     def home():
         if "user_id" not in session:
             return redirect(url_for("login"))
-        cur = get_cursor()
-        posts = []
-        if cur:
-            try:
+        cur = get_read_cursor()
+        version = data_version(cur) if cur else None
+
+        def feed(posts=None):
+            if posts is None:
+                posts = active_posts(cur)
+            if posts is None and cur:
                 cur.execute(
                     """
-                    SELECT p.id,p.description,p.category,p.quantity,p.status,
-                           p.location,p.expires_at,u.email AS owner_email
+                    SELECT p.id,p.title,p.description,p.category,p.quantity,
+                           p.status,p.location,p.expires_at,p.image_url,
+                           u.email AS owner_email
                     FROM posts p
                     JOIN users u ON p.user_id=u.id
                     WHERE p.status='active'
@@ -144,12 +188,29 @@ def register_pages(app):
                     """
                 )
                 posts = dict_rows(cur.fetchall(), cur.description)
-            except Exception as e:
-                print("❌ Feed error:", e)
-                posts = []
-        stats = compute_stats()
+            html = render_fragment("partials/post_list.html", posts=posts, show_owner=True)
+            return html, bool(posts)
+
+        # Feed and stats are the same for every user: cache them by data
+        # version and only render the page chrome per request. A DB error
+        # renders an empty feed once instead of caching it. Right after a
+        # write the feed comes uncached from the database (read-your-writes).
+        feed_html, has_posts = cached_fragment(
+            ("feed", "active"), None if reading_own_writes() else version,
+            feed, fallback=lambda: feed([]),
+        )
+        stats_html = cached_fragment(
+            ("stats", None),
+            version,
+            lambda: render_fragment("partials/stats_widget.html", stats=compute_stats()),
+            fallback=lambda: render_fragment("partials/stats_widget.html", stats=empty_stats()),
+        )
         return render_template(
-            "index.html", posts=posts, stats=stats, email=session["email"]
+            "index.html",
+            feed_html=feed_html,
+            has_posts=has_posts,
+            stats_html=stats_html,
+            email=session["email"],
         )
 
     # --------------- Create Post (HTML) ----------------
@@ -195,19 +256,23 @@ def register_pages(app):
 
                 # NOTE: Make sure your 'posts' table has a VARCHAR column named 'photo'
                 # or remove 'photo' from these fields if you don't want to store filenames.
+                qty_amount, qty_unit = parse_quantity(qty)
                 cur.execute(
                     """
                     INSERT INTO posts (
                         user_id,description,category,quantity,
+                        quantity_amount,quantity_unit,
                         dietary_json,location,expires_at,status,photo
                     )
-                    VALUES (?,?,?,?,?,?,?,?,?)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?)
                     """,
                     (
                         session["user_id"],
                         desc,
                         category,
                         qty or None,
+                        qty_amount,
+                        qty_unit,
                         dietary_json,
                         location,
                         expiry_dt,
@@ -215,15 +280,16 @@ def register_pages(app):
                         photo_filename,
                     ),
                 )
-                conn.commit()
+                record_change(cur, "post", cur.lastrowid, CHANGE_INSERT)
+                commit_changes(conn)
                 flash("Post shared successfully!", "success")
                 return redirect(url_for("home"))
             except ValueError as e:
-                print("❌ Date parse error:", e)
+                log.warning("Date parse error: %s", e)
                 flash("Invalid date/time format.", "error")
                 return redirect(url_for("create"))
-            except Exception as e:
-                print("❌ Post error:", e)
+            except Exception:
+                log.exception("Create post error")
                 conn.rollback()
                 flash("Could not create post.", "error")
                 return redirect(url_for("create"))
@@ -237,25 +303,31 @@ def register_pages(app):
         need = require_login()
         if need:
             return need
-        cur = get_cursor()
+        cur = get_read_cursor()
         if cur is None:
             flash("Database connection error. Please try again.", "error")
             return redirect(url_for("home"))
-        posts = []
-        try:
-            cur.execute(
-                """
-                SELECT id,description,category,quantity,status,created_at
-                FROM posts WHERE user_id=? ORDER BY created_at DESC
-                """,
-                (session["user_id"],),
-            )
-            posts = dict_rows(cur.fetchall(), cur.description)
-        except Exception as e:
-            print("❌ MyPosts error:", e)
-            posts = []
-        stats = compute_stats(session["user_id"])
-        return render_template("myposts.html", posts=posts, stats=stats)
+        user_id = session["user_id"]
+
+        def my_posts(posts=None):
+            if posts is None:
+                cur.execute(
+                    """
+                    SELECT id,title,description,category,quantity,status,
+                           location,image_url,created_at
+                    FROM posts WHERE user_id=? ORDER BY created_at DESC
+                    """,
+                    (user_id,),
+                )
+                posts = dict_rows(cur.fetchall(), cur.description)
+            return render_fragment("partials/post_list.html", posts=posts, show_status=True)
+
+        # A DB error renders an empty list once instead of caching it
+        posts_html = cached_fragment(
+            ("myposts", user_id), data_version(cur), my_posts,
+            fallback=lambda: my_posts([]),
+        )
+        return render_template("myposts.html", posts_html=posts_html)
 
     # --------------- Profile ----------------
 
@@ -264,5 +336,10 @@ def register_pages(app):
         need = require_login()
         if need:
             return need
-        stats = compute_stats(session["user_id"])
+        try:
+            stats = compute_stats(session["user_id"])
+        except Exception:
+            log.exception("Profile stats error")
+            flash("Could not load your stats right now.", "error")
+            stats = empty_stats(session["user_id"])
         return render_template("profile.html", stats=stats)
@@ -21,6 +21,21 @@ export async function listPosts(params = {}) {
   return await res.json();
 }
 
+// Prefix suggestions for the search box (served from an in-memory index)
+export async function suggest(q, limit = 8) {
+  const query = new URLSearchParams({ q, limit }).toString();
+  const res = await fetch(`${API_BASE}/suggest?${query}`);
+  if (!res.ok) return [];
+  return await res.json();
+}
+
+// My Posts page in one round trip: { posts, claims: {postId: [...]}, stats }
+export async function ownerDashboard() {
+  const res = await fetch(`${API_BASE}/dashboard/owner`);
+  if (!res.ok) throw new Error('Failed to load dashboard');
+  return await res.json();
+}
+
 /* ---------- FIXED createPost ---------- */
 export async function createPost(data) {
   const isFormData = data instanceof FormData;
@@ -83,6 +98,17 @@ export async function rejectClaim(postId, claimId) {
   return await res.json();
 }
 
+// decisions: [{ id: claimId, status: 'accepted' | 'rejected' }, ...]
+export async function decideClaims(decisions) {
+  const res = await fetch(`${API_BASE}/claims/batch`, {
+    method: 'PATCH',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ decisions })
+  });
+  if (!res.ok) throw new Error('Failed to update claims');
+  return await res.json();
+}
+
 export async function deletePost(postId) {
   const res = await fetch(`${API_BASE}/food-posts/${postId}`, {
     method: 'DELETE'
@@ -105,6 +131,26 @@ export async function deletePost(postId) {
   return await res.json();
 }
 
+/* ---------- Live updates (Server-Sent Events) ---------- */
+// One shared EventSource per page; handlers get (eventName, data).
+let _eventSource = null;
+const _eventHandlers = new Set();
+
+export function subscribeEvents(handler) {
+  _eventHandlers.add(handler);
+  if (!_eventSource && window.EventSource) {
+    _eventSource = new EventSource(`${API_BASE}/events`);
+    ['claim.created', 'claim.decided', 'claim.cancelled', 'post.status_changed'].forEach(name => {
+      _eventSource.addEventListener(name, (e) => {
+        let data = {};
+        try { data = JSON.parse(e.data); } catch { /* ignore */ }
+        _eventHandlers.forEach(h => h(name, data));
+      });
+    });
+  }
+  return () => _eventHandlers.delete(handler);
+}
+
 export async function computeStats() {
   // Fetch all posts to compute stats client-side or use a stats endpoint if available.
   // For now, we'll fetch all posts to match previous behavior.
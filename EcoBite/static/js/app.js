@@ -1,4 +1,4 @@
-import { listPosts, createPost, claimPost, approveClaim, rejectClaim, computeStats, getUser, deletePost } from './api.js';
+import { listPosts, createPost, claimPost, approveClaim, rejectClaim, computeStats, getUser, deletePost, subscribeEvents, suggest, ownerDashboard } from './api.js';
 
 /* ---------- Sidebar highlighting + user badge ---------- */
 export function navActivate(key) {
@@ -24,11 +24,24 @@ export async function renderFeed() {
     });
   });
 
-  ['search', 'type', 'sort'].forEach(id => {
+  ['type', 'sort'].forEach(id => {
     const el = document.getElementById(id);
     if (el) el.addEventListener('input', draw);
   });
 
+  // Search: typing only asks for suggestions; the feed query runs when the
+  // search is committed (Enter, picking a suggestion, leaving the box)
+  const search = byId('search');
+  if (search) {
+    let timer;
+    search.addEventListener('input', () => {
+      clearTimeout(timer);
+      timer = setTimeout(() => fillSuggestions(search.value), 80);
+      if (!search.value) draw();
+    });
+    search.addEventListener('change', draw);
+  }
+
   // Dietary popup toggle
   const dietBtn = byId('dietBtn');
   const dietPopup = byId('dietPopup');
@@ -105,6 +118,18 @@ export async function renderFeed() {
   }
 }
 
+async function fillSuggestions(q) {
+  const list = byId('searchSuggestions');
+  if (!list) return;
+  const items = q.trim() ? await suggest(q.trim()) : [];
+  list.innerHTML = '';
+  items.forEach(s => {
+    const opt = document.createElement('option');
+    opt.value = s.text;
+    list.appendChild(opt);
+  });
+}
+
 function openClaimModal(post) {
   const qty = prompt(`Requesting: ${post.title}\nHow much do you need? (e.g. "2 slices")`, "1");
   if (qty) {
@@ -226,14 +251,33 @@ function initCustomDropdowns() {
   document.addEventListener('click', () => { document.querySelectorAll('.custom-select').forEach(s => s.classList.remove('open')); });
 }
 
+/* ---------- LIVE REFRESH ---------- */
+// Re-render the current page when the server pushes a relevant event,
+// instead of re-fetching the claim lists on every interaction.
+let _liveRender = null;
+let _liveTimer = null;
+function liveRefresh(render) {
+  if (!_liveRender) {
+    subscribeEvents(() => {
+      clearTimeout(_liveTimer);
+      // Coalesce bursts (e.g. batch approvals) into one redraw
+      _liveTimer = setTimeout(() => _liveRender && _liveRender(), 300);
+    });
+  }
+  _liveRender = render;
+}
+
 /* ---------- MY POSTS ---------- */
 export async function renderMyPosts() {
   hydrateUserOnSidebar();
-  await fetchAndGroupClaims();
+  liveRefresh(renderMyPosts);
   let list = [];
   try {
-    const res = await fetch('/api/food-posts/mine');
-    if (res.ok) list = await res.json();
+    // Posts, their claims and stats in one request
+    const data = await ownerDashboard();
+    list = data.posts;
+    window._claimsByPost = data.claims;
+    window._ownerStats = data.stats;
   } catch (e) { console.error("Failed to load my posts", e); }
 
   const wrap = byId('mypostsGrid');
@@ -341,25 +385,11 @@ async function deleteMyPost(postId) {
   }
 }
 
-async function fetchAndGroupClaims() {
-  try {
-    const res = await fetch('/api/claims/for-my-posts');
-    if (res.ok) {
-      const claims = await res.json();
-      const byPost = {};
-      claims.forEach(c => {
-        if (!byPost[c.post_id]) byPost[c.post_id] = [];
-        byPost[c.post_id].push(c);
-      });
-      window._claimsByPost = byPost;
-    }
-  } catch (e) { console.error("Failed to load claims", e); }
-}
-
 
 /* ---------- REQUESTS ---------- */
 export async function renderRequests() {
   hydrateUserOnSidebar();
+  liveRefresh(renderRequests);
   const user = getUser();
 
   // 1. Incoming Requests (For My Posts)
@@ -0,0 +1,186 @@
+"""
+In-memory prefix index behind GET /api/suggest.
+
+Terms come from active, unexpired posts:
+    - the full title, plus each title word (so "sli" finds "Pizza slices")
+    - the category
+    - location tokens (split on commas/whitespace)
+
+Keys are (lowercased text, kind) pairs kept in one sorted list, so the
+same text as a title and as a location stays two suggestions. A lookup
+ranks every key starting with the prefix by how many active posts carry
+it; the ranked top SUGGEST_MAX_LIMIT per prefix is memoized until a term
+under that prefix changes. Loading and change-log syncing come from
+index_utils.ChangeLogIndex.
+"""
+
+import bisect
+import heapq
+import os
+import re
+
+from index_utils import ChangeLogIndex, is_live
+
+SUGGEST_LIMIT = int(os.getenv("SUGGEST_LIMIT", "8"))
+# Largest ?limit= served; also the size of each memoized per-prefix ranking
+SUGGEST_MAX_LIMIT = 20
+# Memoized prefixes kept before the memo is dropped and rebuilt on demand
+SUGGEST_MEMO_SIZE = int(os.getenv("SUGGEST_MEMO_SIZE", "20000"))
+# Re-check the change log at most this often (seconds)
+SUGGEST_SYNC_INTERVAL = float(os.getenv("SUGGEST_SYNC_INTERVAL", "1.0"))
+# Drop posts that passed expires_at at most this often (seconds)
+SUGGEST_EXPIRE_SWEEP = float(os.getenv("SUGGEST_EXPIRE_SWEEP", "60"))
+MIN_WORD_LENGTH = 3
+
+# Separates the matched word from the phrase it belongs to inside a key
+_SEP = "\x00"
+# Sorts after any character a typed prefix can continue with
+_MAX_CHAR = "\U0010ffff"
+_TOKEN_RE = re.compile(r"[\s,;/]+")
+
+KIND_TITLE = "title"
+KIND_CATEGORY = "category"
+KIND_LOCATION = "location"
+
+
+def post_terms(title, category, location):
+    """((text, kind), display, kind) tuples a post contributes to the index."""
+    terms = set()
+    title = (title or "").strip()
+    if title:
+        lower = title.lower()
+        terms.add(((lower, KIND_TITLE), title, KIND_TITLE))
+        for word in _TOKEN_RE.split(lower):
+            if len(word) >= MIN_WORD_LENGTH and word != lower:
+                terms.add(((word + _SEP + lower, KIND_TITLE), title, KIND_TITLE))
+    category = (category or "").strip()
+    if category:
+        terms.add(((category.lower(), KIND_CATEGORY), category, KIND_CATEGORY))
+    for token in _TOKEN_RE.split(location or ""):
+        token = token.strip()
+        if len(token) >= MIN_WORD_LENGTH:
+            terms.add(((token.lower(), KIND_LOCATION), token, KIND_LOCATION))
+    return terms
+
+
+class SuggestIndex(ChangeLogIndex):
+    """Sorted-key prefix index over active posts, synced from `changes`."""
+
+    SELECT_SQL = "SELECT p.id, p.title, p.category, p.location, p.status, p.expires_at FROM posts p"
+    sync_interval = SUGGEST_SYNC_INTERVAL
+    sweep_interval = SUGGEST_EXPIRE_SWEEP
+
+    def __init__(self):
+        super().__init__()
+        self.keys = []          # sorted (lowercased text, kind) keys
+        self.entries = {}       # key -> [display, kind, post count]
+        self.posts = {}         # post_id -> (terms, expires_at)
+        self._top = {}          # prefix -> ranked suggestions (memo)
+
+    # ---------- maintenance ----------
+
+    def _forget(self, key):
+        """Drop the memoized rankings of every prefix `key` answers."""
+        if self._top:
+            text = key[0].split(_SEP, 1)[0]
+            for end in range(1, len(text) + 1):
+                self._top.pop(text[:end], None)
+
+    def _add_term(self, key, display, kind):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = [display, kind, 1]
+            bisect.insort(self.keys, key)
+        else:
+            entry[2] += 1
+        self._forget(key)
+
+    def _remove_term(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry[2] -= 1
+        if entry[2] <= 0:
+            del self.entries[key]
+            i = bisect.bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+        self._forget(key)
+
+    def _remove_post(self, post_id):
+        old = self.posts.pop(post_id, None)
+        if old:
+            for key, _, _ in old[0]:
+                self._remove_term(key)
+
+    def _load(self, rows, now):
+        entries, posts = {}, {}
+        for r in rows:
+            terms = post_terms(r["title"], r["category"], r["location"])
+            posts[r["id"]] = (terms, r["expires_at"])
+            for key, display, kind in terms:
+                entry = entries.get(key)
+                if entry is None:
+                    entries[key] = [display, kind, 1]
+                else:
+                    entry[2] += 1
+        # One sort instead of an insort per term
+        self.keys, self.entries, self.posts = sorted(entries), entries, posts
+        self._top = {}
+
+    def _apply(self, post_ids, rows, now):
+        for post_id in post_ids:
+            self._remove_post(post_id)
+        for r in rows:
+            if is_live(r, now):
+                terms = post_terms(r["title"], r["category"], r["location"])
+                for term in terms:
+                    self._add_term(*term)
+                self.posts[r["id"]] = (terms, r["expires_at"])
+
+    def _sweep(self, now):
+        expired = [
+            pid for pid, (_, expires_at) in self.posts.items()
+            if expires_at is not None and expires_at <= now
+        ]
+        for pid in expired:
+            self._remove_post(pid)
+
+    # ---------- lookup ----------
+
+    def _rank(self, prefix):
+        """Best SUGGEST_MAX_LIMIT distinct suggestions over every key under `prefix`."""
+        lo = bisect.bisect_left(self.keys, (prefix,))
+        hi = bisect.bisect_left(self.keys, (prefix + _MAX_CHAR,), lo)
+        # Most posts first; whole-phrase matches above word-inside-title
+        # ones. Word keys of one title collapse into its best rank.
+        best = {}
+        for key in self.keys[lo:hi]:
+            display, kind, count = self.entries[key]
+            rank = (count, _SEP not in key[0])
+            if rank > best.get((display, kind), (0, False)):
+                best[(display, kind)] = rank
+        # Ties go alphabetically
+        top = heapq.nsmallest(
+            SUGGEST_MAX_LIMIT, best.items(),
+            key=lambda item: (-item[1][0], not item[1][1], item[0]),
+        )
+        return [{"text": display, "kind": kind} for (display, kind), _ in top]
+
+    def suggest(self, prefix, limit=SUGGEST_LIMIT):
+        """Top `limit` [{"text", "kind"}] whose key starts with `prefix`."""
+        prefix = (prefix or "").strip().lower()
+        if not prefix:
+            return []
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is None:
+                top = self._rank(prefix)
+                if len(self._top) >= SUGGEST_MEMO_SIZE:
+                    self._top = {}
+                self._top[prefix] = top
+        return top[:min(limit, SUGGEST_MAX_LIMIT)]
+
+
+# Global index used by /api/suggest
+index = SuggestIndex()
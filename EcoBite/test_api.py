@@ -1,6 +1,7 @@
 
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = "http://127.0.0.1:5000"
 SESSION = requests.Session()
@@ -75,6 +76,56 @@ def test_claim_post(post_id):
         return resp.json()["id"]
     return None
 
+def test_concurrent_approvals(claimers=20, qty=10):
+    """
+    Stress test: `claimers` users each request 1 unit of a `qty`-unit post and
+    the owner approves every claim at once. Exactly `qty` approvals may win;
+    the rest must get 409 and the post must end at 0, never below.
+    """
+    print(f"\nTesting {claimers} concurrent approvals on a {qty} kg post...")
+    data = {
+        "title": "Stress Soup",
+        "description": "Big pot of soup",
+        "quantity": f"{qty} kg",
+        "location_text": "Kitchen",
+        "expires_at": "2099-01-01T00:00:00",
+    }
+    resp = SESSION.post(f"{BASE_URL}/api/food-posts", json=data)
+    if resp.status_code != 201:
+        print(f"Create failed: {resp.status_code} {resp.text}")
+        return False
+    post_id = resp.json()["id"]
+
+    claim_ids = []
+    for i in range(claimers):
+        s = requests.Session()
+        email = f"stress{i}@test.com"
+        s.post(f"{BASE_URL}/signup", data={"email": email, "password": "password", "name": f"Stress {i}"})
+        s.post(f"{BASE_URL}/login", data={"email": email, "password": "password"})
+        r = s.post(f"{BASE_URL}/api/food-posts/{post_id}/claims", json={"requested_quantity": "1 kg"})
+        if r.status_code == 201:
+            claim_ids.append(r.json()["id"])
+
+    def approve(claim_id):
+        # One session per thread, sharing the owner's cookie
+        s = requests.Session()
+        s.cookies.update(SESSION.cookies)
+        return s.patch(f"{BASE_URL}/api/claims/{claim_id}", json={"status": "accepted"}).status_code
+
+    with ThreadPoolExecutor(max_workers=len(claim_ids) or 1) as pool:
+        codes = list(pool.map(approve, claim_ids))
+
+    approved = codes.count(200)
+    post = SESSION.get(f"{BASE_URL}/api/food-posts/{post_id}").json()
+    remaining = post.get("quantity_amount")
+    print(f"Claims: {len(claim_ids)}  approved: {approved}  409s: {codes.count(409)}")
+    print(f"Remaining: {remaining}  status: {post.get('status')}")
+
+    ok = approved == min(qty, len(claim_ids)) and remaining is not None and remaining >= 0
+    ok = ok and remaining == qty - approved
+    print("PASS: no quantity oversold" if ok else "FAIL: quantity accounting is off")
+    return ok
+
 def run():
     if not login("owner@test.com", "password"):
         return
@@ -91,5 +142,7 @@ def run():
             print(f"Status: {resp.status_code}")
             print(f"Response: {resp.text}")
 
+    test_concurrent_approvals()
+
 if __name__ == "__main__":
     run()